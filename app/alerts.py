@@ -1,30 +1,233 @@
-import httpx, asyncio, os
-from typing import Optional
+import httpx, asyncio, gzip, json, os, random, time, zlib
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Union
+from . import metrics
+
+# retried with backoff; any other non-2xx status is a permanent failure
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+@dataclass
+class DeliveryStats:
+    enqueued: int = 0
+    sent: int = 0
+    failed: int = 0        # gave up: retries exhausted or a non-retryable status
+    dropped: int = 0       # outbound queue was full
+    retries: int = 0
+    rate_limited: int = 0  # 429 responses
+    latency: Deque[float] = field(default_factory=lambda: deque(maxlen=2048))  # enqueue -> delivered, seconds
+
+    def percentile(self, q: float) -> float:
+        if not self.latency:
+            return 0.0
+        xs = sorted(self.latency)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def _retry_after(r: httpx.Response) -> Optional[float]:
+    # Telegram puts it in the body ({"parameters": {"retry_after": n}}), plain HTTP in the header
+    try:
+        return float(r.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(r.headers["retry-after"])
+    except Exception:
+        return None
+
+class _Channel:
+    """One destination: a long-lived pooled client and `lanes` workers, each draining its own bounded FIFO.
+    Messages with the same key share a lane, so they are delivered in enqueue order (a retry holds its lane);
+    min_interval spaces consecutive sends on a lane (Telegram allows ~1 message/s per chat)."""
+    def __init__(self, name: str, post: Callable[[httpx.AsyncClient, Any], Awaitable[httpx.Response]],
+                 lanes: int = 1, queue_size: int = 1000, min_interval: float = 0.0, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 10.0):
+        self.name = name
+        self.post = post
+        self.lanes = max(1, lanes)
+        self.queue_size = queue_size
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.stats = DeliveryStats()
+        self.client: Optional[httpx.AsyncClient] = None
+        self.queues: List[asyncio.Queue] = []
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self.client is not None:
+            return
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(
+            max_connections=self.lanes, max_keepalive_connections=self.lanes))
+        self.queues = [asyncio.Queue() for _ in range(self.lanes)]  # bounded as a whole by queue_size
+        self.tasks = [asyncio.create_task(self._worker(q)) for q in self.queues]
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def put(self, item: Any, key: Optional[str] = None, closed_at: Optional[int] = None) -> bool:
+        """closed_at: the bar close (ms) the message reports, for the close -> delivered latency metric."""
+        self.start()
+        if self.depth >= self.queue_size:
+            self.stats.dropped += 1
+            return False
+        self.queues[zlib.crc32(key.encode()) % self.lanes if key else 0].put_nowait((time.monotonic(), closed_at, item))
+        self.stats.enqueued += 1
+        return True
+
+    async def _worker(self, q: asyncio.Queue):
+        last = 0.0
+        while True:
+            t_enq, closed_at, item = await q.get()
+            try:
+                wait = last + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                ok = await self.deliver(item)
+                last = time.monotonic()
+                if ok:
+                    self.stats.sent += 1
+                    self.stats.latency.append(last - t_enq)
+                    if metrics.ENABLED:
+                        metrics.DELIVERY.observe(last - t_enq, self.name)
+                        if closed_at is not None:
+                            metrics.E2E_DELIVERY.observe(time.time() - closed_at / 1000, self.name)
+                else:
+                    self.stats.failed += 1
+            finally:
+                q.task_done()
+
+    async def deliver(self, item: Any) -> bool:
+        self.start()
+        err = ""
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            try:
+                r = await self.post(self.client, item)
+            except Exception as e:
+                err = repr(e)
+            else:
+                if r.status_code < 300:
+                    return True
+                err = f"HTTP {r.status_code}"
+                if r.status_code not in RETRY_STATUS:
+                    break
+                if r.status_code == 429:
+                    self.stats.rate_limited += 1
+                    delay = _retry_after(r)
+            if attempt == self.max_retries:
+                break
+            self.stats.retries += 1
+            if delay is None:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+        print(f"{self.name} error:", err)
+        return False
+
+    async def aclose(self, timeout: float = 5.0):
+        if self.client is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"{self.name}: {self.depth} undelivered messages dropped on shutdown")
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.client.aclose()
+        self.client = None
+
+    def metrics(self) -> dict:
+        s = self.stats
+        return {"depth": self.depth, "enqueued": s.enqueued, "sent": s.sent, "failed": s.failed,
+                "dropped": s.dropped, "retries": s.retries, "rate_limited": s.rate_limited,
+                "latency_p50": s.percentile(0.5), "latency_p99": s.percentile(0.99)}
 
 class Notifier:
-    def __init__(self, telegram_token: Optional[str], telegram_chat_id: Optional[str], webhook_url: Optional[str]):
+    """Webhook + Telegram delivery. post_json / post_telegram enqueue without blocking (False if the queue
+    is full); workers send through one pooled client per destination with retry, backoff and jitter.
+    Webhook messages are spread over `concurrency` lanes by symbol; Telegram uses one lane per chat.
+    send_json / send_telegram deliver immediately (same client and retry policy) and return success."""
+    def __init__(self, telegram_token: Optional[str], telegram_chat_id: Optional[str], webhook_url: Optional[str],
+                 queue_size: int = 1000, concurrency: int = 4, telegram_min_interval: float = 1.0,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 10.0,
+                 telegram_api: str = "https://api.telegram.org"):
         self.telegram_token = telegram_token
         self.telegram_chat_id = telegram_chat_id
         self.webhook_url = webhook_url
+        self.telegram_url = f"{telegram_api.rstrip('/')}/bot{telegram_token}/sendMessage"
+        retry = dict(queue_size=queue_size, max_retries=max_retries, backoff_base=backoff_base,
+                     backoff_max=backoff_max, timeout=timeout)
+        self.webhook = _Channel("Webhook", self._post_webhook, lanes=concurrency, **retry)
+        self.telegram = _Channel("Telegram", self._post_telegram, lanes=1, min_interval=telegram_min_interval, **retry)
+
+    async def _post_webhook(self, cli: httpx.AsyncClient, payload: Union[dict, list, bytes]) -> httpx.Response:
+        if isinstance(payload, bytes):  # pre-encoded gzip JSON, see post_json(compress=True)
+            return await cli.post(self.webhook_url, content=payload, headers={
+                "Content-Type": "application/json", "Content-Encoding": "gzip"})
+        return await cli.post(self.webhook_url, json=payload)
 
-    async def send_json(self, payload: dict):
+    async def _post_telegram(self, cli: httpx.AsyncClient, text: str) -> httpx.Response:
+        return await cli.post(self.telegram_url, data={"chat_id": self.telegram_chat_id, "text": text})
+
+    def post_json(self, payload: Union[dict, list], key: Optional[str] = None, compress: bool = False,
+                  closed_at: Optional[int] = None) -> bool:
+        """Queue a webhook POST; `key` (default: the payload's symbol) picks the ordering lane."""
         if not self.webhook_url:
-            return
-        async with httpx.AsyncClient(timeout=10) as cli:
-            try:
-                await cli.post(self.webhook_url, json=payload)
-            except Exception as e:
-                print("Webhook error:", e)
+            return False
+        if isinstance(payload, dict):
+            key = key if key is not None else payload.get("symbol")
+            closed_at = closed_at if closed_at is not None else payload.get("closed_at")
+        if compress:
+            payload = gzip.compress(json.dumps(payload, separators=(",", ":")).encode())
+        return self.webhook.put(payload, key, closed_at)
 
-    async def send_telegram(self, text: str):
+    def post_telegram(self, text: str, closed_at: Optional[int] = None) -> bool:
         if not (self.telegram_token and self.telegram_chat_id):
-            return
-        url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
-        async with httpx.AsyncClient(timeout=10) as cli:
-            try:
-                await cli.post(url, data={"chat_id": self.telegram_chat_id, "text": text})
-            except Exception as e:
-                print("Telegram error:", e)
+            return False
+        return self.telegram.put(text, closed_at=closed_at)
+
+    async def send_json(self, payload: dict) -> bool:
+        if not self.webhook_url:
+            return False
+        return await self.webhook.deliver(payload)
+
+    async def send_telegram(self, text: str) -> bool:
+        if not (self.telegram_token and self.telegram_chat_id):
+            return False
+        return await self.telegram.deliver(text)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {"webhook": self.webhook.metrics(), "telegram": self.telegram.metrics()}
+
+    async def aclose(self, timeout: float = 5.0):
+        """Waits up to `timeout` for queued messages, then closes the clients."""
+        await asyncio.gather(self.webhook.aclose(timeout), self.telegram.aclose(timeout))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+def notifier_from_config(alerts: dict) -> Notifier:
+    d = alerts.get('delivery', {})
+    return Notifier(
+        telegram_token = alerts.get('telegram_token'),
+        telegram_chat_id = alerts.get('telegram_chat_id'),
+        webhook_url = alerts.get('webhook_url'),
+        queue_size = d.get('queue_size', 1000),
+        concurrency = d.get('concurrency', 4),
+        telegram_min_interval = d.get('telegram_min_interval', 1.0),
+        max_retries = d.get('max_retries', 5),
+        backoff_base = d.get('backoff_base', 0.5),
+        backoff_max = d.get('backoff_max', 30.0),
+        timeout = d.get('timeout', 10.0),
+        telegram_api = d.get('telegram_api', 'https://api.telegram.org'),
+    )
 
 def fmt_signal_msg(s):
     sr_s = s["sr"]
@@ -33,11 +236,43 @@ def fmt_signal_msg(s):
     sup = f"{s_sup[0]:.2f}-{s_sup[1]:.2f}" if s_sup else "None"
     res = f"{s_res[0]:.2f}-{s_res[1]:.2f}" if s_res else "None"
     ind = s["indicators"]
+    stale = f" • STALE {s['lag_s']:.0f}s" if s.get("stale") else ""
     return (
-        f"[{s['symbol']}] {s['timeframe']} • {s['signal']} • Score {s['score']}\n"
+        f"[{s['symbol']}] {s['timeframe']} • {s['signal']} • Score {s['score']}"
+        f"{stale}\n"
         f"Regime: {s['regime']} | Close: {s['price']:.2f}\n"
         f"S/R: S {sup} | R {res}\n"
         f"RSI {ind.get('rsi',0):.1f} • ADX {ind.get('adx',0):.1f} • ATR {ind.get('atr',0):.1f}\n"
         f"Gợi ý: Entry {s['entry_hint']:.2f} | SL {s['sl_hint']:.2f} | TP {s['tp_hint']:.2f}\n"
         f"Lý do: {', '.join(s['rationale'][:4])}"
     )
+
+TELEGRAM_MAX_LEN = 4096
+
+def _fmt_signal_row(s) -> str:
+    sr_s = s["sr"]
+    sup, res = sr_s.get("nearest_support"), sr_s.get("nearest_resistance")
+    mark = {"LONG": "▲", "SHORT": "▼"}.get(s["signal"], "·")
+    return (f"{mark} {s['symbol']:<10} {s['timeframe']:<3} {s['signal']:<7} {s['score']:>3} {s['regime']:<10} "
+            f"{s['price']:.2f} S {f'{sup[1]:.2f}' if sup else '-'} R {f'{res[0]:.2f}' if res else '-'}"
+            + (f" stale {s['lag_s']:.0f}s" if s.get("stale") else ""))
+
+def fmt_signal_table(signals: List[dict], max_len: int = TELEGRAM_MAX_LEN) -> List[str]:
+    """Compact multi-symbol form of fmt_signal_msg: one row per (symbol, tf), LONG/SHORT first by score.
+    Returns one or more messages, each within Telegram's length limit."""
+    if not signals:
+        return []
+    rows = sorted(signals, key=lambda s: (s["signal"] == "NEUTRAL", -s["score"], s["symbol"], s["timeframe"]))
+    t = datetime.fromtimestamp(signals[0]["closed_at"] / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    longs = sum(1 for s in signals if s["signal"] == "LONG")
+    shorts = sum(1 for s in signals if s["signal"] == "SHORT")
+    header = f"Digest {t} • {len(signals)} signals • {longs} LONG • {shorts} SHORT"
+    out, cur = [], header
+    for r in map(_fmt_signal_row, rows):
+        if len(cur) + 1 + len(r) > max_len:
+            out.append(cur)
+            cur = r
+        else:
+            cur += "\n" + r
+    out.append(cur)
+    return out
@@ -0,0 +1,83 @@
+# Local kline archive: <dir>/<SYMBOL>-<interval>.bin holds headerless KLINE_DTYPE records sorted by
+# open time and is read through np.memmap. Convert Binance CSV dumps once with
+#   python -m app.archive import-csv data/klines BTCUSDT 'dumps/BTCUSDT-1m-*.csv'
+import argparse, glob, os
+from typing import Dict, List, Optional
+import numpy as np
+
+KLINE_DTYPE = np.dtype([("t", "<i8"), ("o", "<f8"), ("h", "<f8"), ("l", "<f8"), ("c", "<f8"), ("v", "<f8")])
+
+# our TF names -> Binance interval names used in archive file names
+INTERVALS: Dict[str, str] = {"1M": "1m", "M15": "15m", "H1": "1h", "H4": "4h", "D1": "1d", "W1": "1w"}
+
+def interval_name(tf: str) -> str:
+    return INTERVALS.get(tf.upper(), tf)
+
+def archive_path(archive_dir: str, symbol: str, tf: str = "1m") -> str:
+    return os.path.join(archive_dir, f"{symbol.upper()}-{interval_name(tf)}.bin")
+
+def read_csv(paths: List[str]) -> np.ndarray:
+    """Binance kline CSV dumps (open_time, open, high, low, close, volume, ...), header optional."""
+    import pandas as pd
+    parts = []
+    for p in sorted(paths):
+        df = pd.read_csv(p, header=None, usecols=range(6))
+        if not str(df.iat[0, 0]).strip().isdigit():  # header row
+            df = df.iloc[1:]
+        arr = np.empty(len(df), dtype=KLINE_DTYPE)
+        for name, col in zip(KLINE_DTYPE.names, df.columns):
+            arr[name] = df[col].to_numpy(dtype=KLINE_DTYPE[name])
+        parts.append(arr)
+    out = np.concatenate(parts) if parts else np.empty(0, dtype=KLINE_DTYPE)
+    # newer dumps use microsecond open times
+    us = out["t"] > 10**14
+    out["t"][us] //= 1000
+    return out
+
+def write_klines(path: str, arr: np.ndarray):
+    """Sort, de-duplicate on open time and write atomically."""
+    arr = np.asarray(arr, dtype=KLINE_DTYPE)
+    arr = arr[np.argsort(arr["t"], kind="stable")]
+    if len(arr):
+        keep = np.r_[arr["t"][1:] != arr["t"][:-1], True]  # last write wins
+        arr = arr[keep]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    arr.tofile(tmp)
+    os.replace(tmp, path)
+
+def load_klines(archive_dir: str, symbol: str, tf: str = "1m", until_ms: Optional[int] = None) -> np.ndarray:
+    """Records for (symbol, tf) sorted by open time, memory-mapped when a .bin exists.
+    Falls back to <SYMBOL>-<interval>-*.csv dumps in the same directory; empty array when nothing is there."""
+    path = archive_path(archive_dir, symbol, tf)
+    if os.path.exists(path) and os.path.getsize(path) >= KLINE_DTYPE.itemsize:
+        arr = np.memmap(path, dtype=KLINE_DTYPE, mode="r")
+    else:
+        csvs = glob.glob(os.path.join(archive_dir, f"{symbol.upper()}-{interval_name(tf)}-*.csv"))
+        if not csvs:
+            return np.empty(0, dtype=KLINE_DTYPE)
+        arr = read_csv(csvs)
+        arr = arr[np.argsort(arr["t"], kind="stable")]
+    if until_ms is not None:
+        arr = arr[:np.searchsorted(arr["t"], until_ms, side="left")]
+    return arr
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.archive")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import-csv", help="convert Binance CSV dumps into the binary archive")
+    imp.add_argument("archive_dir")
+    imp.add_argument("symbol")
+    imp.add_argument("csv_glob")
+    imp.add_argument("--tf", default="1m")
+    a = ap.parse_args()
+    if a.cmd == "import-csv":
+        arr = read_csv(glob.glob(a.csv_glob))
+        path = archive_path(a.archive_dir, a.symbol, a.tf)
+        if os.path.exists(path):
+            arr = np.concatenate([np.fromfile(path, dtype=KLINE_DTYPE), arr])
+        write_klines(path, arr)
+        print(f"{path}: {os.path.getsize(path) // KLINE_DTYPE.itemsize} klines")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import abc, asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import httpx
+import numpy as np
+from .archive import load_klines
+from .candles import Candle, MINUTE_MS
+
+class KlineSource(abc.ABC):
+    """Closed 1m kline history: fetch(symbol, start_ms, end_ms) -> Candles with start_ms <= t_open < end_ms, sorted."""
+    @abc.abstractmethod
+    async def fetch(self, symbol: str, start_ms: int, end_ms: int) -> List[Candle]:
+        ...
+
+    async def aclose(self):
+        pass
+
+def _rest_url(market_type: str, base: Optional[str] = None) -> str:
+    market_type = (market_type or 'spot').lower()
+    if market_type == 'usdt_perp':
+        return f"{base or 'https://fapi.binance.com'}/fapi/v1/klines"
+    if market_type == 'coin_perp':
+        return f"{base or 'https://dapi.binance.com'}/dapi/v1/klines"
+    return f"{base or 'https://api.binance.com'}/api/v3/klines"
+
+class RestKlineSource(KlineSource):
+    """Binance /klines over one pooled client, paged by `limit` rows. base_url overrides the host (local stand-in)."""
+    def __init__(self, market_type: str = 'spot', base_url: Optional[str] = None, limit: int = 1000, timeout: float = 10.0):
+        self.url = _rest_url(market_type, base_url)
+        self.limit = limit
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def fetch(self, symbol: str, start_ms: int, end_ms: int) -> List[Candle]:
+        out: List[Candle] = []
+        t = start_ms
+        while t < end_ms:
+            r = await self.client.get(self.url, params={"symbol": symbol.upper(), "interval": "1m", "startTime": t,
+                                                         "endTime": end_ms - 1, "limit": self.limit})
+            r.raise_for_status()
+            rows = r.json()
+            if not rows:
+                break
+            for k in rows:
+                out.append(Candle(symbol.upper(), "1m", int(k[0]), int(k[6]), float(k[1]), float(k[2]), float(k[3]),
+                                  float(k[4]), float(k[5]), True))
+            t = int(rows[-1][0]) + MINUTE_MS
+        return out
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class ArchiveKlineSource(KlineSource):
+    """Serves history from a local kline archive (app.archive), e.g. for tests and replays."""
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+
+    async def fetch(self, symbol: str, start_ms: int, end_ms: int) -> List[Candle]:
+        arr = load_klines(self.archive_dir, symbol, "1m", end_ms)
+        arr = arr[np.searchsorted(arr["t"], start_ms, side="left"):]
+        return [Candle(symbol.upper(), "1m", t, t + MINUTE_MS - 1, o, h, l, c, v, True) for t, o, h, l, c, v in arr.tolist()]
+
+class GapFiller:
+    """Sits between the websocket and CandleAggregator.ingest_1m and keeps every symbol's 1m sequence gap-free.
+    - remembers the last ingested 1m t_open per symbol; a closed kline that skips minutes (the first one after a
+      reconnect, or the first live one after warmup) starts a fetch of the hole from `source`
+    - while a symbol's fetch runs its live klines are held back, then history and held klines go in, in order;
+      other symbols keep flowing. At most `concurrency` fetches run at once
+    - duplicates / out-of-order klines are dropped; a hole that still cannot be fetched after `retries` is
+      skipped (logged) so the symbol does not stall. Holes longer than max_gap_minutes are clipped to their tail
+    - `wait` (e.g. CloseDispatcher.wait_capacity) is awaited after each kline a fill ingests (history, then the
+      held ones), so a long fill is held to the same in-flight bound as live klines"""
+    def __init__(self, source: KlineSource, ingest: Callable[[str, Candle], None], concurrency: int = 8,
+                 retries: int = 3, max_gap_minutes: int = 43_200):
+        self.source = source
+        self.ingest = ingest
+        self.retries = retries
+        self.max_gap_minutes = max_gap_minutes
+        self.last: Dict[str, int] = {}
+        self._held: Dict[str, List[Candle]] = {}
+        self._sem = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self.gaps = 0
+        self.filled = 0      # 1m klines injected from history
+        self.unfilled = 0    # 1m klines given up on
+        self.duplicates = 0
+        self.wait: Optional[Callable[[], Awaitable[None]]] = None
+
+    def seed(self, symbol: str, t_open: int):
+        self.last[symbol.upper()] = t_open
+
+    def seed_from_archive(self, archive_dir: str, symbols: List[str]):
+        for sym in symbols:
+            arr = load_klines(archive_dir, sym, "1m")
+            if len(arr):
+                self.seed(sym, int(arr["t"][-1]))
+
+    @property
+    def pending(self) -> int:
+        return len(self._held)
+
+    def feed(self, c1m: Candle):
+        sym = c1m.symbol
+        held = self._held.get(sym)
+        if held is not None:
+            held.append(c1m)
+            return
+        last = self.last.get(sym)
+        if last is not None:
+            if c1m.t_open <= last:
+                self.duplicates += 1
+                return
+            if c1m.t_open > last + MINUTE_MS:
+                self.gaps += 1
+                self._held[sym] = [c1m]
+                t = asyncio.create_task(self._fill(sym, last + MINUTE_MS, c1m.t_open))
+                self._tasks.add(t)
+                t.add_done_callback(self._tasks.discard)
+                return
+        self.last[sym] = c1m.t_open
+        self.ingest(sym, c1m)
+
+    async def _fill(self, sym: str, start: int, end: int):
+        start = max(start, end - self.max_gap_minutes * MINUTE_MS)
+        bars: List[Candle] = []
+        async with self._sem:
+            for attempt in range(self.retries):
+                try:
+                    bars = await self.source.fetch(sym, start, end)
+                    break
+                except Exception as e:
+                    print(f"backfill {sym} attempt {attempt + 1}:", e)
+                    await asyncio.sleep(min(30, 2 ** attempt))
+        got = 0
+        for b in bars:
+            if start <= b.t_open < end and b.t_open > self.last[sym]:
+                self.last[sym] = b.t_open
+                self.ingest(sym, b)
+                got += 1
+                if self.wait:
+                    await self.wait()
+        self.filled += got
+        missing = (end - start) // MINUTE_MS - got
+        if missing:
+            self.unfilled += missing
+            print(f"backfill {sym}: {missing} 1m klines missing before {end}, continuing with the gap")
+        # release held klines through feed() so a second hole among them is handled the same way
+        self.last[sym] = max(self.last[sym], end - MINUTE_MS)
+        held = self._held.pop(sym)
+        while held:
+            self.feed(held.pop(0))
+            if sym in self._held:  # a second hole: the rest queue behind its fill
+                self._held[sym].extend(held)
+                break
+            if self.wait and held:
+                self._held[sym] = held  # live klines arriving while waiting go behind the rest
+                await self.wait()
+                held = self._held.pop(sym)
+
+    async def drain(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def aclose(self):
+        for t in list(self._tasks):
+            t.cancel()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self.source.aclose()
+
+def gapfiller_from_config(cfg: dict, market_type: str, ingest: Callable[[str, Candle], None]) -> Optional[GapFiller]:
+    if not cfg.get('enabled', True):
+        return None
+    if cfg.get('source', 'rest') == 'archive':
+        source = ArchiveKlineSource(cfg['archive_dir'])
+    else:
+        source = RestKlineSource(market_type, base_url=cfg.get('base_url'), limit=cfg.get('limit', 1000))
+    return GapFiller(source, ingest, concurrency=cfg.get('concurrency', 8), retries=cfg.get('retries', 3),
+                     max_gap_minutes=cfg.get('max_gap_minutes', 43_200))
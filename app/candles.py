@@ -1,8 +1,13 @@
+import time
 from dataclasses import dataclass
 from typing import Optional, Dict, Tuple, Callable, List
-from datetime import datetime, timezone, timedelta
+import numpy as np
+from . import metrics
 
-@dataclass
+MINUTE_MS = 60_000
+W1_ANCHOR_MS = 4 * 86_400_000  # 1970-01-05 00:00 UTC, the first Monday after the epoch
+
+@dataclass(slots=True)
 class Candle:
     symbol: str
     tf: str
@@ -15,71 +20,227 @@ class Candle:
     v: float
     closed: bool = False
 
+_TF_MINUTES = {"1M": 1, "1MIN": 1, "1MINUTE": 1, "1": 1, "M15": 15, "H1": 60, "H4": 240, "D1": 1440, "W1": 10080}
+_ONE_MIN = frozenset(("1m", "1M", "1"))
+
 def _tf_minutes(tf: str) -> int:
-    tf = tf.upper()
-    if tf in ("1M","1MIN","1MINUTE","1"): return 1
-    if tf == "M15": return 15
-    if tf == "H1": return 60
-    if tf == "H4": return 240
-    if tf == "D1": return 1440
-    if tf == "W1": return 10080
-    raise ValueError(f"Unsupported TF: {tf}")
+    m = _TF_MINUTES.get(tf) or _TF_MINUTES.get(tf.upper())
+    if m is None:
+        raise ValueError(f"Unsupported TF: {tf}")
+    return m
+
+def _anchor(tf: str) -> int:
+    return W1_ANCHOR_MS if tf.upper() == "W1" else 0
 
 def _align_open(ts_ms: int, tf: str) -> int:
-    mins = _tf_minutes(tf)
-    if tf == "W1":
-        dt = datetime.fromtimestamp(ts_ms/1000, tz=timezone.utc)
-        monday = (dt - timedelta(days=dt.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-        delta_min = int((dt - monday).total_seconds() // 60)
-        aligned_min = delta_min - (delta_min % mins)
-        aligned = monday + timedelta(minutes=aligned_min)
-        return int(aligned.timestamp() * 1000)
-    else:
-        period_ms = _tf_minutes(tf) * 60_000
-        return (ts_ms // period_ms) * period_ms
+    period_ms, a = _tf_minutes(tf) * MINUTE_MS, _anchor(tf)
+    return (ts_ms - a) // period_ms * period_ms + a
 
 def _end_from_open(t_open_ms: int, tf: str) -> int:
-    return t_open_ms + _tf_minutes(tf) * 60_000
+    return t_open_ms + _tf_minutes(tf) * MINUTE_MS
+
+def align_open_array(ts_ms: np.ndarray, tf: str) -> np.ndarray:
+    """Vectorized _align_open: integer arithmetic, W1 anchored on Monday 00:00 UTC."""
+    period_ms, a = _tf_minutes(tf) * MINUTE_MS, _anchor(tf)
+    if a:
+        return (ts_ms - a) // period_ms * period_ms + a
+    return ts_ms // period_ms * period_ms
+
+def _segments(keys: np.ndarray, o, h, l, c, v, last_ok: np.ndarray, tf: str) -> Dict[str, np.ndarray]:
+    # one bucket per run of equal keys: first/max/min/last/sum over each run
+    n = len(keys)
+    starts = np.empty(0, dtype=np.intp) if n == 0 else np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], n] - 1 if n else starts
+    t_open = keys[starts]
+    t_close = t_open + _tf_minutes(tf) * MINUTE_MS
+    if n == 0:
+        return {"t_open": t_open, "t_close": t_close, "open": o[:0], "high": h[:0], "low": l[:0], "close": c[:0],
+                "volume": v[:0], "closed": np.empty(0, bool)}
+    return {
+        "t_open": t_open,
+        "t_close": t_close,
+        "open": o[starts],
+        "high": np.maximum.reduceat(h, starts),
+        "low": np.minimum.reduceat(l, starts),
+        "close": c[ends],
+        "volume": np.add.reduceat(v, starts),
+        "closed": last_ok(ends, t_close),
+    }
+
+def _as_1m(t_open, o, h, l, c, v):
+    return (np.asarray(t_open, dtype=np.int64),) + tuple(np.asarray(x, dtype=np.float64) for x in (o, h, l, c, v))
+
+def rollup_1m(t_open: np.ndarray, o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray, v: np.ndarray,
+              tf: str) -> Dict[str, np.ndarray]:
+    """Roll sorted 1m arrays up to `tf` in one pass of segmented reductions.
+    Returns t_open/t_close/open/high/low/close/volume per bucket plus `closed`, which is True
+    when the bucket's final minute is present (the same rule CandleAggregator uses to close)."""
+    t_open, o, h, l, c, v = _as_1m(t_open, o, h, l, c, v)
+    return _segments(align_open_array(t_open, tf), o, h, l, c, v,
+                     lambda ends, t_close: t_open[ends] + MINUTE_MS >= t_close, tf)
+
+def rollup_1m_multi(t_open: np.ndarray, o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray, v: np.ndarray,
+                    tfs: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+    """rollup_1m for several TFs at once. TFs are built shortest first and each one is reduced from the
+    previous TF's buckets when those nest inside it (period divides, W1 anchor included), so most of the
+    work runs on M15-sized arrays instead of the 1m input."""
+    t_open, o, h, l, c, v = _as_1m(t_open, o, h, l, c, v)
+    out: Dict[str, Dict[str, np.ndarray]] = {}
+    src = None
+    for tf in sorted((x.upper() for x in tfs), key=_tf_minutes):
+        mins = _tf_minutes(tf)
+        if src is not None and mins % _tf_minutes(src[0]) == 0:
+            prev = src[1]
+            out[tf] = _segments(align_open_array(prev["t_open"], tf), prev["open"], prev["high"], prev["low"],
+                                prev["close"], prev["volume"],
+                                lambda ends, t_close, p=prev: p["closed"][ends] & (p["t_close"][ends] == t_close), tf)
+        else:
+            out[tf] = _segments(align_open_array(t_open, tf), o, h, l, c, v,
+                                lambda ends, t_close: t_open[ends] + MINUTE_MS >= t_close, tf)
+        src = (tf, out[tf])
+    return out
+
+class _Bar:
+    """The forming candle of one (symbol, tf), reused from period to period (t_open < 0: none open)."""
+    __slots__ = ("symbol", "tf", "key", "period", "anchor", "t_open", "t_close", "o", "h", "l", "c", "v")
+    def __init__(self, symbol: str, tf: str):
+        self.symbol, self.tf, self.key = symbol, tf, (symbol, tf)
+        self.period, self.anchor = _tf_minutes(tf) * MINUTE_MS, _anchor(tf)
+        self.t_open = self.t_close = -1
+        self.o = self.h = self.l = self.c = self.v = 0.0
+
+    def candle(self, closed: bool) -> Candle:
+        return Candle(self.symbol, self.tf, self.t_open, self.t_close, self.o, self.h, self.l, self.c, self.v, closed)
+
+    def load(self, c: Optional[Candle]):
+        if c is None:
+            self.t_open = self.t_close = -1
+        else:
+            self.t_open, self.t_close, self.o, self.h, self.l, self.c, self.v = c.t_open, c.t_close, c.o, c.h, c.l, c.c, c.v
 
 class CandleAggregator:
+    """Live roll-up of 1m candles to every TF. Per symbol id, one reusable _Bar per TF holds the forming candle;
+    a Candle is only built when a period closes (on_close, last_closed) or when asked for by active()."""
     def __init__(self, symbols: List[str], tfs: List[str]):
         self.symbols = [s.upper() for s in symbols]
         self.tfs = [tf.upper() for tf in tfs]
-        self._active: Dict[Tuple[str,str], Candle] = {}
+        self._ids: Dict[str, int] = {}        # symbol as callers spell it -> id
+        self._bars: List[List[_Bar]] = []     # id -> one _Bar per TF, in self.tfs order
         self._last_closed: Dict[Tuple[str,str], Candle] = {}
         self.on_close: Optional[Callable[[Candle], None]] = None
+        self.store = None  # optional app.store.CandleStore: receives every 1m input and every TF close
+        for s in self.symbols:
+            self._id(s)
+
+    def _id(self, symbol: str) -> int:
+        i = self._ids.get(symbol)
+        if i is None:
+            up = symbol.upper()
+            i = self._ids.get(up)
+            if i is None:
+                i = self._ids[up] = len(self._bars)
+                self._bars.append([_Bar(up, tf) for tf in self.tfs])
+            self._ids[symbol] = i
+        return i
+
+    def _bar(self, symbol: str, tf: str) -> _Bar:
+        return self._bars[self._id(symbol)][self.tfs.index(tf.upper())]
 
     def last_closed(self, symbol: str, tf: str) -> Optional[Candle]:
         return self._last_closed.get((symbol.upper(), tf.upper()))
 
-    def ingest_1m(self, symbol: str, one_min: Candle):
-        symbol = symbol.upper()
-        if one_min.tf not in ("1m","1M","1"):
+    def active(self, symbol: str, tf: str) -> Optional[Candle]:
+        """A copy of the forming (not yet closed) candle, or None."""
+        b = self._bar(symbol, tf)
+        return b.candle(False) if b.t_open >= 0 else None
+
+    def set_active(self, symbol: str, tf: str, c: Optional[Candle]):
+        self._bar(symbol, tf).load(c)
+
+    def set_last_closed(self, symbol: str, tf: str, c: Candle):
+        self._last_closed[(symbol.upper(), tf.upper())] = c
+
+    def actives(self) -> Dict[Tuple[str,str], Candle]:
+        return {b.key: b.candle(False) for bars in self._bars for b in bars if b.t_open >= 0}
+
+    def ingest_1m(self, symbol: str, one_min: Candle) -> int:
+        """Fold one closed 1m candle into every TF; returns how many TF candles it closed."""
+        i = self._ids.get(symbol)
+        bars = self._bars[self._id(symbol) if i is None else i]
+        if one_min.tf not in _ONE_MIN:
             raise ValueError("ingest_1m expects a 1m Candle")
-        for tf in self.tfs:
-            self._roll(symbol, tf, one_min)
-
-    def _roll(self, symbol: str, tf: str, c1m: Candle):
-        t_open_tf = _align_open(c1m.t_open, tf)
-        t_close_tf = _end_from_open(t_open_tf, tf)
-        key = (symbol, tf)
-        cur = self._active.get(key)
-
-        if cur is None or cur.t_open != t_open_tf:
-            cur = Candle(symbol, tf, t_open_tf, t_close_tf, c1m.o, c1m.h, c1m.l, c1m.c, c1m.v, False)
-            self._active[key] = cur
-        else:
-            cur.h = max(cur.h, c1m.h)
-            cur.l = min(cur.l, c1m.l)
-            cur.c = c1m.c
-            cur.v += c1m.v
-
-        if c1m.t_close >= cur.t_close:
-            cur.closed = True
-            self._last_closed[key] = cur
-            if self.on_close:
-                try:
-                    self.on_close(cur)
-                except Exception as e:
-                    print("on_close error:", e)
-            self._active[key] = None
+        if self.store is not None:
+            self.store.append(one_min)
+        t, o, h, l, c, v = one_min.t_open, one_min.o, one_min.h, one_min.l, one_min.c, one_min.v
+        end = t + MINUTE_MS  # Binance stamps a 1m close as open + 59_999, so test the minute's end
+        timed = metrics.ENABLED
+        closed = 0
+        for b in bars:
+            t0 = time.perf_counter() if timed else 0.0
+            p, a = b.period, b.anchor
+            t_open = (t - a) // p * p + a
+            if b.t_open != t_open:
+                b.t_open, b.t_close, b.o, b.h, b.l, b.c, b.v = t_open, t_open + p, o, h, l, c, v
+            else:
+                if h > b.h:
+                    b.h = h
+                if l < b.l:
+                    b.l = l
+                b.c = c
+                b.v += v
+            if end >= b.t_close:
+                self._close(b, t0)
+                closed += 1
+            elif t0:
+                metrics.STAGE.observe(time.perf_counter() - t0, "rollup", b.symbol, b.tf)
+        return closed
+
+    def _close(self, b: _Bar, t0: float):
+        cur = b.candle(True)
+        b.t_open = b.t_close = -1
+        self._last_closed[b.key] = cur
+        if self.store is not None:
+            self.store.append(cur)
+        if t0:  # the roll-up alone; on_close work is timed by its own stages
+            metrics.STAGE.observe(time.perf_counter() - t0, "rollup", b.symbol, b.tf)
+        if self.on_close:
+            try:
+                self.on_close(cur)
+            except Exception as e:
+                print("on_close error:", e)
+
+    def ingest_1m_batch(self, symbol: str, t_open: np.ndarray, o: np.ndarray, h: np.ndarray, l: np.ndarray,
+                        c: np.ndarray, v: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+        """Batch counterpart of ingest_1m for replay/backfill: roll sorted 1m arrays up to every TF with
+        rollup_1m_multi and leave the forming / last closed candles as the streaming path would. on_close is
+        not called; the closed candles are the rows of the returned arrays where `closed` is True."""
+        symbol = symbol.upper()
+        out = rollup_1m_multi(t_open, o, h, l, c, v, self.tfs)
+        if self.store is not None:
+            self.store.extend(symbol, "1m", t_open, o, h, l, c, v)
+        for tf, b in zip(self.tfs, self._bars[self._id(symbol)]):
+            r = out[tf]
+            if not len(r["t_open"]):
+                continue
+            if b.t_open >= 0 and b.t_open == r["t_open"][0]:
+                # first bucket continues the live candle
+                r["open"][0] = b.o
+                r["high"][0] = max(b.h, r["high"][0])
+                r["low"][0] = min(b.l, r["low"][0])
+                r["volume"][0] += b.v
+            closed = np.flatnonzero(r["closed"])
+            if self.store is not None and len(closed):
+                self.store.extend(symbol, tf, r["t_open"][closed], r["open"][closed], r["high"][closed],
+                                  r["low"][closed], r["close"][closed], r["volume"][closed])
+            if len(closed):
+                i = closed[-1]
+                self._last_closed[b.key] = Candle(symbol, tf, int(r["t_open"][i]), int(r["t_close"][i]), float(r["open"][i]),
+                                                  float(r["high"][i]), float(r["low"][i]), float(r["close"][i]),
+                                                  float(r["volume"][i]), True)
+            i = len(r["t_open"]) - 1
+            if r["closed"][i]:
+                b.load(None)
+            else:
+                b.t_open, b.t_close = int(r["t_open"][i]), int(r["t_close"][i])
+                b.o, b.h, b.l, b.c, b.v = (float(r[x][i]) for x in ("open", "high", "low", "close", "volume"))
+        return out
@@ -0,0 +1,216 @@
+import gc, json, os, time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .candles import Candle
+from .indicators import _Ring, _WIDTH
+from .pipeline import Pipeline
+from .sr import Zone, _ZoneIndex
+
+# Pipeline state as one .npz of flat NumPy arrays (no pickle). Per-key sequences of different lengths are
+# stored concatenated with a lengths array; keys are "SYMBOL|TF". Bump VERSION when the layout changes.
+VERSION = 1
+
+def _key(k: Tuple[str, str]) -> str:
+    return f"{k[0]}|{k[1]}"
+
+def _unkey(s: str) -> Tuple[str, str]:
+    sym, tf = s.split("|")
+    return sym, tf
+
+def _ragged(seqs: List, dtype=np.float64, width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    lens = np.array([len(x) for x in seqs], dtype=np.int64)
+    shape = (int(lens.sum()),) if width is None else (int(lens.sum()), width)
+    flat = np.fromiter((v for x in seqs for v in (x if width is None else (y for row in x for y in row))),
+                       dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return flat, lens
+
+def _split(flat: np.ndarray, lens: np.ndarray) -> List[list]:
+    # one tolist() for the whole array, then list slices: far cheaper than a small array per key
+    xs, out, a = flat.tolist(), [], 0
+    for n in lens.tolist():
+        out.append(xs[a:a + n])
+        a += n
+    return out
+
+def _fingerprint(pipe: Pipeline) -> dict:
+    p, d = pipe.ind_params, pipe.det
+    return {"tfs": pipe.tfs, "indicators": vars(p), "buffer_capacity": pipe.buf.capacity,
+            "sr": [d.pivot_window, d.merge_tol_pct, d.merge_tol_atr_mult, d.max_age_bars, d.decay_per_bar,
+                   d.history_bars, d.atr_length]}
+
+# ---- CandleAggregator -------------------------------------------------------------------------------------
+
+def _dump_agg(pipe: Pipeline, out: Dict[str, np.ndarray]):
+    for name, d in (("active", pipe.agg.actives()), ("closed", pipe.agg._last_closed)):
+        cs = [(k, c) for k, c in d.items() if c is not None]
+        out[f"agg_{name}_keys"] = np.array([_key(k) for k, _ in cs], dtype=str)
+        out[f"agg_{name}_t"] = np.array([(c.t_open, c.t_close) for _, c in cs], dtype=np.int64).reshape(-1, 2)
+        out[f"agg_{name}_x"] = np.array([(c.o, c.h, c.l, c.c, c.v) for _, c in cs], dtype=np.float64).reshape(-1, 5)
+
+def _load_agg(pipe: Pipeline, z, wanted):
+    for name in ("active", "closed"):
+        for k, t, x in zip(z[f"agg_{name}_keys"].tolist(), z[f"agg_{name}_t"].tolist(), z[f"agg_{name}_x"].tolist()):
+            key = _unkey(k)
+            if key not in wanted:
+                continue
+            c = Candle(key[0], key[1], t[0], t[1], *x, closed=(name == "closed"))
+            if name == "closed":
+                pipe.agg.set_last_closed(*key, c)
+            else:
+                pipe.agg.set_active(*key, c)
+
+# ---- SeriesBuffer -----------------------------------------------------------------------------------------
+
+def _dump_buf(pipe: Pipeline, out: Dict[str, np.ndarray]):
+    keys = list(pipe.buf.store)
+    rings = [pipe.buf.store[k] for k in keys]
+    out["buf_keys"] = np.array([_key(k) for k in keys], dtype=str)
+    out["buf_len"] = np.array([r.n for r in rings], dtype=np.int64)
+    out["buf_t"] = np.concatenate([r.t[r.window()] for r in rings]) if rings else np.empty(0, np.int64)
+    out["buf_x"] = np.concatenate([r.x[:, r.window()] for r in rings], axis=1) if rings else np.empty((5, 0))
+
+def _load_buf(pipe: Pipeline, z, wanted):
+    cap = pipe.buf.capacity
+    lens = z["buf_len"]
+    starts = np.r_[0, np.cumsum(lens)[:-1]]
+    t_all, x_all = z["buf_t"], z["buf_x"]
+    for k, a, n in zip(z["buf_keys"].tolist(), starts.tolist(), lens.tolist()):
+        key = _unkey(k)
+        if key not in wanted:
+            continue
+        r = pipe.buf.store[key] = _Ring(cap)
+        # rows land in slots [0, n) and [cap, cap+n), as n appends into an empty ring would leave them
+        r.t[:n] = r.t[cap:cap + n] = t_all[a:a + n]
+        r.x[:, :n] = r.x[:, cap:cap + n] = x_all[:, a:a + n]
+        r.n = n
+        r.end = cap + n
+
+# ---- IndicatorEngine --------------------------------------------------------------------------------------
+
+def _dump_engine(pipe: Pipeline, out: Dict[str, np.ndarray]):
+    # block rows are already in the eng_scalar layout; Bollinger windows are stored without their NaN head
+    keys, rows, wins, lasts = [], [], [], []
+    for tf, b in pipe.engine.blocks.items():
+        S, W = b.matrices()
+        keys += [_key((sym, tf)) for sym in b.syms]
+        rows.append(S.copy())
+        wins += [w[b.bb_len - min(int(n), b.bb_len):] for w, n in zip(W.tolist(), S[:, 0].tolist())]
+        lasts += b.last
+        del S, W
+    out["eng_keys"] = np.array(keys, dtype=str)
+    out["eng_scalar"] = np.concatenate(rows) if rows else np.empty((0, _WIDTH))
+    out["eng_bb"], out["eng_bb_len"] = _ragged(wins)
+    out["eng_last"] = np.frombuffer(json.dumps(lasts).encode(), dtype=np.uint8)
+
+def _load_engine(pipe: Pipeline, z, wanted):
+    lasts = json.loads(z["eng_last"].tobytes())
+    for k, row, bb, last in zip(z["eng_keys"].tolist(), z["eng_scalar"].tolist(),
+                                _split(z["eng_bb"], z["eng_bb_len"]), lasts):
+        key = _unkey(k)
+        if key not in wanted:
+            continue
+        b = pipe.engine._block(key[1])
+        i = b.row(key[0])
+        b.put(i, row, bb)
+        b.last[i] = last
+
+# ---- SRDetector -------------------------------------------------------------------------------------------
+
+_SR_SERIES = ("o", "h", "l", "c", "atr", "tr", "hw", "lw", "hmax_hist", "lmin_hist")
+_ZONE_F = ("price_low", "price_high", "score")
+_ZONE_I = ("touches", "last_touch_idx", "created_idx", "score_idx", "seq")
+
+def _dump_sr(pipe: Pipeline, out: Dict[str, np.ndarray]):
+    keys = list(pipe.det.store)
+    slots = [pipe.det.store[k] for k in keys]
+    out["sr_keys"] = np.array([_key(k) for k in keys], dtype=str)
+    out["sr_scalar"] = np.array([[s["n"], np.nan if s["prev_c"] is None else s["prev_c"], s["zones"].max_width,
+                                  s["zones"].seq] for s in slots], dtype=np.float64).reshape(len(slots), 4)
+    for name in _SR_SERIES:
+        out[f"sr_{name}"], out[f"sr_{name}_len"] = _ragged([s[name] for s in slots])
+    for name in ("hmax", "lmin"):  # monotonic deques of (bar, value)
+        out[f"sr_{name}"], out[f"sr_{name}_len"] = _ragged([s[name] for s in slots], width=2)
+    zs = [list(s["zones"]) for s in slots]
+    out["sr_zf"], out["sr_z_len"] = _ragged([[[getattr(z, f) for f in _ZONE_F] for z in x] for x in zs], width=len(_ZONE_F))
+    out["sr_zi"], _ = _ragged([[[getattr(z, f) for f in _ZONE_I] for z in x] for x in zs], dtype=np.int64, width=len(_ZONE_I))
+
+def _load_sr(pipe: Pipeline, z, wanted):
+    det = pipe.det
+    series = {name: _split(z[f"sr_{name}"], z[f"sr_{name}_len"]) for name in _SR_SERIES + ("hmax", "lmin")}
+    zf, zi = _split(z["sr_zf"], z["sr_z_len"]), _split(z["sr_zi"], z["sr_z_len"])
+    for j, (k, sc) in enumerate(zip(z["sr_keys"].tolist(), z["sr_scalar"].tolist())):
+        key = _unkey(k)
+        if key not in wanted:
+            continue
+        _, slot = det._get_pair(*key)
+        slot["n"] = int(sc[0])
+        slot["prev_c"] = None if sc[1] != sc[1] else sc[1]
+        for name in _SR_SERIES:
+            slot[name].extend(series[name][j])
+        for name in ("hmax", "lmin"):
+            slot[name].extend((int(i), x) for i, x in series[name][j])
+        idx = _ZoneIndex()
+        for f, i in zip(zf[j], zi[j]):
+            zone = Zone(key[1], *f, *i)
+            idx.fifo.append(zone)
+            idx._insert(zone)
+        idx.max_width = sc[2]
+        idx.seq = int(sc[3])
+        slot["zones"] = idx
+
+# ---- Pipeline ---------------------------------------------------------------------------------------------
+
+def dump(pipe: Pipeline) -> Dict[str, np.ndarray]:
+    """Copy every piece of pipe's state into flat arrays (call on the loop; writing can happen elsewhere)."""
+    out: Dict[str, np.ndarray] = {}
+    meta = {"version": VERSION, "saved_at": int(time.time() * 1000), "params": _fingerprint(pipe),
+            "last_1m": pipe.last_1m, "last_tf_signal": pipe.last_tf_signal}
+    out["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    _dump_agg(pipe, out)
+    _dump_buf(pipe, out)
+    _dump_engine(pipe, out)
+    _dump_sr(pipe, out)
+    return out
+
+def write(path: str, arrays: Dict[str, np.ndarray]):
+    """Atomic: written next to `path` and moved over it, so a crash never leaves a torn checkpoint."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def save(path: str, pipe: Pipeline):
+    write(path, dump(pipe))
+
+def restore(path: str, pipe: Pipeline) -> Optional[dict]:
+    """Load a checkpoint into a freshly built pipe. Returns its meta, or None (nothing restored) when the file
+    is missing, from another VERSION, or was taken with different TFs / indicator / SR / buffer settings.
+    Only keys of pipe.symbols are restored."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(z["meta"].tobytes())
+        if meta.get("version") != VERSION:
+            print(f"[checkpoint] {path}: version {meta.get('version')} != {VERSION}, ignored")
+            return None
+        if meta["params"] != json.loads(json.dumps(_fingerprint(pipe))):
+            print(f"[checkpoint] {path}: taken with different settings, ignored")
+            return None
+        wanted = {(s, tf) for s in pipe.symbols for tf in pipe.tfs}
+        gc.disable()  # only long-lived objects are created here; collections would just rescan them
+        try:
+            _load_agg(pipe, z, wanted)
+            _load_buf(pipe, z, wanted)
+            _load_engine(pipe, z, wanted)
+            _load_sr(pipe, z, wanted)
+        finally:
+            gc.enable()
+    syms = set(pipe.symbols)
+    pipe.last_1m.update((s, t) for s, t in meta["last_1m"].items() if s in syms)
+    for s, per_tf in meta["last_tf_signal"].items():
+        if s in syms:
+            pipe.last_tf_signal[s].update(per_tf)
+    return meta
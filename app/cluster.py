@@ -0,0 +1,273 @@
+"""Multi-process deployment: python -m app.cluster [--workers N]
+
+A coordinator splits exchange.symbols over N worker processes. Every worker runs the whole step6 pipeline
+(websocket, roll-up, indicators, SR, signals) for its shard and forwards what it publishes over one
+multiprocessing queue; the coordinator owns alert delivery (Notifier / digest) and drops duplicates.
+Nothing crosses symbols (a snapshot only needs the TFs of its own symbol), so shards never talk to each other.
+A worker that dies, or sends no heartbeat for hang_after_s, is restarted with the same shard; it resumes from
+its own checkpoint and backfill, and the closes it publishes again are deduplicated here."""
+import argparse, asyncio, copy, multiprocessing as mp, os, signal, threading, time
+from typing import Callable, Dict, List, Optional, Tuple
+from . import metrics
+from .alerts import notifier_from_config
+from .digest import DigestSink, digest_from_config
+from .pipeline import Sink
+from .settings import Settings
+from .shm_table import table_from_config
+
+class QueueSink(Sink):
+    """Worker side: publishes records (kind, shard, payload) to the coordinator's queue."""
+    def __init__(self, out, shard: int):
+        self.out = out
+        self.shard = shard
+
+    def signal(self, payload: dict):
+        self.out.put(("signal", self.shard, payload))
+
+    def snapshot(self, snap: dict):
+        self.out.put(("snapshot", self.shard, snap))
+
+def shard_symbols(symbols: List[str], n: int) -> List[List[str]]:
+    # round-robin, so shards stay balanced and a symbol keeps its shard while the list and n are unchanged
+    return [symbols[i::n] for i in range(n)]
+
+def shard_raw(raw: dict, shard: int) -> dict:
+    """The worker's config: its own checkpoint file, metrics and query API port (port + 1 + shard), no signal
+    table (the coordinator writes the one table for all shards)."""
+    raw = copy.deepcopy(raw)
+    # setdefault, not get: a section left out of the config still has to be written back, or every worker
+    # falls back to the coordinator's defaults (metrics on 9108)
+    ck = raw.setdefault('checkpoint', {})
+    if ck.get('path'):
+        root, ext = os.path.splitext(ck['path'])
+        ck['path'] = f"{root}-w{shard}{ext or '.npz'}"
+    m = raw.setdefault('metrics', {})
+    if m.get('port', 9108):
+        m['port'] = m.get('port', 9108) + 1 + shard
+    q = raw.setdefault('query', {})
+    if q.get('port'):
+        q['port'] += 1 + shard
+    raw.setdefault('shm', {})['path'] = None
+    return raw
+
+async def _heartbeat(out, shard: int, every: float):
+    while True:
+        out.put(("hb", shard, time.time()))
+        await asyncio.sleep(every)
+
+async def _worker(shard: int, symbols: List[str], raw: dict, out, heartbeat_s: float):
+    from .step6_run import run
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    hb = asyncio.create_task(_heartbeat(out, shard, heartbeat_s))
+    try:
+        await run(shard_raw(raw, shard), symbols, QueueSink(out, shard))
+    finally:
+        hb.cancel()
+
+def worker_main(shard: int, symbols: List[str], raw: dict, out, heartbeat_s: float):
+    try:
+        asyncio.run(_worker(shard, symbols, raw, out, heartbeat_s))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+class Coordinator:
+    """Starts, watches and restarts the workers, and hands every record they send to `sink` once:
+    a signal is dropped when its (symbol, tf) already went out for that close or a later one, a snapshot
+    when it repeats the last one sent for its symbol (same closed_at per TF) or is older."""
+    def __init__(self, raw: dict, sink: Sink, workers: int = 2, heartbeat_s: float = 5.0,
+                 hang_after_s: float = 60.0, restart_max_s: float = 30.0, target: Callable = worker_main,
+                 symbols: Optional[List[str]] = None):
+        self.raw = raw
+        self.sink = sink
+        self.symbols = [x.upper() for x in (symbols or raw.get('exchange', {}).get('symbols', ['BTCUSDT']))]
+        self.shards = shard_symbols(self.symbols, max(1, min(workers, len(self.symbols))))
+        self.heartbeat_s = heartbeat_s
+        self.hang_after_s = hang_after_s
+        self.restart_max_s = restart_max_s
+        self.target = target
+        self.table = None  # app.shm_table.SignalTable over all shards, fed with every signal sent
+        self._ctx = mp.get_context("spawn")  # no inherited event loop, sockets or threads
+        self.queue = self._ctx.Queue()
+        self.procs: List[Optional[mp.process.BaseProcess]] = [None] * len(self.shards)
+        self.started = [0.0] * len(self.shards)
+        self.last_hb = [0.0] * len(self.shards)
+        self.backoff = [1.0] * len(self.shards)
+        self.next_start = [0.0] * len(self.shards)
+        self.restarts = [0] * len(self.shards)
+        self.received = [0] * len(self.shards)
+        self.duplicates = 0
+        self._sent_signal: Dict[Tuple[str, str], int] = {}
+        self._sent_snap: Dict[str, tuple] = {}
+        self._stopping = False
+        self._reader: Optional[threading.Thread] = None
+
+    # ---- records -------------------------------------------------------------------------------------------
+
+    def handle(self, rec: tuple):
+        kind, shard, body = rec
+        if kind == "hb":
+            self.last_hb[shard] = time.monotonic()
+            return
+        self.received[shard] += 1
+        if kind == "signal":
+            key = (body["symbol"], body["timeframe"])
+            if body["closed_at"] <= self._sent_signal.get(key, -1):
+                self.duplicates += 1
+                return
+            self._sent_signal[key] = body["closed_at"]
+            if self.table is not None:
+                self.table.put(body)
+            self.sink.signal(body)
+        elif kind == "snapshot":
+            ident = (body["closed_at"],) + tuple(x["closed_at"] for x in body["per_tf"].values())
+            last = self._sent_snap.get(body["symbol"])
+            if last is not None and (ident == last or ident[0] < last[0]):
+                self.duplicates += 1
+                return
+            self._sent_snap[body["symbol"]] = ident
+            self.sink.snapshot(body)
+
+    def _read(self, loop: asyncio.AbstractEventLoop):
+        # blocking queue reads off the loop; records are handled on it, in arrival order
+        while True:
+            rec = self.queue.get()
+            if rec is None:
+                return
+            loop.call_soon_threadsafe(self._handle_safe, rec)
+
+    def _handle_safe(self, rec: tuple):
+        try:
+            self.handle(rec)
+        except Exception as e:
+            print("[cluster] record error:", e)
+
+    # ---- processes -----------------------------------------------------------------------------------------
+
+    def _spawn(self, i: int):
+        p = self._ctx.Process(target=self.target, name=f"signalbot-w{i}", daemon=False,
+                              args=(i, self.shards[i], self.raw, self.queue, self.heartbeat_s))
+        p.start()
+        self.procs[i] = p
+        self.started[i] = self.last_hb[i] = time.monotonic()
+        print(f"[cluster] worker {i} pid {p.pid}: {len(self.shards[i])} symbols")
+
+    def check(self):
+        """Restart dead or silent workers (with a doubling backoff for ones that keep failing)."""
+        now = time.monotonic()
+        for i, p in enumerate(self.procs):
+            if p is None:
+                if now >= self.next_start[i]:
+                    self._spawn(i)
+                continue
+            if p.is_alive() and now - self.last_hb[i] <= self.hang_after_s:
+                if now - self.started[i] > 60:
+                    self.backoff[i] = 1.0  # stable again
+                continue
+            if p.is_alive():
+                print(f"[cluster] worker {i} silent for {now - self.last_hb[i]:.0f}s, killing")
+                p.kill()
+            p.join(1)
+            print(f"[cluster] worker {i} exited ({p.exitcode}), restarting in {self.backoff[i]:.0f}s")
+            self.procs[i] = None
+            self.restarts[i] += 1
+            self.next_start[i] = now + self.backoff[i]
+            self.backoff[i] = min(self.backoff[i] * 2, self.restart_max_s)
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        loop = asyncio.get_running_loop()
+        self._reader = threading.Thread(target=self._read, args=(loop,), name="cluster-reader", daemon=True)
+        self._reader.start()
+        for i in range(len(self.shards)):
+            self._spawn(i)
+        stop = stop or asyncio.Event()
+        try:
+            while not stop.is_set():
+                self.check()
+                try:
+                    await asyncio.wait_for(stop.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self, timeout: float = 15.0):
+        """SIGTERM every worker (they drain, checkpoint and exit), then forward what they sent on the way out."""
+        if self._stopping:
+            return
+        self._stopping = True
+        for p in self.procs:
+            if p is not None and p.is_alive():
+                p.terminate()
+        deadline = time.monotonic() + timeout
+        for p in self.procs:
+            if p is not None:
+                await asyncio.to_thread(p.join, max(0.0, deadline - time.monotonic()))
+                if p.is_alive():
+                    p.kill()
+        if self._reader is not None:
+            self.queue.put(None)
+            await asyncio.to_thread(self._reader.join, 5)
+        await asyncio.sleep(0)  # records scheduled by the reader
+
+    def stats(self) -> dict:
+        return {"workers": len(self.shards), "received": sum(self.received), "duplicates": self.duplicates,
+                "restarts": sum(self.restarts)}
+
+    def gauges(self):
+        def collect():
+            up = [({"worker": str(i)}, int(p is not None and p.is_alive())) for i, p in enumerate(self.procs)]
+            return [("signalbot_cluster_worker_up", "gauge", "Worker process alive", up),
+                    ("signalbot_cluster_restarts_total", "counter", "Worker restarts",
+                     [({"worker": str(i)}, n) for i, n in enumerate(self.restarts)]),
+                    ("signalbot_cluster_records_total", "counter", "Records received from workers",
+                     [({"worker": str(i)}, n) for i, n in enumerate(self.received)]),
+                    ("signalbot_cluster_duplicates_total", "counter", "Records dropped as already sent",
+                     [({}, self.duplicates)])]
+        return collect
+
+def coordinator_from_config(raw: dict, sink: Sink, workers: Optional[int] = None) -> Coordinator:
+    cfg = raw.get('cluster', {})
+    return Coordinator(raw, sink, workers=workers or cfg.get('workers', os.cpu_count() or 1),
+                       heartbeat_s=cfg.get('heartbeat_s', 5.0), hang_after_s=cfg.get('hang_after_s', 60.0),
+                       restart_max_s=cfg.get('restart_max_s', 30.0))
+
+async def run(config: str = "config/config.yaml", workers: Optional[int] = None):
+    from .step6_run import NotifierSink
+    raw = Settings.load(config).raw
+    alerts = raw.get('alerts', {})
+    notifier = notifier_from_config(alerts)
+    symbols = [x.upper() for x in raw.get('exchange', {}).get('symbols', ['BTCUSDT'])]
+    tfs = [x.get('tf') for x in raw.get('timeframes', [])]
+    sink = digest_from_config(notifier, alerts, symbols, tfs) or \
+        NotifierSink(notifier, alerts.get('enable_webhook', False), alerts.get('enable_telegram', True))
+    coord = coordinator_from_config(raw, sink, workers)
+    coord.table = table_from_config(raw.get('shm', {}), symbols, tfs)
+    metrics_srv = await metrics.metrics_from_config(raw.get('metrics', {}))
+    metrics.REGISTRY.collectors.append(coord.gauges())
+    print(f"[cluster] {len(symbols)} symbols over {len(coord.shards)} workers")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await coord.run(stop)
+    finally:
+        if isinstance(sink, DigestSink):
+            sink.flush()
+        if coord.table:
+            coord.table.close()
+        await notifier.aclose()
+        print("Cluster:", coord.stats())
+        print("Delivery:", notifier.metrics())
+        if metrics_srv:
+            metrics_srv.close()
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.cluster", description="Run step6 over several worker processes")
+    ap.add_argument("--config", default="config/config.yaml")
+    ap.add_argument("--workers", type=int, help="default: cluster.workers, else the CPU count")
+    a = ap.parse_args()
+    asyncio.run(run(a.config, a.workers))
+
+if __name__ == "__main__":
+    main()
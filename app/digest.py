@@ -0,0 +1,80 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+from .alerts import Notifier, fmt_signal_table
+from .candles import _align_open
+from .pipeline import Sink
+
+class DigestSink(Sink):
+    """Coalesces everything published for one close boundary (payload["closed_at"]) into one Telegram
+    digest (fmt_signal_table, split at Telegram's length limit) and one webhook POST carrying a JSON array
+    of {"type": "signal"|"snapshot", ...} items, gzip-compressed if asked.
+    A boundary flushes as soon as every (symbol, tf) closing on it has reported, or `window` seconds after
+    its first item (warming-up TFs never report). Items arriving after their boundary flushed start a new batch."""
+    def __init__(self, notifier: Notifier, symbols: List[str], tfs: List[str], window: float = 5.0,
+                 enable_webhook: bool = False, enable_telegram: bool = True, gzip: bool = False):
+        self.notifier = notifier
+        self.symbols = [s.upper() for s in symbols]
+        self.tfs = list(tfs)
+        self.window = window
+        self.enable_webhook = enable_webhook
+        self.enable_telegram = enable_telegram
+        self.gzip = gzip
+        self._signals: Dict[int, List[dict]] = {}
+        self._snapshots: Dict[int, Dict[str, dict]] = {}  # latest snapshot per symbol
+        self._seen: Dict[int, Set[Tuple[str, str]]] = {}
+        self._expected: Dict[int, int] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self.items = 0     # signals + snapshots received
+        self.requests = 0  # webhook posts + telegram messages sent out
+
+    def _open(self, t: int):
+        if t in self._signals:
+            return
+        self._signals[t] = []
+        self._snapshots[t] = {}
+        self._seen[t] = set()
+        self._expected[t] = len(self.symbols) * sum(1 for tf in self.tfs if _align_open(t, tf) == t)
+        self._timers[t] = asyncio.get_running_loop().call_later(self.window, self.flush, t)
+
+    def signal(self, payload: dict):
+        t = payload["closed_at"]
+        self.items += 1
+        self._open(t)
+        self._signals[t].append(payload)
+        self._seen[t].add((payload["symbol"], payload["timeframe"]))
+        if len(self._seen[t]) >= self._expected[t]:
+            # Pipeline.publish sends the symbol's snapshot right after this signal; flush once it is in
+            asyncio.get_running_loop().call_soon(self.flush, t)
+
+    def snapshot(self, snap: dict):
+        t = snap["closed_at"]
+        self.items += 1
+        self._open(t)
+        self._snapshots[t][snap["symbol"]] = snap
+
+    def flush(self, t: Optional[int] = None):
+        """Send the batch for boundary `t` (all pending boundaries if None)."""
+        for b in ([t] if t is not None else sorted(self._signals)):
+            if b not in self._signals:
+                continue
+            self._timers.pop(b).cancel()
+            signals = self._signals.pop(b)
+            snapshots = self._snapshots.pop(b)
+            self._seen.pop(b)
+            self._expected.pop(b)
+            if self.enable_webhook and (signals or snapshots):
+                batch = [{"type": "signal", **p} for p in signals] + [{"type": "snapshot", **s} for s in snapshots.values()]
+                self.notifier.post_json(batch, key="digest", compress=self.gzip, closed_at=b)
+                self.requests += 1
+            if self.enable_telegram and signals:
+                for text in fmt_signal_table(signals):
+                    self.notifier.post_telegram(text, closed_at=b)
+                    self.requests += 1
+
+def digest_from_config(notifier: Notifier, alerts: dict, symbols: List[str], tfs: List[str]) -> Optional[DigestSink]:
+    d = alerts.get('digest', {})
+    if not d.get('enabled', False):
+        return None
+    return DigestSink(notifier, symbols, tfs, window=d.get('window', 5.0),
+                      enable_webhook=alerts.get('enable_webhook', False),
+                      enable_telegram=alerts.get('enable_telegram', True), gzip=d.get('gzip', False))
@@ -0,0 +1,275 @@
+import asyncio, time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from . import metrics
+from .candles import Candle
+from .pipeline import Pipeline
+
+# process mode: every worker owns a Pipeline for the (symbol, tf) keys routed to it
+_WORKER_PIPE: Optional[Pipeline] = None
+
+def _init_worker(raw: dict, symbols: List[str], keys: Set[Tuple[str,str]], warmup_cfg: dict):
+    global _WORKER_PIPE
+    _WORKER_PIPE = Pipeline(raw, symbols=symbols)
+    if warmup_cfg.get("archive_dir"):
+        from .warmup import bootstrap
+        p = _WORKER_PIPE
+        bootstrap(warmup_cfg["archive_dir"], sorted({s for s, _ in keys}), p.agg, p.buf, p.engine, p.det,
+                  bars=warmup_cfg.get("bars", 1000), keys=keys)
+
+def _compute_in_worker(closes: List[Candle], newest_only: bool) -> List[dict]:
+    return _WORKER_PIPE.compute_many(closes, newest_only)
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _lag(c_close_ms: int, now: float) -> float:
+    # the aggregator's t_close is the period boundary (t_open + period), not Binance's last-ms stamp
+    return now - c_close_ms / 1000
+
+class CloseDispatcher:
+    """Runs the feature / SR / signal work of each TF close off the event loop.
+    - mode "inline" computes inside on_close (the old behaviour), "thread" / "process" use worker shards
+    - each (symbol, tf) is pinned to one single-worker shard, so its closes are computed in order
+    - results come back to the loop and are published there; wait_capacity() bounds the jobs in flight
+    - a process shard whose worker dies is replaced by a fresh one, re-seeded from the archive like at startup
+    Load shedding (shed=True) for when the pipeline falls behind: every close still updates indicators and
+    SR zones, but a (symbol, tf) with several closes waiting only gets its newest one evaluated and published.
+    Inline, a close more than max_lag seconds behind the wall clock is held until the ingest loop next yields,
+    so a backlog or a backfill burst collapses to one evaluation per key; on the pools, closes arriving while
+    their key is still being computed are batched into its next job. Independently of shed, a result more than
+    stale_after seconds old is tagged ("stale", "lag_s") or, with stale_action="drop", not sent.
+    batch=True (inline): closes are collected until the ingest loop yields and their indicators computed per TF in
+    one vectorized pass (Pipeline.update_batch), so a boundary where every symbol closes costs one pass per TF."""
+    def __init__(self, pipe: Pipeline, mode: str = "inline", workers: int = 4, max_inflight: int = 256,
+                 raw: Optional[dict] = None, warmup_cfg: Optional[dict] = None, shed: bool = False,
+                 max_lag: float = 30.0, stale_after: float = 0.0, stale_action: str = "tag",
+                 batch: bool = False, clock: Callable[[], float] = time.time):
+        self.pipe = pipe
+        self.mode = mode
+        self.max_inflight = max_inflight
+        self.shed = shed
+        self.max_lag = max_lag
+        self.stale_after = stale_after
+        self.stale_action = stale_action
+        self.batch = batch
+        self.clock = clock
+        self.inflight = 0
+        self.completed = 0
+        self.shed_count = 0  # closes that updated state but were never evaluated
+        self.stale = 0       # results past stale_after (tagged or dropped)
+        self.restarts = 0    # process shards replaced after their worker died
+        self.lag = 0.0       # lag of the last close seen, seconds
+        self.max_lag_seen = 0.0
+        self._room = asyncio.Event()
+        self._room.set()
+        self._shard_of: Dict[Tuple[str,str], int] = {}
+        self._held: Dict[Tuple[str,str], tuple] = {}         # inline: key -> (close, indicator row) to evaluate
+        self._held_since = 0.0
+        self._burst: List[Tuple[Candle, float]] = []          # inline batch: (close, lag) waiting for the next yield
+        self._running: Set[Tuple[str,str]] = set()           # pools: keys with a job in flight
+        self._backlog: Dict[Tuple[str,str], List[Candle]] = {}
+        if stale_action not in ("tag", "drop"):
+            raise ValueError(f"Unsupported stale_action: {stale_action}")
+        n_keys = len(pipe.symbols) * len(pipe.tfs)
+        self.shards: List[Executor] = []
+        if mode == "inline":
+            pipe.agg.on_close = self._inline
+            return
+        workers = max(1, min(workers, n_keys))
+        for i, sym in enumerate(pipe.symbols):
+            for j, tf in enumerate(pipe.tfs):
+                self._shard_of[(sym, tf)] = (i * len(pipe.tfs) + j) % workers
+        if mode == "thread":
+            self.shards = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"close-{i}") for i in range(workers)]
+        elif mode == "process":
+            self._init_args = (raw or {}, warmup_cfg or {})
+            self.shards = [self._pool(i) for i in range(workers)]
+        else:
+            raise ValueError(f"Unsupported execution mode: {mode}")
+        pipe.agg.on_close = self.submit
+
+    def _pool(self, i: int) -> ProcessPoolExecutor:
+        raw, warmup_cfg = self._init_args
+        keys = {k for k, s in self._shard_of.items() if s == i}
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                   initargs=(raw, self.pipe.symbols, keys, warmup_cfg))
+
+    def _restart(self, i: int, broken: Executor):
+        # a dead worker (OOM kill, segfault) breaks its pool for good: replace it with one that re-seeds the
+        # shard's keys from the archive as at startup; closes between the last archived minute and now are lost
+        if self.shards[i] is not broken:
+            return  # already replaced on an earlier failure of the same pool
+        self.restarts += 1
+        print(f"close worker {i} died, restarting it")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.shards[i] = self._pool(i)
+
+    def _observe(self, c: Candle) -> float:
+        lag = self.lag = _lag(c.t_close, self.clock())
+        if lag > self.max_lag_seen:
+            self.max_lag_seen = lag
+        return lag
+
+    def _inline(self, c: Candle):
+        lag = self._observe(c)
+        self.completed += 1
+        if self.batch:
+            loop = _running_loop()
+            if loop is not None:
+                if not self._burst:
+                    loop.call_soon(self._flush)
+                self._burst.append((c, lag))
+                return
+        if not self.shed:
+            self._publish(self.pipe.compute(c))
+            return
+        tick = metrics.ticker(c.symbol, c.tf)
+        self._settle(c, self.pipe.update(c, tick), lag, tick)
+
+    def _settle(self, c: Candle, row: Optional[dict], lag: float, tick):
+        # state is updated: evaluate now, or (shed, behind) hold it until the ingest loop next yields
+        key = (c.symbol, c.tf)
+        if self._held.pop(key, None) is not None:
+            self.shed_count += 1  # superseded before its turn came
+        if row is None:
+            return
+        if self.shed and lag > self.max_lag:
+            loop = _running_loop()
+            if loop is not None:  # outside a loop nothing can pile up behind this close
+                if not self._held:
+                    self._held_since = time.monotonic()
+                    loop.call_soon(self._release)
+                self._held[key] = (c, row)
+                return
+        self._publish(self.pipe.evaluate(c, row, tick))
+
+    def _flush(self):
+        # a key closing twice in one burst (a backlog) goes in rounds, so each close is evaluated before the next
+        burst, self._burst = self._burst, []
+        while burst:
+            seen, now, later = set(), [], []
+            for item in burst:
+                key = (item[0].symbol, item[0].tf)
+                (later if key in seen else now).append(item)
+                seen.add(key)
+            try:
+                rows = self.pipe.update_batch([c for c, _ in now])
+            except Exception as e:  # as on_close per close: report and lose this round, not the rest of the burst
+                print("on_close error:", e)
+                rows = [None] * len(now)
+            for (c, lag), row in zip(now, rows):
+                try:
+                    self._settle(c, row, lag, metrics.ticker(c.symbol, c.tf))
+                except Exception as e:
+                    print("on_close error:", e)
+            burst = later
+
+    def _release(self):
+        held, self._held = self._held, {}
+        for c, row in held.values():
+            self._publish(self.pipe.evaluate(c, row, metrics.ticker(c.symbol, c.tf)))
+
+    def _publish(self, payload: Optional[dict]):
+        if payload is None:
+            return
+        lag = _lag(payload["closed_at"], self.clock())
+        if self.stale_after and lag > self.stale_after:
+            self.stale += 1
+            if self.stale_action == "drop":
+                self.pipe.remember(payload)  # snapshots stay current
+                return
+            payload["stale"] = True
+            payload["lag_s"] = round(lag, 1)
+        try:
+            self.pipe.publish(payload)
+        except Exception as e:
+            print("publish error:", e)
+
+    def submit(self, c: Candle):
+        self._observe(c)
+        key = (c.symbol, c.tf)
+        if self.shed and key in self._running:
+            self._backlog.setdefault(key, []).append(c)
+            return
+        self._run(key, [c])
+
+    def _run(self, key: Tuple[str,str], closes: List[Candle]):
+        i = self._shard_of[key]
+        shard = self.shards[i]
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            fut = loop.run_in_executor(shard, self.pipe.compute_many, closes, self.shed)
+        else:
+            try:
+                fut = loop.run_in_executor(shard, _compute_in_worker, closes, self.shed)
+            except BrokenProcessPool:
+                self._restart(i, shard)
+                shard = self.shards[i]
+                fut = loop.run_in_executor(shard, _compute_in_worker, closes, self.shed)
+        if self.shed:
+            self._running.add(key)
+            self.shed_count += len(closes) - 1
+        self.inflight += 1
+        if self.inflight >= self.max_inflight:
+            self._room.clear()
+        fut.add_done_callback(partial(self._done, key, len(closes), shard))
+
+    def _done(self, key: Tuple[str,str], n: int, shard: Executor, fut: asyncio.Future):
+        # runs on the loop; a shard finishes its jobs in order, so each (symbol, tf) publishes in order
+        self.inflight -= 1
+        self.completed += n
+        if self.inflight < self.max_inflight:
+            self._room.set()
+        try:
+            payloads = fut.result()
+        except Exception as e:
+            print("on_close error:", e)
+            payloads = []
+            if isinstance(e, BrokenProcessPool):
+                self._restart(self._shard_of[key], shard)
+        for payload in payloads:
+            self._publish(payload)
+        backlog = self._backlog.pop(key, None)
+        if backlog:
+            self._run(key, backlog)
+        else:
+            self._running.discard(key)
+
+    async def wait_capacity(self):
+        """Back-pressure for the ingest loop: returns once fewer than max_inflight closes are pending.
+        Inline, it also yields once a second while closes are held, so a backlog that never drains
+        still publishes its newest results, and once max_inflight closes wait for a batch."""
+        if (self._held and time.monotonic() - self._held_since > 1.0) or len(self._burst) >= self.max_inflight:
+            await asyncio.sleep(0)
+        if self.inflight >= self.max_inflight:
+            await self._room.wait()
+
+    async def drain(self):
+        if self._burst:
+            self._flush()
+        if self._held:
+            self._release()
+        while self.inflight:
+            await asyncio.sleep(0.001)
+
+    def stats(self) -> dict:
+        return {"completed": self.completed, "shed": self.shed_count, "stale": self.stale, "restarts": self.restarts,
+                "lag_s": round(self.lag, 1), "max_lag_s": round(self.max_lag_seen, 1)}
+
+    def close(self):
+        for ex in self.shards:
+            ex.shutdown(wait=False, cancel_futures=True)
+
+def dispatcher_from_config(pipe: Pipeline, raw: dict) -> CloseDispatcher:
+    cfg = raw.get('execution', {})
+    return CloseDispatcher(pipe, mode=cfg.get('mode', 'inline'), workers=cfg.get('workers', 4),
+                           max_inflight=cfg.get('max_inflight', 256), raw=raw, warmup_cfg=raw.get('warmup', {}),
+                           shed=cfg.get('shed', True), max_lag=cfg.get('max_lag_s', 30.0),
+                           stale_after=cfg.get('stale_after_s', 120.0), stale_action=cfg.get('stale_action', 'tag'),
+                           batch=cfg.get('batch', True))
@@ -0,0 +1,77 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Minimal HTTP/1.1 server for local endpoints (metrics, queries): GET/POST, Content-Length bodies, keep-alive.
+# Routes are exact paths, or prefixes when they end in "/" (the handler parses the rest of req.path).
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]  # lower-case names
+    body: bytes = b""
+
+Response = Tuple[int, Dict[str, str], bytes]
+Handler = Callable[[Request], Awaitable[Response]]
+
+_REASONS = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+def _route(routes: Dict[str, Handler], prefixes: List[str], path: str) -> Optional[Handler]:
+    handler = routes.get(path)
+    if handler is None:
+        for p in prefixes:
+            if path.startswith(p):
+                return routes[p]
+    return handler
+
+async def _handle(routes: Dict[str, Handler], prefixes: List[str], reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {k.strip().lower(): v.strip() for k, _, v in (x.partition(":") for x in lines[1:] if x)}
+            body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+            u = urlparse(target)
+            req = Request(method, u.path, {k: v[0] for k, v in parse_qs(u.query).items()}, headers, body)
+            handler = _route(routes, prefixes, u.path)
+            if handler is None:
+                status, hdrs, out = 404, {"Content-Type": "text/plain"}, b"not found\n"
+            else:
+                try:
+                    status, hdrs, out = await handler(req)
+                except Exception as e:
+                    print("httpd handler error:", e)
+                    status, hdrs, out = 500, {"Content-Type": "text/plain"}, b"internal error\n"
+            hdr = "".join(f"{k}: {v}\r\n" for k, v in hdrs.items())
+            writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n{hdr}Content-Length: {len(out)}\r\n\r\n".encode()
+                         + (out if method != "HEAD" else b""))
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(routes: Dict[str, Handler], host: str = "127.0.0.1", port: int = 0,
+                max_connections: int = 0) -> asyncio.AbstractServer:
+    """Start serving `routes` (path or "/prefix/" -> async handler); port 0 picks a free one (see server.sockets).
+    max_connections > 0: connections beyond that many open ones are closed right away."""
+    prefixes = sorted((p for p in routes if p.endswith("/")), key=len, reverse=True)
+    open_ = [0]
+
+    async def conn(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if max_connections and open_[0] >= max_connections:
+            writer.close()
+            return
+        open_[0] += 1
+        try:
+            await _handle(routes, prefixes, reader, writer)
+        finally:
+            open_[0] -= 1
+    return await asyncio.start_server(conn, host, port)
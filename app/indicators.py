@@ -1,5 +1,8 @@
+import math, threading
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class IndicatorParams:
     def __init__(self, cfg: dict):
@@ -15,6 +18,7 @@ class IndicatorParams:
         self.adx_len = cfg.get("adx_length", 14)
 
 def compute_features(df: pd.DataFrame, p: IndicatorParams) -> pd.DataFrame:
+    import pandas_ta as ta  # only the batch path needs it; the streaming engine below runs without
     out = df.copy()
     out["ema_fast"] = ta.ema(out["close"], length=p.ema_fast)
     out["ema_slow"] = ta.ema(out["close"], length=p.ema_slow)
@@ -25,7 +29,8 @@ def compute_features(df: pd.DataFrame, p: IndicatorParams) -> pd.DataFrame:
     bb = ta.bbands(out["close"], length=p.bb_len, std=p.bb_std)
     if bb is not None:
         out = out.join(bb)
-        out["bb_width"] = (out["BBU_"+str(p.bb_len)+"_"+str(p.bb_std)] - out["BBL_"+str(p.bb_len)+"_"+str(p.bb_std)]) / out["close"]
+        # columns are BBL, BBM, BBU, BBB, BBP; pandas_ta formats std as float ("BBU_20_2.0")
+        out["bb_width"] = (bb.iloc[:, 2] - bb.iloc[:, 0]) / out["close"]
     out["atr"] = ta.atr(out["high"], out["low"], out["close"], length=p.atr_len)
     adx = ta.adx(out["high"], out["low"], out["close"], length=p.adx_len)
     if adx is not None:
@@ -35,20 +40,415 @@ def compute_features(df: pd.DataFrame, p: IndicatorParams) -> pd.DataFrame:
     out["trend_bear"] = (out["ema_fast"] < out["ema_slow"]) & (out["adx"] > 0)
     return out
 
+# ---------------------------------------------------------------------------
+# Streaming indicators: same columns as compute_features, O(1) work per bar.
+# Recurrences mirror pandas_ta so values agree once the series is warmed up.
+# ---------------------------------------------------------------------------
+NAN = float("nan")
+
+# Engine state is one float64 row per (symbol, tf): n, prev_h, prev_l, prev_c, then (n, acc, value) per EMA
+# and (n, num, den) per RMA (checkpoint stores rows in this layout). The rows of one TF sit back to back in
+# one array.array, read in place by update() and viewed as a (symbols x _WIDTH) matrix by update_batch().
+_EMAS = ("ema_fast", "ema_slow", "macd_fast", "macd_slow", "macd_signal")
+_RMAS = ("rsi_up", "rsi_dn", "atr", "adx_atr", "adx_pos", "adx_neg", "adx")
+_COL = {name: 4 + 3 * i for i, name in enumerate(_EMAS + _RMAS)}
+_WIDTH = 4 + 3 * (len(_EMAS) + len(_RMAS))
+_INIT = array("d", [0.0, NAN, NAN, NAN] + [v for x in _EMAS + _RMAS for v in ((0.0, 0.0, NAN) if x in _EMAS else (0.0, 0.0, 0.0))])
+
+def _ema(s: list, x: float, q: tuple) -> float:
+    """pandas_ta ema: SMA of the first `length` values, then ewm(span=length, adjust=False).
+    s is a state row, q = (column, length, alpha)."""
+    j, length, alpha = q
+    n = s[j] = s[j] + 1.0
+    if n < length:
+        s[j + 1] += x
+    elif n == length:
+        s[j + 2] = (s[j + 1] + x) / length
+    else:
+        s[j + 2] = s[j + 2] + alpha * (x - s[j + 2])
+    return s[j + 2]
+
+def _rma(s: list, x: float, q: tuple) -> float:
+    """pandas_ta rma: ewm(alpha=1/length, min_periods=length) over non-NaN input. q = (column, length, decay)."""
+    j, length, decay = q
+    if x != x:  # NaN: weights keep decaying, value unchanged
+        if s[j]:
+            s[j + 1] *= decay
+            s[j + 2] *= decay
+    else:
+        s[j] += 1.0
+        s[j + 1] = s[j + 1] * decay + x
+        s[j + 2] = s[j + 2] * decay + 1.0
+    return s[j + 1] / s[j + 2] if s[j] >= length else NAN
+
+def _ema_v(S: np.ndarray, x: np.ndarray, q: tuple, ok=None) -> np.ndarray:
+    # _ema on every row of S at once; rows where ok is False are left untouched
+    j, length, alpha = q
+    n, acc, val = S[:, j] + 1.0, S[:, j + 1], S[:, j + 2]
+    new_acc = np.where(n < length, acc + x, acc)
+    new_val = np.where(n == length, (acc + x) / length, np.where(n > length, val + alpha * (x - val), val))
+    if ok is not None:
+        n, new_acc, new_val = np.where(ok, n, S[:, j]), np.where(ok, new_acc, acc), np.where(ok, new_val, val)
+    S[:, j], S[:, j + 1], S[:, j + 2] = n, new_acc, new_val
+    return new_val
+
+def _rma_v(S: np.ndarray, x: np.ndarray, q: tuple) -> np.ndarray:
+    j, length, decay = q
+    n, num, den = S[:, j], S[:, j + 1], S[:, j + 2]
+    skip = x != x
+    keep = skip & (n == 0)
+    n = S[:, j] = np.where(skip, n, n + 1.0)
+    num = S[:, j + 1] = np.where(keep, num, np.where(skip, num * decay, num * decay + x))
+    den = S[:, j + 2] = np.where(keep, den, np.where(skip, den * decay, den * decay + 1.0))
+    return np.where(n >= length, num / den, NAN)
+
+class _Block:
+    """One TF's engine state. Row i of S (_WIDTH values) and W (the last bb_length closes, oldest first,
+    NaN before there are that many) belong to syms[i]. update() works on hot[i], a list copy of row i that is
+    written back (dirty) before the matrices are next read, so a run of scalar updates never converts."""
+    __slots__ = ("S", "W", "bb_len", "rows", "syms", "last", "hot", "dirty", "lock")
+    def __init__(self, bb_len: int):
+        self.S = array("d")
+        self.W = array("d")
+        self.bb_len = bb_len
+        self.rows: Dict[str, int] = {}
+        self.syms: List[str] = []
+        self.last: List[Optional[dict]] = []
+        self.hot: List[Optional[list]] = []
+        self.dirty: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def row(self, symbol: str) -> int:
+        i = self.rows.get(symbol)
+        if i is None:
+            with self.lock:  # thread mode: shards add symbols of one TF concurrently
+                i = self.rows.get(symbol)
+                if i is None:
+                    i = len(self.syms)
+                    self.syms.append(symbol)
+                    self.last.append(None)
+                    self.hot.append(None)
+                    self.S.extend(_INIT)
+                    self.W.extend(array("d", [NAN]) * self.bb_len)
+                    self.rows[symbol] = i  # last: whoever finds the symbol finds its row complete
+        return i
+
+    def state(self, i: int) -> list:
+        s = self.hot[i]
+        if s is None:
+            s = self.hot[i] = self.S[i * _WIDTH:(i + 1) * _WIDTH].tolist()
+        self.dirty.add(i)
+        return s
+
+    def put(self, i: int, s: list, win: list):
+        self.S[i * _WIDTH:(i + 1) * _WIDTH] = array("d", s)
+        self.W[(i + 1) * self.bb_len - len(win):(i + 1) * self.bb_len] = array("d", win)
+        self.hot[i] = None
+        self.dirty.discard(i)
+
+    def matrices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy (symbols x _WIDTH) and (symbols x bb_length) views; S / W cannot grow while one is alive.
+        Rows written through them must drop their hot copy."""
+        for i in self.dirty:
+            self.S[i * _WIDTH:(i + 1) * _WIDTH] = array("d", self.hot[i])
+        self.dirty.clear()
+        return (np.frombuffer(self.S, dtype=np.float64).reshape(-1, _WIDTH),
+                np.frombuffer(self.W, dtype=np.float64).reshape(-1, self.bb_len))
+
+class IndicatorEngine:
+    """Stateful per-(symbol, tf) counterpart of compute_features.
+    - update() consumes one closed candle and returns the row compute_features(df).iloc[-1] would give
+    - update_batch() does the same for one close of each of many symbols of a TF, vectorized across symbols
+    - only the incremental state is kept (EMA/RMA accumulators and a bb_length window), never the history
+    Both paths run the same float operations in the same order, so they give bit-identical rows."""
+    def __init__(self, p: IndicatorParams):
+        self.p = p
+        self.blocks: Dict[str, _Block] = {}
+        self._lock = threading.Lock()
+        self._macd_cols = tuple(f"{x}_{p.macd_fast}_{p.macd_slow}_{p.macd_signal}" for x in ("MACD", "MACDh", "MACDs"))
+        self._bb_cols = tuple(f"{x}_{p.bb_len}_{float(p.bb_std)}" for x in ("BBL", "BBM", "BBU", "BBB", "BBP"))
+        self._cols = ("open", "high", "low", "close", "volume", "ema_fast", "ema_slow", "rsi") + self._macd_cols \
+            + self._bb_cols + ("bb_width", "atr", "adx")
+        lens = {"ema_fast": p.ema_fast, "ema_slow": p.ema_slow, "macd_fast": p.macd_fast, "macd_slow": p.macd_slow,
+                "macd_signal": p.macd_signal, "rsi_up": p.rsi_len, "rsi_dn": p.rsi_len, "atr": p.atr_len,
+                "adx_atr": p.adx_len, "adx_pos": p.adx_len, "adx_neg": p.adx_len, "adx": p.adx_len}
+        # q = (column, length, alpha / decay) per recurrence, for _ema / _rma
+        self._e = {x: (_COL[x], lens[x], 2.0 / (lens[x] + 1)) for x in _EMAS}
+        self._r = {x: (_COL[x], lens[x], 1.0 - 1.0 / lens[x]) for x in _RMAS}
+
+    def _block(self, tf: str) -> _Block:
+        b = self.blocks.get(tf)
+        if b is None:
+            with self._lock:
+                b = self.blocks.get(tf)
+                if b is None:
+                    b = self.blocks[tf] = _Block(self.p.bb_len)
+        return b
+
+    def keys(self) -> List[Tuple[str,str]]:
+        return [(sym, tf) for tf, b in self.blocks.items() for sym in b.syms]
+
+    def count(self, symbol: str, tf: str) -> int:
+        b = self.blocks.get(tf.upper())
+        i = b.rows.get(symbol.upper()) if b else None
+        if i is None:
+            return 0
+        s = b.hot[i]
+        return int(b.S[i * _WIDTH] if s is None else s[0])
+
+    def last(self, symbol: str, tf: str) -> Optional[dict]:
+        b = self.blocks.get(tf.upper())
+        i = b.rows.get(symbol.upper()) if b else None
+        return None if i is None else b.last[i]
+
+    def update(self, symbol: str, tf: str, t_close: int, o: float, h: float, l: float, c: float, v: float) -> dict:
+        b = self._block(tf.upper())
+        i = b.row(symbol.upper())
+        p, e, r = self.p, self._e, self._r
+        s = b.state(i)
+        s[0] += 1.0
+        pc = s[3]
+
+        ema_fast = _ema(s, c, e["ema_fast"])
+        ema_slow = _ema(s, c, e["ema_slow"])
+
+        # RSI (Wilder): rma of gains / losses of close.diff()
+        d = c - pc
+        if d != d:
+            up = dn = NAN
+        else:
+            up = d if d > 0 else 0.0
+            dn = -d if d < 0 else 0.0
+        avg_up = _rma(s, up, r["rsi_up"])
+        avg_dn = _rma(s, dn, r["rsi_dn"])
+        rsi = 100.0 * avg_up / (avg_up + avg_dn) if (avg_up + avg_dn) else NAN
+
+        # MACD: the signal EMA starts at the first valid MACD value
+        fast = _ema(s, c, e["macd_fast"])
+        slow = _ema(s, c, e["macd_slow"])
+        macd = fast - slow
+        if macd == macd:
+            signal = _ema(s, macd, e["macd_signal"])
+        else:
+            signal = NAN
+        hist = macd - signal
+
+        # Bollinger: SMA +/- std * population stdev over bb_length closes, summed left to right
+        W, L = b.W, p.bb_len
+        w = i * L
+        W[w:w + L - 1] = W[w + 1:w + L]
+        W[w + L - 1] = c
+        if s[0] >= L:
+            win = W[w:w + L]
+            acc = 0.0
+            for x in win:
+                acc += x
+            mid = acc / L
+            acc = 0.0
+            for x in win:
+                acc += (x - mid) * (x - mid)
+            dev = p.bb_std * math.sqrt(acc / L)
+            lower, upper = mid - dev, mid + dev
+            bbb = 100.0 * (upper - lower) / mid if mid else NAN
+            bbp = (c - lower) / (upper - lower) if upper != lower else NAN
+            bb_width = (upper - lower) / c if c else NAN
+        else:
+            lower = mid = upper = bbb = bbp = bb_width = NAN
+
+        # ATR / ADX on true range and directional movement
+        if pc != pc:
+            tr = up_move = dn_move = NAN
+        else:
+            tr = max(h - l, abs(h - pc), abs(pc - l))
+            up_move = h - s[1]
+            dn_move = s[2] - l
+        atr = _rma(s, tr, r["atr"])
+        adx_atr = _rma(s, tr, r["adx_atr"])
+        if tr != tr:
+            pos = neg = NAN
+        else:
+            pos = up_move if (up_move > dn_move and up_move > 0) else 0.0
+            neg = dn_move if (dn_move > up_move and dn_move > 0) else 0.0
+        k = 100.0 / adx_atr if adx_atr else NAN
+        dmp = k * _rma(s, pos, r["adx_pos"])
+        dmn = k * _rma(s, neg, r["adx_neg"])
+        dx = 100.0 * abs(dmp - dmn) / (dmp + dmn) if (dmp + dmn) else NAN
+        adx = _rma(s, dx, r["adx"])
+
+        s[1], s[2], s[3] = h, l, c
+        mc, mh, ms = self._macd_cols
+        bl, bm, bu, bbw, bp = self._bb_cols
+        row = {
+            "open": o, "high": h, "low": l, "close": c, "volume": v,
+            "ema_fast": ema_fast, "ema_slow": ema_slow, "rsi": rsi,
+            mc: macd, mh: hist, ms: signal,
+            bl: lower, bm: mid, bu: upper, bbw: bbb, bp: bbp, "bb_width": bb_width,
+            "atr": atr, "adx": adx,
+            "trend_bull": ema_fast > ema_slow and adx > 0,
+            "trend_bear": ema_fast < ema_slow and adx > 0,
+        }
+        b.last[i] = row
+        return row
+
+    def update_batch(self, tf: str, symbols: List[str], t_close, o, h, l, c, v) -> List[dict]:
+        """update() for one close of each of `symbols` (no repeats), all of TF `tf`: the state rows are
+        gathered into one matrix and every indicator runs once over all of them. o..v are arrays or lists
+        aligned with symbols; returns the rows in the same order."""
+        b = self._block(tf.upper())
+        get = b.rows.get
+        ids = [get(x) for x in symbols]
+        if None in ids:  # new or lower-case symbols
+            ids = [b.row(x.upper()) for x in symbols]
+        idx = np.array(ids, dtype=np.int64)
+        if len(np.unique(idx)) != len(idx):
+            raise ValueError("update_batch: at most one close per symbol")
+        o, h, l, c, v = (np.asarray(x, dtype=np.float64) for x in (o, h, l, c, v))
+        p, e, r = self.p, self._e, self._r
+        Sv, Wv = b.matrices()
+        S = Sv[idx]
+        S[:, 0] += 1.0
+        pc = S[:, 3]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ema_fast = _ema_v(S, c, e["ema_fast"])
+            ema_slow = _ema_v(S, c, e["ema_slow"])
+
+            d = c - pc
+            nan_d = d != d
+            up = np.where(nan_d, NAN, np.where(d > 0, d, 0.0))
+            dn = np.where(nan_d, NAN, np.where(d < 0, -d, 0.0))
+            avg_up = _rma_v(S, up, r["rsi_up"])
+            avg_dn = _rma_v(S, dn, r["rsi_dn"])
+            ud = avg_up + avg_dn
+            rsi = np.where(ud != 0, 100.0 * avg_up / ud, NAN)
+
+            fast = _ema_v(S, c, e["macd_fast"])
+            slow = _ema_v(S, c, e["macd_slow"])
+            macd = fast - slow
+            ok = macd == macd
+            signal = np.where(ok, _ema_v(S, np.where(ok, macd, 0.0), e["macd_signal"], ok), NAN)
+            hist = macd - signal
+
+            W = Wv[idx]
+            W[:, :-1] = W[:, 1:]
+            W[:, -1] = c
+            Wv[idx] = W
+            full = S[:, 0] >= p.bb_len
+            acc = np.zeros(len(idx))
+            for j in range(p.bb_len):
+                acc += W[:, j]
+            mid = acc / p.bb_len
+            acc = np.zeros(len(idx))
+            for j in range(p.bb_len):
+                x = W[:, j] - mid
+                acc += x * x
+            dev = p.bb_std * np.sqrt(acc / p.bb_len)
+            lower, upper = mid - dev, mid + dev
+            bbb = np.where(mid != 0, 100.0 * (upper - lower) / mid, NAN)
+            bbp = np.where(upper != lower, (c - lower) / (upper - lower), NAN)
+            bb_width = np.where(c != 0, (upper - lower) / c, NAN)
+            lower, mid, upper, bbb, bbp, bb_width = (np.where(full, x, NAN) for x in (lower, mid, upper, bbb, bbp, bb_width))
+
+            first = pc != pc
+            tr = np.where(first, NAN, np.maximum(np.maximum(h - l, np.abs(h - pc)), np.abs(pc - l)))
+            up_move = h - S[:, 1]
+            dn_move = S[:, 2] - l
+            atr = _rma_v(S, tr, r["atr"])
+            adx_atr = _rma_v(S, tr, r["adx_atr"])
+            pos = np.where(first, NAN, np.where((up_move > dn_move) & (up_move > 0), up_move, 0.0))
+            neg = np.where(first, NAN, np.where((dn_move > up_move) & (dn_move > 0), dn_move, 0.0))
+            k = np.where(adx_atr != 0, 100.0 / adx_atr, NAN)
+            dmp = k * _rma_v(S, pos, r["adx_pos"])
+            dmn = k * _rma_v(S, neg, r["adx_neg"])
+            pn = dmp + dmn
+            dx = np.where(pn != 0, 100.0 * np.abs(dmp - dmn) / pn, NAN)
+            adx = _rma_v(S, dx, r["adx"])
+
+        S[:, 1], S[:, 2], S[:, 3] = h, l, c
+        Sv[idx] = S
+        del Sv, Wv
+        hot = b.hot
+        for i in idx.tolist():
+            hot[i] = None
+        cols = self._cols
+        vals = np.stack((o, h, l, c, v, ema_fast, ema_slow, rsi, macd, hist, signal,
+                         lower, mid, upper, bbb, bbp, bb_width, atr, adx), axis=1).tolist()
+        bull = ((ema_fast > ema_slow) & (adx > 0)).tolist()
+        bear = ((ema_fast < ema_slow) & (adx > 0)).tolist()
+        out = []
+        for i, x, tb, tr in zip(idx.tolist(), vals, bull, bear):
+            row = dict(zip(cols, x))
+            row["trend_bull"], row["trend_bear"] = tb, tr
+            b.last[i] = row
+            out.append(row)
+        return out
+
+OHLCV_COLS = ("open", "high", "low", "close", "volume")
+
+class _Ring:
+    """Fixed-capacity columnar ring. Every value is written twice (slot i and i+cap) so the
+    last n rows are always one contiguous slice: O(1) append and zero-copy reads."""
+    __slots__ = ("cap", "n", "end", "t", "x")
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.n = 0
+        self.end = 2 * cap  # one past the newest row's upper copy, always in (cap, 2*cap]
+        self.t = np.zeros(2 * cap, dtype=np.int64)
+        self.x = np.zeros((len(OHLCV_COLS), 2 * cap), dtype=np.float64)
+    def append(self, t: int, row: tuple):
+        i = self.end - self.cap
+        if i == self.cap:
+            i = 0
+        j = i + self.cap
+        self.t[i] = self.t[j] = t
+        self.x[:, i] = row
+        self.x[:, j] = row
+        self.end = j + 1
+        if self.n < self.cap:
+            self.n += 1
+    def window(self) -> slice:
+        return slice(self.end - self.n, self.end)
+    @property
+    def nbytes(self) -> int:
+        return self.t.nbytes + self.x.nbytes
+
 class SeriesBuffer:
-    def __init__(self):
-        self.store = {}  # (symbol, tf) -> list[dict]
+    """Closed-candle history per (symbol, tf) in preallocated NumPy rings of `capacity` rows.
+    - arrays()/df() return views into the ring: valid until the next append on that key, copy() to keep
+    """
+    def __init__(self, capacity: int = 5000):
+        self.capacity = capacity
+        self.store: Dict[Tuple[str,str], _Ring] = {}
     def append(self, symbol: str, tf: str, t_close: int, o: float, h: float, l: float, c: float, v: float):
         key = (symbol.upper(), tf.upper())
-        self.store.setdefault(key, []).append({"t": t_close, "open": o, "high": h, "low": l, "close": c, "volume": v})
-        # limit size
-        if len(self.store[key]) > 5000:
-            self.store[key] = self.store[key][-4000:]
+        ring = self.store.get(key)
+        if ring is None:
+            ring = self.store[key] = _Ring(self.capacity)
+        ring.append(t_close, (o, h, l, c, v))
+    def size(self, symbol: str, tf: str) -> int:
+        ring = self.store.get((symbol.upper(), tf.upper()))
+        return ring.n if ring else 0
+    def arrays(self, symbol: str, tf: str) -> Dict[str, np.ndarray]:
+        """Contiguous views {"t", "open", "high", "low", "close", "volume"} over the stored rows (oldest first)."""
+        ring = self.store.get((symbol.upper(), tf.upper()))
+        if ring is None:
+            out = {"t": np.empty(0, dtype=np.int64)}
+            out.update((k, np.empty(0)) for k in OHLCV_COLS)
+            return out
+        w = ring.window()
+        out = {"t": ring.t[w]}
+        for k, col in zip(OHLCV_COLS, ring.x[:, w]):
+            out[k] = col
+        return out
     def df(self, symbol: str, tf: str) -> pd.DataFrame:
-        key = (symbol.upper(), tf.upper())
-        arr = self.store.get(key, [])
-        if not arr:
+        ring = self.store.get((symbol.upper(), tf.upper()))
+        if ring is None or not ring.n:
             return pd.DataFrame(columns=["t","open","high","low","close","volume"]).set_index("t")
-        df = pd.DataFrame(arr)
-        df = df.set_index("t")
-        return df
+        w = ring.window()
+        # a 2-D block view becomes the frame's single float block without copying
+        return pd.DataFrame(ring.x[:, w].T, index=pd.Index(ring.t[w], name="t"), columns=list(OHLCV_COLS), copy=False)
+    def nbytes(self, symbol: Optional[str] = None, tf: Optional[str] = None) -> int:
+        """Memory held by the rings: one (symbol, tf) when given, otherwise the whole buffer."""
+        if symbol is not None and tf is not None:
+            ring = self.store.get((symbol.upper(), tf.upper()))
+            return ring.nbytes if ring else 0
+        return sum(r.nbytes for r in self.store.values())
@@ -0,0 +1,156 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .httpd import Request, Response, serve
+
+# In-process histograms / counters rendered in Prometheus text format. Off by default (replays, benchmarks);
+# step6 turns them on from config. Call sites check ENABLED first, so the off switch costs one attribute read.
+ENABLED = False
+
+# seconds: 1us .. 60s
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    """Fixed buckets; one [count per bucket..., +Inf count, sum] list per label tuple."""
+    __slots__ = ("name", "help", "labels", "buckets", "series", "_le")
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[tuple, list] = {}
+        self._le = [f'le="{b:g}"' for b in self.buckets] + ['le="+Inf"']
+
+    def child(self, *label_values) -> list:
+        """The series list for these labels; hot paths keep it and update it in place (see ticker)."""
+        s = self.series.get(label_values)
+        if s is None:
+            s = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        return s
+
+    def observe(self, value: float, *label_values):
+        s = self.series.get(label_values)
+        if s is None:
+            s = self.child(*label_values)
+        s[bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for lv, s in list(self.series.items()):
+            acc = 0
+            for le, n in zip(self._le, s):
+                acc += n
+                out.append(f"{self.name}_bucket{_labels(self.labels, lv, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labels, lv)} {s[-1]:.9g}")
+            out.append(f"{self.name}_count{_labels(self.labels, lv)} {acc}")
+        return out
+
+class Counter:
+    __slots__ = ("name", "help", "labels", "series")
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, n: float = 1):
+        self.series[label_values] = self.series.get(label_values, 0) + n
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_labels(self.labels, lv)} {v:g}" for lv, v in list(self.series.items())]
+        return out
+
+# a collector returns (name, type, help, [(labels dict, value)]) for state that lives elsewhere (queues, sockets)
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Collector] = []
+
+    def histogram(self, *a, **kw) -> Histogram:
+        m = Histogram(*a, **kw)
+        self.metrics.append(m)
+        return m
+
+    def counter(self, *a, **kw) -> Counter:
+        m = Counter(*a, **kw)
+        self.metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines += m.render()
+        for fn in self.collectors:
+            try:
+                for name, typ, help, samples in fn():
+                    lines += [f"# HELP {name} {help}", f"# TYPE {name} {typ}"]
+                    lines += [f"{name}{_labels(list(lb), list(lb.values()))} {v:g}" for lb, v in samples]
+            except Exception as e:
+                print("metrics collector error:", e)
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+STAGE = REGISTRY.histogram("signalbot_stage_seconds", "Time spent in one pipeline stage", ("stage", "symbol", "tf"))
+WS_LAG = REGISTRY.histogram("signalbot_ws_kline_lag_seconds", "Exchange kline close (k.T) to decoded on this box", ("symbol",))
+WS_FRAMES = REGISTRY.counter("signalbot_ws_frames_total", "Kline frames received, by outcome", ("result",))
+E2E_PUBLISH = REGISTRY.histogram("signalbot_close_to_publish_seconds", "TF close boundary to Pipeline.publish", ("symbol", "tf"))
+DELIVERY = REGISTRY.histogram("signalbot_delivery_seconds", "Notifier enqueue to delivered", ("destination",))
+E2E_DELIVERY = REGISTRY.histogram("signalbot_close_to_delivery_seconds", "TF close boundary to alert delivered", ("destination",))
+
+def noop(stage: Optional[str]):
+    pass
+
+def _make_ticker(symbol: str, tf: str) -> Callable[[Optional[str]], None]:
+    stages: Dict[str, list] = {}
+    buckets = STAGE.buckets
+    clock = time.perf_counter
+    last = 0.0
+    def tick(stage: Optional[str]):
+        nonlocal last
+        now = clock()
+        if stage is not None:
+            s = stages.get(stage)
+            if s is None:
+                s = stages[stage] = STAGE.child(stage, symbol, tf)
+            d = now - last
+            s[bisect_left(buckets, d)] += 1
+            s[-1] += d
+        last = now
+    return tick
+
+_TICKERS: Dict[tuple, Callable] = {}
+
+def ticker(symbol: str, tf: str) -> Callable[[Optional[str]], None]:
+    """tick(stage) records the time since the previous tick (or since ticker()) under that stage.
+    One ticker per (symbol, tf), reused: callers must not interleave two closes of the same key."""
+    if not ENABLED:
+        return noop
+    t = _TICKERS.get((symbol, tf))
+    if t is None:
+        t = _TICKERS[(symbol, tf)] = _make_ticker(symbol, tf)
+    t(None)
+    return t
+
+async def serve_metrics(host: str = "127.0.0.1", port: int = 9108, registry: Registry = REGISTRY):
+    async def handler(req: Request) -> Response:
+        return 200, {"Content-Type": "text/plain; version=0.0.4"}, registry.render().encode()
+    return await serve({"/metrics": handler}, host, port)
+
+async def metrics_from_config(cfg: dict):
+    """metrics.enabled switches instrumentation on (default) and metrics.port serves /metrics; returns the server."""
+    global ENABLED
+    ENABLED = bool(cfg.get('enabled', True))
+    if not ENABLED or not cfg.get('port', 9108):
+        return None
+    return await serve_metrics(cfg.get('host', '127.0.0.1'), cfg.get('port', 9108))
@@ -0,0 +1,211 @@
+import time
+from typing import Callable, Dict, List, Optional
+from . import metrics
+from .candles import Candle, CandleAggregator
+from .sr import SRDetector
+from .indicators import SeriesBuffer, IndicatorParams, IndicatorEngine
+from .signal_engine import decide_signal
+
+class Sink:
+    """Where a Pipeline publishes: step6 hands payloads to the Notifier, replay writes them to a file."""
+    def signal(self, payload: dict):
+        pass
+    def snapshot(self, snap: dict):
+        pass
+
+def make_detector(sr_cfg: dict) -> SRDetector:
+    return SRDetector(
+        pivot_window = sr_cfg.get('pivot_window', 5),
+        merge_tolerance_pct = sr_cfg.get('merge_tolerance_pct', 0.1),
+        merge_tolerance_atr_mult = sr_cfg.get('merge_tolerance_atr_mult', 0.5),
+        max_age_bars = sr_cfg.get('max_age_bars', 300),
+        decay_per_bar = sr_cfg.get('decay_per_bar', 0.01),
+        history_bars = sr_cfg.get('history_bars', 500),
+    )
+
+class Pipeline:
+    """Roll-up -> Indicators -> SR -> Signals -> Publish for a set of symbols, independent of where 1m
+    candles come from. step6 feeds it from the websocket, app.replay from the archive."""
+    def __init__(self, raw: dict, symbols: Optional[List[str]] = None, sink: Optional[Sink] = None,
+                 log: Optional[Callable[[str], None]] = print):
+        ex = raw.get('exchange', {})
+        self.symbols: List[str] = [x.upper() for x in (symbols or ex.get('symbols', ['BTCUSDT']))]
+        self.tfs: List[str] = [x.get('tf') for x in raw.get('timeframes', [])]
+        self.tf_cfg = {x.get('tf'): x for x in raw.get('timeframes', [])}
+        self.ind_params = IndicatorParams(raw.get('indicators', {}))
+        self.det = make_detector(raw.get('sr', {}))
+        self.buf = SeriesBuffer()
+        self.engine = IndicatorEngine(self.ind_params)
+        self.agg = CandleAggregator(self.symbols, self.tfs)
+        self.agg.on_close = self.on_close
+        self.sink = sink or Sink()
+        self.log = log or (lambda msg: None)
+        # snapshot cache: symbol -> tf -> last TfSignal-like dict
+        self.last_tf_signal: Dict[str, Dict[str, dict]] = {sym: {} for sym in self.symbols}
+        # last ingested 1m t_open per symbol: where a restart has to resume from
+        self.last_1m: Dict[str, int] = {}
+        # optional app.shm_table.SignalTable / app.query_api.QueryAPI: told about every payload remember()ed
+        self.table = None
+        self.query = None
+
+    def ingest_1m(self, symbol: str, c1m: Candle) -> int:
+        n = self.agg.ingest_1m(symbol, c1m)
+        self.last_1m[symbol] = c1m.t_open
+        return n
+
+    def on_close(self, c: Candle):
+        payload = self.compute(c)
+        if payload is not None:
+            self.publish(payload)
+
+    def compute(self, c: Candle) -> Optional[dict]:
+        tick = metrics.ticker(c.symbol, c.tf)  # stage timings; a no-op when metrics are off
+        row = self.update(c, tick)
+        return self.evaluate(c, row, tick) if row is not None else None
+
+    def compute_many(self, closes: List[Candle], newest_only: bool = True) -> List[dict]:
+        """compute() for consecutive closes of one (symbol, tf). newest_only: every close updates the state,
+        but only the last one is evaluated (the others would be superseded before anyone reads them)."""
+        out = []
+        for i, c in enumerate(closes):
+            if newest_only and i < len(closes) - 1:
+                self.update(c)
+                continue
+            payload = self.compute(c)
+            if payload is not None:
+                out.append(payload)
+        return out
+
+    def update(self, c: Candle, tick=metrics.noop) -> Optional[dict]:
+        """State half of compute(): buffer, indicators and SR zones. Returns the indicator row, None in warmup."""
+        # 1) buffer this TF candle
+        self.buf.append(c.symbol, c.tf, c.t_close, c.o, c.h, c.l, c.c, c.v)
+        # 2) update indicators incrementally from this candle only
+        row = self.engine.update(c.symbol, c.tf, c.t_close, c.o, c.h, c.l, c.c, c.v)
+        tick("indicators")
+        n = self.engine.count(c.symbol, c.tf)
+        if n < 250:  # warmup safeguard
+            self.log(f"WARMUP {c.symbol} {c.tf} size={n}")
+            return None
+        # 3) update SR with this candle
+        self.det.update(c.symbol, c.tf, c.o, c.h, c.l, c.c)
+        tick("sr_update")
+        return row
+
+    def update_batch(self, closes: List[Candle]) -> List[Optional[dict]]:
+        """update() for closes of distinct (symbol, tf) keys, e.g. every symbol's M15 at one boundary: the
+        indicators of each TF run as one vectorized pass over all its symbols. Rows come back in input order."""
+        out: List[Optional[dict]] = [None] * len(closes)
+        by_tf: Dict[str, List[int]] = {}
+        for i, c in enumerate(closes):
+            by_tf.setdefault(c.tf, []).append(i)
+        for tf, idx in by_tf.items():
+            cs = [closes[i] for i in idx]
+            for c in cs:
+                self.buf.append(c.symbol, c.tf, c.t_close, c.o, c.h, c.l, c.c, c.v)
+            t0 = time.perf_counter()
+            rows = self.engine.update_batch(tf, [c.symbol for c in cs], [c.t_close for c in cs], [c.o for c in cs],
+                                            [c.h for c in cs], [c.l for c in cs], [c.c for c in cs], [c.v for c in cs])
+            if metrics.ENABLED:  # one pass for all of them: each key gets its share
+                share = (time.perf_counter() - t0) / len(cs)
+                for c in cs:
+                    metrics.STAGE.observe(share, "indicators", c.symbol, tf)
+            for i, c, row in zip(idx, cs, rows):
+                n = self.engine.count(c.symbol, tf)
+                if n < 250:
+                    self.log(f"WARMUP {c.symbol} {tf} size={n}")
+                    continue
+                tick = metrics.ticker(c.symbol, tf)
+                self.det.update(c.symbol, tf, c.o, c.h, c.l, c.c)
+                tick("sr_update")
+                out[i] = row
+        return out
+
+    def evaluate(self, c: Candle, row: dict, tick=metrics.noop) -> dict:
+        """Signal half of compute(); reads the SR state, so it must run before the next close of (symbol, tf)."""
+        near = self.det.nearest(c.symbol, c.tf, c.c)
+        tick("sr_nearest")
+        sr_pack = {
+            "nearest_support": (near["support"][0], near["support"][1]) if near.get("support") else None,
+            "nearest_resistance": (near["resistance"][0], near["resistance"][1]) if near.get("resistance") else None,
+        }
+        # 4) decide signal
+        cfg = self.tf_cfg.get(c.tf, {})
+        adx_thr = cfg.get("adx_trend_threshold", 20)
+        score_thr = cfg.get("score_threshold", 72)
+        sr_near_simple = {
+            "support": sr_pack["nearest_support"],
+            "resistance": sr_pack["nearest_resistance"],
+        }
+        direction, score, regime, entry, sl, tp, reasons = decide_signal(row, adx_thr, score_thr, sr_near_simple)
+        tick("decide_signal")
+        return {
+            "symbol": c.symbol,
+            "timeframe": c.tf,
+            "closed_at": c.t_close,
+            "regime": regime,
+            "signal": direction,
+            "score": score,
+            "price": float(row["close"]),
+            "indicators": {
+                "ema_fast": float(row.get("ema_fast", 0)),
+                "ema_slow": float(row.get("ema_slow", 0)),
+                "rsi": float(row.get("rsi", 0)),
+                "adx": float(row.get("adx", 0)),
+                "atr": float(row.get("atr", 0)),
+                "bb_width": float(row.get("bb_width", 0))
+            },
+            "sr": sr_pack,
+            "entry_hint": float(entry),
+            "sl_hint": float(sl),
+            "tp_hint": float(tp),
+            "rationale": reasons[:6],
+        }
+
+    def remember(self, payload: dict):
+        """Make payload the current one of its (symbol, tf) for snapshots, the signal table and the query API."""
+        self.last_tf_signal[payload["symbol"]][payload["timeframe"]] = payload
+        if self.table is not None:
+            self.table.put(payload)
+        if self.query is not None:
+            self.query.published(payload)
+
+    def snapshot(self, symbol: str, closed_at: Optional[int] = None) -> Optional[dict]:
+        """All TFs of symbol with their consensus, None until every TF has a payload. closed_at defaults to
+        the newest close among them."""
+        sym_cache = self.last_tf_signal[symbol]
+        tfs = self.tfs
+        if not all(tf in sym_cache for tf in tfs):
+            return None
+        # basic consensus: count non-NEUTRAL in same side for adjacent TFs
+        longs = sum(1 for tf in tfs if sym_cache[tf]["signal"] == "LONG")
+        shorts = sum(1 for tf in tfs if sym_cache[tf]["signal"] == "SHORT")
+        if longs >= 2: consensus = "STRONG_LONG"
+        elif shorts >= 2: consensus = "STRONG_SHORT"
+        else: consensus = "MIXED"
+        return {
+            "symbol": symbol,
+            "closed_at": closed_at if closed_at is not None else max(sym_cache[tf]["closed_at"] for tf in tfs),
+            "consensus": consensus,
+            "per_tf": {tf: sym_cache[tf] for tf in tfs}
+        }
+
+    def publish(self, payload: dict):
+        symbol, tf = payload["symbol"], payload["timeframe"]
+        if metrics.ENABLED:  # closed_at is the period boundary the close became final at
+            metrics.E2E_PUBLISH.observe(time.time() - payload["closed_at"] / 1000, symbol, tf)
+        # cache for snapshot
+        self.remember(payload)
+
+        # 5) publish this TF
+        self.log(f"SIGNAL {symbol} {tf} | {payload['signal']} ({payload['score']}) | {payload['regime']} | close {payload['price']:.2f}")
+        self.sink.signal(payload)
+
+        # 6) snapshot all TFs for this symbol when we have all
+        snap = self.snapshot(symbol, payload["closed_at"])
+        if snap is not None:
+            # console summary
+            sym_cache = snap["per_tf"]
+            row_lines = [f"{tf}:{sym_cache[tf]['signal']}({sym_cache[tf]['score']}) {sym_cache[tf]['regime']}" for tf in self.tfs]
+            self.log(f"[{symbol}] Snapshot | " + " | ".join(row_lines) + f" | Consensus: {snap['consensus']}")
+            self.sink.snapshot(snap)
@@ -0,0 +1,192 @@
+# Local query API next to the live pipeline, on its event loop (app.httpd):
+#   GET /signals/{symbol}                 {tf: last payload} for the symbol
+#   GET /snapshot/{symbol}                all TFs + consensus, as the webhook snapshot (404 until every TF has one)
+#   GET /candles/{symbol}/{tf}?from=&to=  closed candles with from <= t_close < to (ms, both optional), oldest first
+# Bodies are serialized at most once per close and kept as bytes, so a repeated request only copies them out;
+# candle rows are cached one JSON fragment each, so a range is a join over a slice. Every response carries an
+# ETag; If-None-Match with the current one answers 304, and with ?wait=<s> as well it is held until the next
+# close of that symbol (signals / snapshot) or (symbol, tf) (candles), or the wait runs out (then 304).
+import asyncio, json, os
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from .httpd import Request, Response, serve
+from .pipeline import Pipeline
+
+_JSON = {"Content-Type": "application/json"}
+_NOT_FOUND = (404, {"Content-Type": "text/plain"}, b"not found\n")
+
+def _dumps(x) -> bytes:
+    return json.dumps(x, separators=(",", ":")).encode()
+
+def _candles_doc(symbol: str, tf: str, rows: List[bytes]) -> bytes:
+    return b'{"symbol":"%s","tf":"%s","columns":["t_close","open","high","low","close","volume"],"rows":[%s]}' % (
+        symbol.encode(), tf.encode(), b",".join(rows))
+
+class _Rows:
+    """Serialized candle rows of one (symbol, tf), kept in step with the series buffer: new closes are appended,
+    rows the ring dropped are cut from the front."""
+    __slots__ = ("t", "rows", "full", "ver")
+
+    def __init__(self):
+        self.t: List[int] = []
+        self.rows: List[bytes] = []
+        self.full: Optional[bytes] = None
+        self.ver: Optional[int] = None  # t_close of the newest row held
+
+class QueryAPI:
+    """Read side of a Pipeline over HTTP. published() (called by Pipeline.remember) only bumps versions and
+    wakes long-polls; all serialization happens on the first request after a change."""
+    def __init__(self, pipe: Pipeline, max_wait_s: float = 30.0, max_waiters: int = 10_000):
+        self.pipe = pipe
+        self.max_wait_s = max_wait_s
+        self.max_waiters = max_waiters
+        self.boot = os.urandom(3).hex()  # a restart starts versions over; old ETags must not match
+        self._ver: Dict[str, int] = {s: 0 for s in pipe.symbols}
+        self._body: Dict[Tuple[str, str], Tuple[int, bytes]] = {}  # (kind, symbol) -> (version, body)
+        self._rows: Dict[Tuple[str, str], _Rows] = {}
+        self._wake: Dict[object, asyncio.Future] = {}
+        self.waiting = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.serialized = 0
+
+    def published(self, payload: dict):
+        symbol = payload["symbol"]
+        self._ver[symbol] = self._ver.get(symbol, 0) + 1
+        for key in (symbol, (symbol, payload["timeframe"])):
+            fut = self._wake.pop(key, None)
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+    # ---- bodies ------------------------------------------------------------------------------------------------
+
+    def _cached(self, kind: str, symbol: str) -> Optional[bytes]:
+        ver = self._ver[symbol]
+        hit = self._body.get((kind, symbol))
+        if hit is not None and hit[0] == ver:
+            return hit[1]
+        if kind == "signals":
+            obj = self.pipe.last_tf_signal[symbol]
+        else:
+            obj = self.pipe.snapshot(symbol)
+        body = None if obj is None else _dumps(obj)
+        self._body[(kind, symbol)] = (ver, body)
+        self.serialized += 1
+        return body
+
+    def _candles(self, symbol: str, tf: str) -> _Rows:
+        c = self.pipe.agg.last_closed(symbol, tf)
+        r = self._rows.get((symbol, tf))
+        if r is None:
+            r = self._rows[(symbol, tf)] = _Rows()
+        if r.ver is not None and (c is None or r.ver == c.t_close):
+            return r
+        a = self.pipe.buf.arrays(symbol, tf)
+        t = a["t"]
+        if len(t) or c is None:
+            t = t.tolist()
+            # in thread mode a worker may be appending right now: serve up to the close the ETag names
+            n = len(t) if c is None else bisect_left(t, c.t_close + 1)
+            new = bisect_left(t, r.t[-1] + 1, 0, n) if r.t else 0
+            cols = [a[k][new:n].tolist() for k in ("open", "high", "low", "close", "volume")]
+            r.t += t[new:n]
+            r.rows += [_dumps(row) for row in zip(t[new:n], *cols)]
+            drop = bisect_left(r.t, t[0]) if t else 0
+            if drop:  # the ring has overwritten them
+                del r.t[:drop], r.rows[:drop]
+        else:  # buffers live in worker processes (execution.mode: process): the last close is all there is
+            r.t = [c.t_close]
+            r.rows = [_dumps([c.t_close, c.o, c.h, c.l, c.c, c.v])]
+        r.full = None
+        r.ver = r.t[-1] if r.t else None
+        self.serialized += 1
+        return r
+
+    # ---- handlers ----------------------------------------------------------------------------------------------
+
+    async def _conditional(self, req: Request, key, etag) -> Optional[Response]:
+        """304 (after waiting for a change when asked to) for a current If-None-Match, None to answer in full."""
+        if req.headers.get("if-none-match") != etag():
+            return None
+        try:
+            wait = min(float(req.query.get("wait", 0) or 0), self.max_wait_s)
+        except ValueError:
+            wait = 0.0
+        if wait > 0:
+            if self.waiting >= self.max_waiters:
+                return 503, {"Content-Type": "text/plain", "Retry-After": "1"}, b"too many waiting requests\n"
+            fut = self._wake.get(key)
+            if fut is None:
+                fut = self._wake[key] = asyncio.get_running_loop().create_future()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiting -= 1
+            if req.headers.get("if-none-match") != etag():
+                return None
+        self.not_modified += 1
+        return 304, {"ETag": etag()}, b""
+
+    async def symbol_doc(self, req: Request) -> Response:
+        self.requests += 1
+        kind, _, symbol = req.path.strip("/").partition("/")
+        symbol = symbol.upper()
+        if symbol not in self._ver:
+            return _NOT_FOUND
+        etag = lambda: f'"{self.boot}-{self._ver[symbol]}"'
+        res = await self._conditional(req, symbol, etag)
+        if res is not None:
+            return res
+        body = self._cached(kind, symbol)
+        if body is None:
+            return _NOT_FOUND
+        return 200, {**_JSON, "ETag": etag()}, body
+
+    async def candles(self, req: Request) -> Response:
+        self.requests += 1
+        parts = req.path.strip("/").split("/")
+        if len(parts) != 3:
+            return _NOT_FOUND
+        symbol, tf = parts[1].upper(), parts[2].upper()
+        if symbol not in self._ver or tf not in self.pipe.tfs:
+            return _NOT_FOUND
+        try:
+            lo, hi = int(req.query.get("from", 0)), req.query.get("to")
+            hi = int(hi) if hi is not None else None
+        except ValueError:
+            return 400, {"Content-Type": "text/plain"}, b"from / to: ms timestamps\n"
+        def etag():
+            c = self.pipe.agg.last_closed(symbol, tf)
+            return f'"{c.t_close if c is not None else 0}"'
+        res = await self._conditional(req, (symbol, tf), etag)
+        if res is not None:
+            return res
+        r = self._candles(symbol, tf)
+        if not lo and hi is None:
+            if r.full is None:
+                r.full = _candles_doc(symbol, tf, r.rows)
+            body = r.full
+        else:
+            body = _candles_doc(symbol, tf, r.rows[bisect_left(r.t, lo):len(r.t) if hi is None else bisect_left(r.t, hi)])
+        # in thread mode the rows may trail last_closed for a moment: the tag names what the body holds
+        return 200, {**_JSON, "ETag": f'"{r.ver or 0}"'}, body
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, max_connections: int = 0) -> asyncio.AbstractServer:
+        return await serve({"/signals/": self.symbol_doc, "/snapshot/": self.symbol_doc, "/candles/": self.candles},
+                           host, port, max_connections)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "not_modified": self.not_modified, "serialized": self.serialized,
+                "waiting": self.waiting}
+
+async def query_from_config(cfg: dict, pipe: Pipeline):
+    """query.port > 0 serves the API for pipe and hooks it up; returns (api, server) or (None, None)."""
+    if not cfg.get('port'):
+        return None, None
+    api = QueryAPI(pipe, max_wait_s=cfg.get('max_wait_s', 30.0), max_waiters=cfg.get('max_waiters', 10_000))
+    srv = await api.start(cfg.get('host', '127.0.0.1'), cfg['port'], cfg.get('max_connections', 1_000))
+    pipe.query = api
+    return api, srv
@@ -0,0 +1,120 @@
+import argparse, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+from .settings import Settings
+from .archive import load_klines
+from .candles import Candle
+from .pipeline import Pipeline, Sink
+
+CHUNK_1M = 500_000  # 1m klines rolled up per batch; bounds memory on multi-year archives
+
+class FileSink(Sink):
+    """Collects what step6 would publish as JSON lines: {"type": "signal"|"snapshot", ...}."""
+    def __init__(self, f):
+        self.f = f
+        self.signals = 0
+        self.directional = 0
+        self.snapshots = 0
+
+    def signal(self, payload: dict):
+        self.signals += 1
+        if payload["signal"] != "NEUTRAL":
+            self.directional += 1
+        self.f.write(json.dumps({"type": "signal", **payload}) + "\n")
+
+    def snapshot(self, snap: dict):
+        self.snapshots += 1
+        self.f.write(json.dumps({"type": "snapshot", **snap}) + "\n")
+
+def _closes_in_order(pipe: Pipeline, symbol: str, rolled: Dict[str, Dict[str, np.ndarray]]) -> List[Candle]:
+    # same order ingest_1m fires on_close: by close time, then in configured TF order
+    parts = []
+    for rank, tf in enumerate(pipe.agg.tfs):
+        r = rolled[tf]
+        idx = np.flatnonzero(r["closed"])
+        parts.append((r["t_close"][idx], np.full(len(idx), rank), idx))
+    if not parts:
+        return []
+    t_close = np.concatenate([p[0] for p in parts])
+    rank = np.concatenate([p[1] for p in parts])
+    idx = np.concatenate([p[2] for p in parts])
+    out = []
+    for j in np.lexsort((rank, t_close)).tolist():
+        tf = pipe.agg.tfs[rank[j]]
+        r, i = rolled[tf], idx[j]
+        out.append(Candle(symbol, tf, int(r["t_open"][i]), int(r["t_close"][i]), float(r["open"][i]),
+                          float(r["high"][i]), float(r["low"][i]), float(r["close"][i]), float(r["volume"][i]), True))
+    return out
+
+def replay_symbol(raw: dict, archive_dir: str, symbol: str, out_dir: str, start_ms: Optional[int] = None,
+                  end_ms: Optional[int] = None, stream: bool = False) -> dict:
+    """Run one symbol's archived 1m klines through a fresh Pipeline and write its output to <out_dir>/<SYMBOL>.jsonl.
+    stream=True feeds every 1m candle through CandleAggregator.ingest_1m like the websocket loop does;
+    the default rolls up with ingest_1m_batch and replays the resulting closes through the same on_close."""
+    symbol = symbol.upper()
+    arr = load_klines(archive_dir, symbol, "1m", end_ms)
+    if start_ms is not None:
+        arr = arr[np.searchsorted(arr["t"], start_ms, side="left"):]
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    closes = 0
+    with open(os.path.join(out_dir, f"{symbol}.jsonl"), "w", encoding="utf-8") as f:
+        sink = FileSink(f)
+        pipe = Pipeline(raw, symbols=[symbol], sink=sink, log=None)
+        for a in range(0, len(arr), CHUNK_1M):
+            chunk = arr[a:a + CHUNK_1M]
+            if stream:
+                for t, o, h, l, c, v in chunk.tolist():
+                    closes += pipe.ingest_1m(symbol, Candle(symbol, "1m", t, t + 59_999, o, h, l, c, v, True))
+                continue
+            rolled = pipe.agg.ingest_1m_batch(symbol, chunk["t"], chunk["o"], chunk["h"], chunk["l"], chunk["c"], chunk["v"])
+            for candle in _closes_in_order(pipe, symbol, rolled):
+                closes += 1
+                pipe.on_close(candle)
+    return {"symbol": symbol, "bars": len(arr), "closes": closes, "signals": sink.signals,
+            "directional": sink.directional, "snapshots": sink.snapshots, "seconds": time.perf_counter() - t0}
+
+def _ms(x: Optional[str]) -> Optional[int]:
+    if x is None:
+        return None
+    if x.isdigit():
+        return int(x)
+    dt = datetime.fromisoformat(x)
+    return int((dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp() * 1000)
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.replay", description="Replay archived 1m klines through the step6 pipeline")
+    ap.add_argument("--config", default="config/config.yaml")
+    ap.add_argument("--archive", help="kline archive dir (default: warmup.archive_dir)")
+    ap.add_argument("--symbols", nargs="*", help="default: exchange.symbols")
+    ap.add_argument("--from", dest="start", help="ISO date/time (UTC) or epoch ms")
+    ap.add_argument("--to", dest="end", help="ISO date/time (UTC) or epoch ms, exclusive")
+    ap.add_argument("--out", default="replay_out", help="directory for <SYMBOL>.jsonl")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--stream", action="store_true", help="feed 1m candles one by one through ingest_1m")
+    a = ap.parse_args()
+
+    s = Settings.load(a.config)
+    archive_dir = a.archive or s.raw.get('warmup', {}).get('archive_dir', 'data/klines')
+    symbols = [x.upper() for x in (a.symbols or s.raw.get('exchange', {}).get('symbols', ['BTCUSDT']))]
+    start_ms, end_ms = _ms(a.start), _ms(a.end)
+
+    workers = max(1, min(a.workers, len(symbols)))
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(replay_symbol, s.raw, archive_dir, sym, a.out, start_ms, end_ms, a.stream) for sym in symbols]
+        results = [f.result() for f in futs]
+    wall = time.perf_counter() - t0
+
+    for r in results:
+        print(f"{r['symbol']:<12} {r['bars']:>9} bars  {r['signals']:>7} signals ({r['directional']} directional)  "
+              f"{r['snapshots']:>7} snapshots  {r['bars']/max(r['seconds'],1e-9):>12.0f} bars/s")
+    bars = sum(r["bars"] for r in results)
+    signals = sum(r["signals"] for r in results)
+    print(f"total: {bars} bars, {signals} signals in {wall:.2f}s -> {bars/wall:.0f} bars/s, {signals/wall:.0f} signals/s "
+          f"({len(symbols)} symbols, {workers} workers) -> {a.out}/")
+
+if __name__ == "__main__":
+    main()
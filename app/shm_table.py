@@ -0,0 +1,199 @@
+# Live signal table in shared memory: one fixed-size row per (symbol, tf) in an mmap'd file (by default under
+# /dev/shm), holding the last published payload as plain numbers. Local consumers read it with TableReader
+# (or any language that can mmap a file and follow the layout below) without HTTP or JSON in the path.
+#
+# Layout, little endian:
+#   header  HEADER (48 bytes): magic, layout version, row size, symbol count, tf count, writer pid (0 once the
+#           writer closed), created_ms, writes (total rows written, bumped after each row: poll it for changes)
+#   names   n_symbols x 16-byte symbol names, then n_tfs x 8-byte tf names, NUL padded
+#   rows    n_symbols * n_tfs rows of ROW, row of (symbol i, tf j) at index i * n_tfs + j, starting at a
+#           64-byte boundary. Field 0 of a row is a seqlock: odd while the writer is inside the row; a reader
+#           copies the row, re-reads seq and retries unless both reads are equal and even.
+# One writer per file. direction: 1 LONG, -1 SHORT, 0 NEUTRAL; regime: 1 trend_bull, 2 trend_bear, 0 range
+# (as in decide_signal_batch); seq 0 means never written. Missing S/R levels are NaN.
+import argparse, mmap, os, struct, time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+MAGIC = b"SBSIGTBL"
+LAYOUT = 1
+HEADER = struct.Struct("<8sIIIIIxxxxqQ")
+_SEQ = struct.Struct("<Q")
+_WRITES = struct.Struct("<Q")
+_WRITES_AT = 40
+FIELDS = (("seq", "Q"), ("closed_at", "q"), ("direction", "b"), ("regime", "b"), ("stale", "B"), ("_pad", "x"),
+          ("score", "i"), ("price", "d"), ("ema_fast", "d"), ("ema_slow", "d"), ("rsi", "d"), ("adx", "d"),
+          ("atr", "d"), ("bb_width", "d"), ("support_low", "d"), ("support_high", "d"), ("resistance_low", "d"),
+          ("resistance_high", "d"), ("entry", "d"), ("sl", "d"), ("tp", "d"), ("lag_s", "d"))
+ROW = struct.Struct("<" + "".join(f for _, f in FIELDS))
+_BODY = struct.Struct("<" + "".join(f for _, f in FIELDS[1:]))  # everything after seq
+NAMES = tuple(n for n, f in FIELDS if n != "_pad")
+ROW_DTYPE = np.dtype({"names": list(NAMES), "formats": ["<" + f for n, f in FIELDS if n != "_pad"],
+                      "offsets": [struct.calcsize("<" + "".join(f for _, f in FIELDS[:i])) for i, (n, _) in
+                                  enumerate(FIELDS) if n != "_pad"], "itemsize": ROW.size})
+_DIRECTION = {"LONG": 1, "SHORT": -1}
+_REGIME = {"trend_bull": 1, "trend_bear": 2}
+_NAN = float("nan")
+
+def _layout(n_symbols: int, n_tfs: int) -> Tuple[int, int]:
+    names = HEADER.size + n_symbols * 16 + n_tfs * 8
+    rows_at = -(-names // 64) * 64
+    return rows_at, rows_at + n_symbols * n_tfs * ROW.size
+
+def _pack(payload: dict) -> tuple:
+    ind = payload["indicators"]
+    s, r = payload["sr"]["nearest_support"], payload["sr"]["nearest_resistance"]
+    return (payload["closed_at"], _DIRECTION.get(payload["signal"], 0), _REGIME.get(payload["regime"], 0),
+            bool(payload.get("stale")), payload["score"], payload["price"], ind["ema_fast"], ind["ema_slow"],
+            ind["rsi"], ind["adx"], ind["atr"], ind["bb_width"], s[0] if s else _NAN, s[1] if s else _NAN,
+            r[0] if r else _NAN, r[1] if r else _NAN, payload["entry_hint"], payload["sl_hint"],
+            payload["tp_hint"], payload.get("lag_s", 0.0))
+
+class SignalTable:
+    """Writer side. The file is built next to `path` and renamed over it, so a reader never maps a half-written
+    header; a restarted writer replaces the file and readers pick the new one up (TableReader.reopened)."""
+    def __init__(self, path: str, symbols: List[str], tfs: List[str]):
+        self.path = path
+        self.symbols = [s.upper() for s in symbols]
+        self.tfs = list(tfs)
+        self._index = {(s, tf): i * len(self.tfs) + j for i, s in enumerate(self.symbols) for j, tf in enumerate(self.tfs)}
+        self.rows_at, size = _layout(len(self.symbols), len(self.tfs))
+        self._seq = [0] * len(self._index)
+        self.writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+        fd = os.open(tmp, os.O_RDWR)
+        try:
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT, ROW.size, len(self.symbols), len(self.tfs), os.getpid(),
+                         int(time.time() * 1000), 0)
+        at = HEADER.size
+        for s in self.symbols:
+            self.mm[at:at + 16] = s.encode()[:16].ljust(16, b"\0")
+            at += 16
+        for tf in self.tfs:
+            self.mm[at:at + 8] = tf.encode()[:8].ljust(8, b"\0")
+            at += 8
+        os.replace(tmp, path)
+
+    def put(self, payload: dict) -> bool:
+        i = self._index.get((payload["symbol"], payload["timeframe"]))
+        if i is None:
+            return False
+        off = self.rows_at + i * ROW.size
+        seq = self._seq[i] + 1
+        mm = self.mm
+        _SEQ.pack_into(mm, off, seq)  # odd: row being written
+        _BODY.pack_into(mm, off + 8, *_pack(payload))
+        _SEQ.pack_into(mm, off, seq + 1)
+        self._seq[i] = seq + 1
+        self.writes += 1
+        _WRITES.pack_into(mm, _WRITES_AT, self.writes)
+        return True
+
+    def load(self, last_tf_signal: Dict[str, Dict[str, dict]]):
+        # e.g. the payloads a checkpoint restored, so readers see state before the first live close
+        for per_tf in last_tf_signal.values():
+            for payload in per_tf.values():
+                self.put(payload)
+
+    def close(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT, ROW.size, len(self.symbols), len(self.tfs), 0,
+                         *HEADER.unpack_from(self.mm, 0)[6:])
+        self.mm.close()
+
+def table_from_config(cfg: dict, symbols: List[str], tfs: List[str]) -> Optional[SignalTable]:
+    if not cfg.get('path'):
+        return None
+    return SignalTable(cfg['path'], symbols, tfs)
+
+class TableReader:
+    """Read-only view of a SignalTable file; safe to use while the writer runs, from any number of processes.
+    - get(symbol, tf): the row as a tuple in NAMES order (None before its first write); ~1 us, no allocation
+      beyond the tuple. row(symbol, tf) is the same as a dict
+    - snapshot(): every row as a NumPy structured array (ROW_DTYPE), torn rows re-read
+    - writes(): the writer's row counter, for cheap change polling
+    - reopened(): remaps when the writer has replaced the file (restart), True if it did"""
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self.ino = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, layout, row_size, ns, nt, self.writer_pid, self.created_ms, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or layout != LAYOUT or row_size != ROW.size:
+            raise ValueError(f"{self.path}: not a signal table of layout {LAYOUT}")
+        at = HEADER.size
+        names = lambda n, w: [self.mm[at + k * w:at + (k + 1) * w].rstrip(b"\0").decode() for k in range(n)]
+        self.symbols = names(ns, 16)
+        at += ns * 16
+        self.tfs = names(nt, 8)
+        self.rows_at, _ = _layout(ns, nt)
+        self._offset = {(s, tf): self.rows_at + (i * nt + j) * ROW.size
+                        for i, s in enumerate(self.symbols) for j, tf in enumerate(self.tfs)}
+        # zero-copy view of every row; unsynchronized, see snapshot()
+        self.rows = np.frombuffer(self.mm, dtype=ROW_DTYPE, count=ns * nt, offset=self.rows_at)
+
+    def reopened(self) -> bool:
+        try:
+            if os.stat(self.path).st_ino == self.ino:
+                return False
+        except FileNotFoundError:
+            return False
+        del self.rows
+        self.mm.close()
+        self._open()
+        return True
+
+    def writer_alive(self) -> bool:
+        return HEADER.unpack_from(self.mm, 0)[5] != 0
+
+    def writes(self) -> int:
+        return _WRITES.unpack_from(self.mm, _WRITES_AT)[0]
+
+    def get(self, symbol: str, tf: str) -> Optional[tuple]:
+        off = self._offset[(symbol, tf)]
+        mm = self.mm
+        while True:
+            row = ROW.unpack_from(mm, off)
+            seq = row[0]
+            if seq & 1 == 0 and _SEQ.unpack_from(mm, off)[0] == seq:
+                return row if seq else None
+
+    def row(self, symbol: str, tf: str) -> Optional[dict]:
+        row = self.get(symbol, tf)
+        return dict(zip(NAMES, row)) if row else None
+
+    def snapshot(self) -> np.ndarray:
+        # the seqlock done per column: seqs before the copy, the copy, seqs after; rows that changed are re-read
+        out = np.empty_like(self.rows)
+        todo = np.arange(len(self.rows))
+        while len(todo):
+            before = self.rows["seq"][todo]
+            out[todo] = self.rows[todo]
+            ok = (before & 1 == 0) & (self.rows["seq"][todo] == before)
+            out["seq"][todo[ok]] = before[ok]
+            todo = todo[~ok]
+        return out
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.shm_table", description="Print the rows of a live signal table")
+    ap.add_argument("path")
+    ap.add_argument("symbols", nargs="*")
+    a = ap.parse_args()
+    r = TableReader(a.path)
+    print(f"{len(r.symbols)} symbols x {r.tfs}, {r.writes()} writes, writer {'pid %d' % r.writer_pid if r.writer_alive() else 'closed'}")
+    for s in a.symbols or r.symbols:
+        for tf in r.tfs:
+            row = r.row(s.upper(), tf)
+            if row:
+                print(s.upper(), tf, " ".join(f"{k}={v:.6g}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
+
+if __name__ == "__main__":
+    main()
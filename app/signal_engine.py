@@ -1,5 +1,6 @@
 from typing import Dict, Tuple, List
 import math
+import numpy as np
 
 def _score_trend_long(row, adx_thr: float, sr: Dict):
     score = 0; reasons = []
@@ -79,3 +80,80 @@ def decide_signal(row, adx_thr: float, score_thr: int, sr_near: Dict):
         entry = row["close"]; sl = row["close"]; tp = row["close"]
         direction = "NEUTRAL"
     return direction, int(score), regime, entry, sl, tp, reasons
+
+# ---------------------------------------------------------------------------
+# Vectorized decide_signal over a whole features history, for backtests and sweeps.
+# Same float operations in the same order as the scalar path, so results agree bit for bit.
+# ---------------------------------------------------------------------------
+REGIMES = ("range", "trend_bull", "trend_bear")  # regime codes 0, 1, 2
+DIRECTIONS = {1: "LONG", -1: "SHORT", 0: "NEUTRAL"}
+# rationale bitmask: bit i set <=> REASONS[i] is in the scalar reasons list (which lists them in this order)
+REASONS = ("EMAfast>EMAslow & ADX>=thr", "RSI>50", "MACD_hist>0", "Break>R+buffer", "NoR",
+           "EMAfast<EMAslow & ADX>=thr", "RSI<50", "MACD_hist<0", "Break<S-buffer", "NoS", "Range")
+_BIT = {r: 1 << i for i, r in enumerate(REASONS)}
+
+def reasons_from_mask(mask: int) -> List[str]:
+    return [r for i, r in enumerate(REASONS) if mask >> i & 1]
+
+def _col(feats, name: str, default: float, n: int) -> np.ndarray:
+    # row.get(name, default): a missing column behaves like the default on every bar
+    if name in feats:
+        return np.asarray(feats[name], dtype=np.float64)
+    return np.full(n, default)
+
+def decide_signal_batch(feats, adx_thr: float, score_thr: int, sup_low: np.ndarray, sup_high: np.ndarray,
+                        res_low: np.ndarray, res_high: np.ndarray) -> Dict[str, np.ndarray]:
+    """decide_signal for every row of `feats` (a compute_features DataFrame or a dict of columns).
+    Nearest zones come as per-bar arrays, NaN where decide_signal would get None.
+    Returns int8 "regime" (index into REGIMES) and "direction" (1 / -1 / 0), int16 "score",
+    float64 "entry" / "sl" / "tp" and int16 "reasons" (bitmask over REASONS)."""
+    close = np.asarray(feats["close"], dtype=np.float64)
+    n = len(close)
+    ema_fast = np.asarray(feats["ema_fast"], dtype=np.float64)
+    ema_slow = np.asarray(feats["ema_slow"], dtype=np.float64)
+    adx = _col(feats, "adx", 0, n)
+    atr = _col(feats, "atr", 0, n)
+    has_macdh = "MACDh_12_26_9" in feats
+    macdh = _col(feats, "MACDh_12_26_9", np.nan, n)
+    has_s = ~np.isnan(sup_low)
+    has_r = ~np.isnan(res_low)
+    strong = adx >= adx_thr
+    bull = (ema_fast > ema_slow) & strong
+    bear = ~bull & (ema_fast < ema_slow) & strong
+
+    # long: _score_trend_long
+    l_rsi = _col(feats, "rsi", 0, n) > 50
+    l_macd = (macdh > 0) if has_macdh else np.zeros(n, dtype=bool)
+    l_brk = has_r & (close > (res_high + 0.1*atr))
+    l_score = 25 + 20*l_rsi + 15*l_macd + 30*l_brk + 10*~has_r
+    l_mask = _BIT["EMAfast>EMAslow & ADX>=thr"] | _BIT["RSI>50"]*l_rsi | _BIT["MACD_hist>0"]*l_macd | \
+        _BIT["Break>R+buffer"]*l_brk | _BIT["NoR"]*~has_r
+    l_sl = close - 1.5*atr
+    cand = sup_high - 0.1*atr
+    l_sl = np.where(has_s & (cand < l_sl), cand, l_sl)  # min(sl, x) keeps sl unless x < sl
+    l_tp = close + 2*(close - l_sl)
+
+    # short: _score_trend_short
+    s_rsi = _col(feats, "rsi", 100, n) < 50
+    s_macd = (macdh < 0) if has_macdh else np.zeros(n, dtype=bool)
+    s_brk = has_s & (close < (sup_low - 0.1*atr))
+    s_score = 25 + 20*s_rsi + 15*s_macd + 30*s_brk + 10*~has_s
+    s_mask = _BIT["EMAfast<EMAslow & ADX>=thr"] | _BIT["RSI<50"]*s_rsi | _BIT["MACD_hist<0"]*s_macd | \
+        _BIT["Break<S-buffer"]*s_brk | _BIT["NoS"]*~has_s
+    s_sl = close + 1.5*atr
+    cand = res_low + 0.1*atr
+    s_sl = np.where(has_r & (cand > s_sl), cand, s_sl)  # max(sl, x) keeps sl unless x > sl
+    s_tp = close - 2*(s_sl - close)
+
+    regime = np.where(bull, 1, np.where(bear, 2, 0)).astype(np.int8)
+    score = np.where(bull, l_score, np.where(bear, s_score, 50)).astype(np.int16)
+    direction = np.where(bull & (l_score >= score_thr), 1, np.where(bear & (s_score >= score_thr), -1, 0)).astype(np.int8)
+    return {
+        "regime": regime,
+        "direction": direction,
+        "score": score,
+        "entry": close.copy(),
+        "sl": np.where(bull, l_sl, np.where(bear, s_sl, close)),
+        "tp": np.where(bull, l_tp, np.where(bear, s_tp, close)),
+        "reasons": np.where(bull, l_mask, np.where(bear, s_mask, _BIT["Range"])).astype(np.int16),
+    }
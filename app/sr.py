@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional
 from collections import deque
+from bisect import bisect_left, bisect_right
 import math
 
 @dataclass
@@ -12,151 +13,247 @@ class Zone:
     touches: int
     last_touch_idx: int  # bar index in our local series
     created_idx: int
+    score_idx: int = 0  # bar at which `score` was last brought up to date (decay is applied lazily)
+    seq: int = 0  # creation order within its (symbol, tf)
+
+    def score_at(self, idx:int, decay_per_bar:float) -> float:
+        return self.score * max(0.0, 1.0 - decay_per_bar) ** (idx - self.score_idx)
+
+    def _settle(self, idx:int, decay_per_bar:float):
+        if idx != self.score_idx:
+            self.score = self.score_at(idx, decay_per_bar)
+            self.score_idx = idx
+
+class _ZoneIndex:
+    """Zones of one (symbol, tf), sorted by price_low and by price_high, plus a FIFO in creation order.
+    Interval queries bisect on the bounds; max_width bounds how far left of a price a covering zone can start."""
+    __slots__ = ("lows", "by_low", "highs", "by_high", "fifo", "max_width", "seq")
+    def __init__(self):
+        self.lows: List[float] = []; self.by_low: List[Zone] = []
+        self.highs: List[float] = []; self.by_high: List[Zone] = []
+        self.fifo: deque = deque()
+        self.max_width = 0.0
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.fifo)
+
+    def __iter__(self):
+        return iter(self.fifo)
+
+    def _insert(self, z:Zone):
+        i = bisect_right(self.lows, z.price_low)
+        self.lows.insert(i, z.price_low); self.by_low.insert(i, z)
+        i = bisect_right(self.highs, z.price_high)
+        self.highs.insert(i, z.price_high); self.by_high.insert(i, z)
+        self.max_width = max(self.max_width, z.price_high - z.price_low)
+
+    @staticmethod
+    def _drop(keys:List[float], zs:List[Zone], key:float, z:Zone):
+        i = bisect_left(keys, key)
+        while zs[i] is not z:
+            i += 1
+        del keys[i]; del zs[i]
+
+    def _remove(self, z:Zone):
+        self._drop(self.lows, self.by_low, z.price_low, z)
+        self._drop(self.highs, self.by_high, z.price_high, z)
+        if z.price_high - z.price_low >= self.max_width:
+            self.max_width = max((x.price_high - x.price_low for x in self.by_low), default=0.0)
+
+    def add(self, z:Zone):
+        z.seq = self.seq
+        self.seq += 1
+        self.fifo.append(z)
+        self._insert(z)
+
+    def expand(self, z:Zone, low:float, high:float):
+        self._remove(z)
+        z.price_low = min(z.price_low, low)
+        z.price_high = max(z.price_high, high)
+        self._insert(z)
+
+    def prune(self, min_created_idx:int):
+        fifo = self.fifo
+        while fifo and fifo[0].created_idx < min_created_idx:
+            self._remove(fifo.popleft())
+
+    def overlapping(self, low:float, high:float) -> List[Zone]:
+        """Zones with price_low <= high and price_high >= low, in price_low order."""
+        i = bisect_left(self.lows, low - self.max_width * 1.000001)
+        j = bisect_right(self.lows, high)
+        return [z for z in self.by_low[i:j] if z.price_high >= low]
+
+    def below(self, price:float) -> Optional[Zone]:
+        # highest price_high <= price; first created wins a tie
+        j = bisect_right(self.highs, price) - 1
+        if j < 0:
+            return None
+        best = self.by_high[j]
+        while j > 0 and self.highs[j-1] == self.highs[j]:
+            j -= 1
+            if self.by_high[j].seq < best.seq:
+                best = self.by_high[j]
+        return best
+
+    def above(self, price:float) -> Optional[Zone]:
+        # lowest price_low >= price; first created wins a tie
+        i = bisect_left(self.lows, price)
+        if i >= len(self.lows):
+            return None
+        best = self.by_low[i]
+        while i + 1 < len(self.lows) and self.lows[i+1] == self.lows[i]:
+            i += 1
+            if self.by_low[i].seq < best.seq:
+                best = self.by_low[i]
+        return best
 
 class SRDetector:
     """Support/Resistance zone detector using pivot-based levels merged into zones.
-    - Maintain a rolling OHLC list per (symbol, tf)
+    - Maintain a rolling OHLC list per (symbol, tf), bounded to history_bars when set
     - On each new closed candle, check for pivots (high/low) at center = idx - w
     - Merge levels into zones with tolerance = max(pct * price, atr_mult * atr)
     - Update touches and score with simple decay
+    - ATR and pivot checks are incremental, so per-bar work does not depend on history length
+    - Zones live in a price-sorted index and decay lazily from their last settled score,
+      so merge, touch and nearest lookups are bisections instead of scans over every zone
     """
     def __init__(self, pivot_window:int=5, merge_tolerance_pct:float=0.1, merge_tolerance_atr_mult:float=0.5,
-                 max_age_bars:int=300, decay_per_bar:float=0.01):
+                 max_age_bars:int=300, decay_per_bar:float=0.01, history_bars:Optional[int]=None, atr_length:int=14):
         self.pivot_window = pivot_window
         self.merge_tol_pct = merge_tolerance_pct / 100.0  # convert percent to fraction
         self.merge_tol_atr_mult = merge_tolerance_atr_mult
         self.max_age_bars = max_age_bars
         self.decay_per_bar = decay_per_bar
+        self.history_bars = history_bars  # None keeps every bar; an int bounds o/h/l/c/atr to a ring
+        self.atr_length = atr_length
 
-        # series store: (symbol, tf) -> dict with 'o','h','l','c','atr' lists and 'zones' list
-        self.store: Dict[Tuple[str,str], Dict[str, List[float] or List[Zone]]] = {}
+        # series store: (symbol, tf) -> dict with 'o','h','l','c','atr' rings, 'zones' list,
+        # a monotonically increasing bar counter 'n' and the incremental ATR / pivot state
+        self.store: Dict[Tuple[str,str], dict] = {}
 
     def _get_pair(self, symbol:str, tf:str):
         key = (symbol.upper(), tf.upper())
         if key not in self.store:
+            w = self.pivot_window
+            hist = self.history_bars
             self.store[key] = {
-                "o": [], "h": [], "l": [], "c": [], "atr": [], "zones": []
+                "o": deque(maxlen=hist), "h": deque(maxlen=hist), "l": deque(maxlen=hist),
+                "c": deque(maxlen=hist), "atr": deque(maxlen=hist), "zones": _ZoneIndex(),
+                "n": 0, "prev_c": None, "tr": deque(maxlen=self.atr_length),
+                # last w+1 highs/lows: index 0 is the pivot candidate (center = idx - w)
+                "hw": deque(maxlen=w + 1), "lw": deque(maxlen=w + 1),
+                # sliding max/min over the last w bars and the last w+2 values of it
+                "hmax": deque(), "lmin": deque(), "hmax_hist": deque(maxlen=w + 2), "lmin_hist": deque(maxlen=w + 2),
             }
         return key, self.store[key]
 
-    def _compute_atr(self, H:List[float], L:List[float], C:List[float], length:int=14) -> float:
-        n = len(C)
-        if n < 2:
+    def _update_atr(self, slot:dict, h:float, l:float, c:float) -> float:
+        # simple mean of the last atr_length true ranges; each TR is computed once when its bar arrives
+        pc = slot["prev_c"]
+        slot["prev_c"] = c
+        if pc is None:
             return 0.0
-        tr = 0.0
-        count = 0
-        start = max(1, n - length)
-        for i in range(start, n):
-            high = H[i]
-            low = L[i]
-            prev_close = C[i-1]
-            cur_tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr += cur_tr
-            count += 1
-        return (tr / count) if count else 0.0
-
-    def _is_pivot_high(self, H:List[float], center:int, w:int) -> bool:
-        if center - w < 0 or center + w >= len(H):
-            return False
-        c = H[center]
-        for i in range(center - w, center + w + 1):
-            if i == center: 
-                continue
-            if H[i] >= c: 
-                return False
-        return True
-
-    def _is_pivot_low(self, L:List[float], center:int, w:int) -> bool:
-        if center - w < 0 or center + w >= len(L):
-            return False
-        c = L[center]
-        for i in range(center - w, center + w + 1):
-            if i == center: 
-                continue
-            if L[i] <= c: 
-                return False
-        return True
-
-    def _merge_or_create_zone(self, zones:List[Zone], tf:str, level:float, atr:float, cur_idx:int):
+        trs = slot["tr"]
+        trs.append(max(h - l, abs(h - pc), abs(l - pc)))
+        return sum(trs) / len(trs)
+
+    @staticmethod
+    def _slide(dq:deque, i:int, x:float, w:int, sign:float) -> float:
+        # monotonic deque of (bar, value): front is the max (sign=1) or min (sign=-1) of bars (i-w, i]
+        while dq and dq[-1][1] * sign <= x * sign:
+            dq.pop()
+        dq.append((i, x))
+        if dq[0][0] <= i - w:
+            dq.popleft()
+        return dq[0][1]
+
+    def _update_pivots(self, slot:dict, idx:int, h:float, l:float) -> Tuple[bool, bool]:
+        """Pivot at center = idx - w iff its high (low) beats both the w bars before and after it.
+        The w bars after are the current sliding window; the w bars before are that window w+1 bars ago."""
+        w = self.pivot_window
+        slot["hw"].append(h)
+        slot["lw"].append(l)
+        if w == 0:
+            return True, True
+        hh = slot["hmax_hist"]; lh = slot["lmin_hist"]
+        hh.append(self._slide(slot["hmax"], idx, h, w, 1.0))
+        lh.append(self._slide(slot["lmin"], idx, l, w, -1.0))
+        if idx < 2 * w:
+            return False, False
+        hc = slot["hw"][0]; lc = slot["lw"][0]
+        return (hc > hh[0] and hc > hh[-1]), (lc < lh[0] and lc < lh[-1])
+
+    def _merge_or_create_zone(self, zones:_ZoneIndex, tf:str, level:float, atr:float, cur_idx:int, idx:int):
         # tolerance width around a level
         tol = max(level * self.merge_tol_pct, self.merge_tol_atr_mult * atr)
         z_low = level - tol
         z_high = level + tol
 
-        # try to merge with overlapping zone
-        merged = False
-        for z in zones:
-            if not (z_high < z.price_low or z_low > z.price_high):
-                # overlap -> expand bounds
-                z.price_low = min(z.price_low, z_low)
-                z.price_high = max(z.price_high, z_high)
-                z.touches += 1
-                z.score += 1.0  # basic increment, will be decayed later
-                z.last_touch_idx = cur_idx
-                merged = True
-                break
-
-        if not merged:
-            zones.append(Zone(tf=tf, price_low=z_low, price_high=z_high, score=1.0, touches=1,
-                              last_touch_idx=cur_idx, created_idx=cur_idx))
+        # try to merge with the oldest overlapping zone -> expand bounds
+        hits = zones.overlapping(z_low, z_high)
+        if hits:
+            z = min(hits, key=lambda x: x.seq)
+            zones.expand(z, z_low, z_high)
+            z._settle(idx, self.decay_per_bar)
+            z.touches += 1
+            z.score += 1.0  # basic increment, decayed lazily from here
+            z.last_touch_idx = cur_idx
+        else:
+            zones.add(Zone(tf=tf, price_low=z_low, price_high=z_high, score=1.0, touches=1,
+                           last_touch_idx=cur_idx, created_idx=cur_idx, score_idx=idx))
 
     def update(self, symbol:str, tf:str, o:float, h:float, l:float, c:float):
         key, slot = self._get_pair(symbol, tf)
-        O,H,L,C = slot["o"], slot["h"], slot["l"], slot["c"]
-        O.append(o); H.append(h); L.append(l); C.append(c)
+        slot["o"].append(o); slot["h"].append(h); slot["l"].append(l); slot["c"].append(c)
+        idx = slot["n"]
+        slot["n"] = idx + 1
 
         # ATR (simple rolling) for tolerance
-        atr = self._compute_atr(H, L, C, length=14)
+        atr = self._update_atr(slot, h, l, c)
         slot["atr"].append(atr)
-        zones = slot["zones"]
-        idx = len(C) - 1
+        zones: _ZoneIndex = slot["zones"]
 
-        # Decay & prune zones
-        for z in zones:
-            z.score = max(0.0, z.score * (1.0 - self.decay_per_bar))
-        # Drop very old zones (based on created age)
-        slot["zones"] = [z for z in zones if (idx - z.created_idx) <= self.max_age_bars]
-        zones = slot["zones"]
+        # Drop very old zones (based on created age); decay is settled lazily when a zone is read or bumped
+        zones.prune(idx - self.max_age_bars)
 
         w = self.pivot_window
         center = idx - w  # we can confirm a pivot w bars ago
-        if center >= 0:
-            if self._is_pivot_high(H, center, w):
-                level = H[center]
-                self._merge_or_create_zone(zones, tf, level, atr, center)
-            if self._is_pivot_low(L, center, w):
-                level = L[center]
-                self._merge_or_create_zone(zones, tf, level, atr, center)
+        piv_high, piv_low = self._update_pivots(slot, idx, h, l)
+        if piv_high:
+            self._merge_or_create_zone(zones, tf, slot["hw"][0], atr, center, idx)
+        if piv_low:
+            self._merge_or_create_zone(zones, tf, slot["lw"][0], atr, center, idx)
 
         # Touch update: if close is inside a zone, count a touch and bump score
-        for z in zones:
-            if z.price_low <= c <= z.price_high:
-                z.touches += 1
-                z.score += 0.5
-                z.last_touch_idx = idx
+        for z in zones.overlapping(c, c):
+            z._settle(idx, self.decay_per_bar)
+            z.touches += 1
+            z.score += 0.5
+            z.last_touch_idx = idx
+
+    def zones(self, symbol:str, tf:str) -> List[Zone]:
+        """Live zones in creation order with scores settled to the latest bar."""
+        key, slot = self._get_pair(symbol, tf)
+        idx = slot["n"] - 1
+        out = list(slot["zones"])
+        for z in out:
+            z._settle(idx, self.decay_per_bar)
+        return out
 
     def nearest(self, symbol:str, tf:str, price:float) -> Dict[str, Optional[Tuple[float,float,Zone]]]:
         key, slot = self._get_pair(symbol, tf)
-        zones: List[Zone] = slot["zones"]
+        zones: _ZoneIndex = slot["zones"]
         if not zones:
             return {"support": None, "resistance": None}
 
-        below = [z for z in zones if z.price_high <= price]
-        above = [z for z in zones if z.price_low >= price]
-
-        def dist_to_zone(p, z:Zone):
-            if p < z.price_low:
-                return z.price_low - p
-            if p > z.price_high:
-                return p - z.price_high
-            return 0.0
-
-        support = None
-        if below:
-            support = min(below, key=lambda z: dist_to_zone(price, z))
-        resistance = None
-        if above:
-            resistance = min(above, key=lambda z: dist_to_zone(price, z))
+        # support: zone ending closest below price; resistance: zone starting closest above
+        support = zones.below(price)
+        resistance = zones.above(price)
+        idx = slot["n"] - 1
+        for z in (support, resistance):
+            if z is not None:
+                z._settle(idx, self.decay_per_bar)
 
         s_tuple = (support.price_low, support.price_high, support) if support else None
         r_tuple = (resistance.price_low, resistance.price_high, resistance) if resistance else None
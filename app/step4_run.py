@@ -29,6 +29,7 @@ async def run():
         merge_tolerance_atr_mult = sr_cfg.get('merge_tolerance_atr_mult', 0.5),
         max_age_bars = sr_cfg.get('max_age_bars', 300),
         decay_per_bar = sr_cfg.get('decay_per_bar', 0.01),
+        history_bars = sr_cfg.get('history_bars', 500),
     )
 
     print("[Step 4] WS + Roll-up + SR zones (nearest S/R on TF close)")
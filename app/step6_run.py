@@ -1,150 +1,172 @@
 import asyncio, os
-from typing import List, Dict
+from typing import List, Optional
 from .settings import Settings
-from .ws_binance import kline_1m_events
-from .candles import Candle, CandleAggregator
-from .sr import SRDetector
-from .indicators import SeriesBuffer, IndicatorParams, compute_features
-from .signal_engine import decide_signal
-from .alerts import Notifier, fmt_signal_msg
+from .ws_binance import closed_1m_candles
+from .alerts import Notifier, fmt_signal_msg, notifier_from_config
+from .pipeline import Pipeline, Sink
+from .executor import dispatcher_from_config
+from .warmup import bootstrap_from_config
+from .digest import DigestSink, digest_from_config
+from .backfill import gapfiller_from_config
+from . import checkpoint
+from .store import store_from_config
+from .shm_table import table_from_config
+from .query_api import query_from_config
+from . import metrics
 
-def _to_f(x): return float(x) if x is not None else 0.0
+class NotifierSink(Sink):
+    # enqueue only: delivery, retries and rate limits are handled by the Notifier's workers
+    def __init__(self, notifier: Notifier, enable_webhook: bool, enable_telegram: bool):
+        self.notifier = notifier
+        self.enable_webhook = enable_webhook
+        self.enable_telegram = enable_telegram
 
-def _kline_to_1m(symbol: str, k: dict) -> Candle:
-    return Candle(
-        symbol=symbol.upper(), tf='1m',
-        t_open=int(k['t']), t_close=int(k['T']),
-        o=_to_f(k['o']), h=_to_f(k['h']), l=_to_f(k['l']), c=_to_f(k['c']),
-        v=_to_f(k['v']), closed=bool(k.get('x', False))
-    )
+    def signal(self, payload: dict):
+        if self.enable_webhook:
+            self.notifier.post_json(payload)
+        if self.enable_telegram:
+            self.notifier.post_telegram(fmt_signal_msg(payload), payload["closed_at"])
 
-async def run():
-    s = Settings.load()
-    ex = s.raw.get('exchange', {})
-    symbols: List[str] = [x.upper() for x in ex.get('symbols', ['BTCUSDT'])]
-    market = ex.get('market_type', 'spot')
-    tfs: List[str] = [x.get('tf') for x in s.raw.get('timeframes', [])]
-    tf_cfg = {x.get('tf'): x for x in s.raw.get('timeframes', [])}
+    def snapshot(self, snap: dict):
+        if self.enable_webhook:
+            self.notifier.post_json({"type": "snapshot", **snap})
 
-    ind_params = IndicatorParams(s.raw.get('indicators', {}))
+async def _checkpoint_loop(path: str, pipe: Pipeline, disp, every: float):
+    while True:
+        await asyncio.sleep(every)
+        await disp.drain()  # thread mode: no close may be mid-compute while state is copied
+        arrays = checkpoint.dump(pipe)
+        await asyncio.to_thread(checkpoint.write, path, arrays)
 
-    sr_cfg = s.raw.get('sr', {})
-    det = SRDetector(
-        pivot_window = sr_cfg.get('pivot_window', 5),
-        merge_tolerance_pct = sr_cfg.get('merge_tolerance_pct', 0.1),
-        merge_tolerance_atr_mult = sr_cfg.get('merge_tolerance_atr_mult', 0.5),
-        max_age_bars = sr_cfg.get('max_age_bars', 300),
-        decay_per_bar = sr_cfg.get('decay_per_bar', 0.01),
-    )
+def _gauges(notifier: Optional[Notifier], disp, ws_health: list, filler, store):
+    # point-in-time state for /metrics, read when scraped
+    def collect():
+        out = [("signalbot_dispatch_inflight", "gauge", "Closes submitted and not yet published", [({}, disp.inflight)]),
+               ("signalbot_lag_seconds", "gauge", "Wall clock minus the t_close of the last close", [({}, disp.lag)]),
+               ("signalbot_shed_total", "counter", "Closes whose signal work was skipped for a newer one", [({}, disp.shed_count)]),
+               ("signalbot_stale_total", "counter", "Results past stale_after_s (tagged or dropped)", [({}, disp.stale)]),
+               ("signalbot_worker_restarts_total", "counter", "Process workers replaced after dying", [({}, disp.restarts)])]
+        ch = notifier.metrics() if notifier else {}
+        for name, typ, help in (("depth", "gauge", "Queued outbound messages"), ("sent", "counter", "Delivered messages"),
+                                ("failed", "counter", "Messages given up on"), ("dropped", "counter", "Messages dropped, queue full"),
+                                ("retries", "counter", "Delivery retries")):
+            out.append((f"signalbot_delivery_{name}" + ("_total" if typ == "counter" else ""), typ, help, [({"destination": d}, m[name]) for d, m in ch.items()]))
+        out.append(("signalbot_ws_connected", "gauge", "Socket is up", [({"conn": str(h.conn_id)}, h.connected) for h in ws_health]))
+        out.append(("signalbot_ws_reconnects_total", "counter", "Socket reconnects", [({"conn": str(h.conn_id)}, h.reconnects) for h in ws_health]))
+        if filler:
+            out.append(("signalbot_backfill_gaps_total", "counter", "1m gaps detected", [({}, filler.gaps)]))
+            out.append(("signalbot_backfill_pending", "gauge", "Symbols with a fill running", [({}, filler.pending)]))
+        if store:
+            out.append(("signalbot_store_written_total", "counter", "Candles appended to the store", [({}, store.written)]))
+        return out
+    return collect
 
-    alerts = s.raw.get('alerts', {})
-    notifier = Notifier(
-        telegram_token = alerts.get('telegram_token'),
-        telegram_chat_id = alerts.get('telegram_chat_id'),
-        webhook_url = alerts.get('webhook_url')
-    )
-    enable_telegram = alerts.get('enable_telegram', True)
-    enable_webhook = alerts.get('enable_webhook', False)
+async def run(raw: Optional[dict] = None, symbols: Optional[List[str]] = None, sink: Optional[Sink] = None):
+    """The live pipeline. app.cluster runs one per worker process with its shard of `symbols` and a `sink`
+    that forwards to the coordinator, which then owns alert delivery (no Notifier here)."""
+    raw = raw if raw is not None else Settings.load().raw
+    ex = raw.get('exchange', {})
+    market = ex.get('market_type', 'spot')
 
-    buf = SeriesBuffer()
-    agg = CandleAggregator(symbols, tfs)
+    alerts = raw.get('alerts', {})
+    notifier = notifier_from_config(alerts) if sink is None else None
+    pipe = Pipeline(raw, symbols=symbols)
+    symbols, tfs = pipe.symbols, pipe.tfs
+    # alerts.digest.enabled: one Telegram digest + one webhook array per close boundary instead of one per close
+    pipe.sink = sink or digest_from_config(notifier, alerts, symbols, tfs) or \
+        NotifierSink(notifier, alerts.get('enable_webhook', False), alerts.get('enable_telegram', True))
 
-    # snapshot cache: symbol -> tf -> last TfSignal-like dict
-    last_tf_signal: Dict[str, Dict[str, dict]] = {sym: {} for sym in symbols}
+    # resume from the last checkpoint; otherwise seed candles / indicators / zones from the local archive
+    # so TFs skip the 250-bar warmup. Process workers hold their own state, so checkpoints need inline/thread
+    ck_cfg = raw.get('checkpoint', {})
+    ck_path = ck_cfg.get('path') if raw.get('execution', {}).get('mode', 'inline') != 'process' else None
+    restored = checkpoint.restore(ck_path, pipe) if ck_path else None
+    missing = [x for x in symbols if x not in pipe.last_1m]
+    if restored:
+        print(f"[checkpoint] restored {len(symbols) - len(missing)} symbols from {ck_path} (saved at {restored['saved_at']})")
+    if missing:
+        bootstrap_from_config(raw.get('warmup', {}), missing, pipe.agg, pipe.buf, pipe.engine, pipe.det)
 
-    def on_close(c: Candle):
-        # 1) buffer this TF candle
-        buf.append(c.symbol, c.tf, c.t_close, c.o, c.h, c.l, c.c, c.v)
-        # 2) compute indicators
-        df = buf.df(c.symbol, c.tf)
-        if len(df) < 250:  # warmup safeguard
-            print(f"WARMUP {c.symbol} {c.tf} size={len(df)}")
-            return
-        feats = compute_features(df, ind_params)
-        row = feats.iloc[-1].to_dict()
-        # 3) update SR with this candle; find nearest
-        det.update(c.symbol, c.tf, c.o, c.h, c.l, c.c)
-        near = det.nearest(c.symbol, c.tf, c.c)
-        sr_pack = {
-            "nearest_support": (near["support"][0], near["support"][1]) if near.get("support") else None,
-            "nearest_resistance": (near["resistance"][0], near["resistance"][1]) if near.get("resistance") else None,
-        }
-        # 4) decide signal
-        cfg = tf_cfg.get(c.tf, {})
-        adx_thr = cfg.get("adx_trend_threshold", 20)
-        score_thr = cfg.get("score_threshold", 72)
-        sr_near_simple = {
-            "support": sr_pack["nearest_support"],
-            "resistance": sr_pack["nearest_resistance"],
-        }
-        direction, score, regime, entry, sl, tp, reasons = decide_signal(row, adx_thr, score_thr, sr_near_simple)
-        payload = {
-            "symbol": c.symbol,
-            "timeframe": c.tf,
-            "closed_at": c.t_close,
-            "regime": regime,
-            "signal": direction,
-            "score": score,
-            "price": float(row["close"]),
-            "indicators": {
-                "ema_fast": float(row.get("ema_fast", 0)),
-                "ema_slow": float(row.get("ema_slow", 0)),
-                "rsi": float(row.get("rsi", 0)),
-                "adx": float(row.get("adx", 0)),
-                "atr": float(row.get("atr", 0)),
-                "bb_width": float(row.get("bb_width", 0))
-            },
-            "sr": sr_pack,
-            "entry_hint": float(entry),
-            "sl_hint": float(sl),
-            "tp_hint": float(tp),
-            "rationale": reasons[:6],
-        }
+    # holes in the 1m sequence (reconnects, checkpoint / archive -> live) are fetched from REST first
+    filler = gapfiller_from_config(raw.get('backfill', {}), market, pipe.ingest_1m)
+    if filler:
+        for sym, t in pipe.last_1m.items():
+            filler.seed(sym, t)
+        if missing and raw.get('warmup', {}).get('archive_dir'):
+            filler.seed_from_archive(raw['warmup']['archive_dir'], missing)
 
-        # cache for snapshot
-        last_tf_signal[c.symbol][c.tf] = payload
+    # latest payload per (symbol, tf) in a shared-memory table for local readers (app.shm_table.TableReader)
+    table = table_from_config(raw.get('shm', {}), symbols, tfs)
+    if table:
+        table.load(pipe.last_tf_signal)
+        pipe.table = table
 
-        # 5) publish this TF
-        print(f"SIGNAL {c.symbol} {c.tf} | {direction} ({score}) | {regime} | close {payload['price']:.2f}")
-        if enable_webhook:
-            asyncio.create_task(notifier.send_json(payload))
-        if enable_telegram:
-            asyncio.create_task(notifier.send_telegram(fmt_signal_msg(payload)))
+    # every 1m input and TF close is appended to the on-disk candle store (same layout as the warmup archive)
+    store = store_from_config(raw.get('store', {}))
+    pipe.agg.store = store
 
-        # 6) snapshot all TFs for this symbol when we have all
-        sym_cache = last_tf_signal[c.symbol]
-        if all(tf in sym_cache for tf in tfs):
-            # basic consensus: count non-NEUTRAL in same side for adjacent TFs
-            longs = sum(1 for tf in tfs if sym_cache[tf]["signal"] == "LONG")
-            shorts = sum(1 for tf in tfs if sym_cache[tf]["signal"] == "SHORT")
-            if longs >= 2: consensus = "STRONG_LONG"
-            elif shorts >= 2: consensus = "STRONG_SHORT"
-            else: consensus = "MIXED"
-            snap = {
-                "symbol": c.symbol,
-                "closed_at": c.t_close,
-                "consensus": consensus,
-                "per_tf": {tf: sym_cache[tf] for tf in tfs}
-            }
-            # console summary
-            row_lines = [f"{tf}:{sym_cache[tf]['signal']}({sym_cache[tf]['score']}) {sym_cache[tf]['regime']}" for tf in tfs]
-            print(f"[{c.symbol}] Snapshot | " + " | ".join(row_lines) + f" | Consensus: {consensus}")
-            if enable_webhook:
-                asyncio.create_task(notifier.send_json({"type": "snapshot", **snap}))
+    # feature / SR / signal work per close runs inline or on a thread / process pool (execution.mode)
+    disp = dispatcher_from_config(pipe, raw)
+    if filler:
+        filler.wait = disp.wait_capacity
 
-    agg.on_close = on_close
+    # per-stage latency histograms on /metrics; metrics.enabled: false turns the timing calls off
+    metrics_srv = await metrics.metrics_from_config(raw.get('metrics', {}))
+    ws_health = []
+    metrics.REGISTRY.collectors.append(_gauges(notifier, disp, ws_health, filler, store))
+    # GET /signals/{symbol}, /snapshot/{symbol}, /candles/{symbol}/{tf} from memory (query.port: 0 = off)
+    query, query_srv = await query_from_config(raw.get('query', {}), pipe)
 
     print("[Step 6] Full pipeline: WS -> Roll-up -> Indicators -> SR -> Signals -> Publish")
-    print("Symbols:", symbols, "Market:", market, "TFs:", tfs)
-    async for ev in kline_1m_events(symbols, market):
-        k = ev.get('k', {})
-        if not k.get('x', False):
-            continue
-        symbol = (ev.get('s') or k.get('s') or '').upper()
-        if symbol not in symbols:
-            continue
-        c1m = _kline_to_1m(symbol, k)
-        agg.ingest_1m(symbol, c1m)
+    print("Symbols:", symbols, "Market:", market, "TFs:", tfs, "Execution:", disp.mode)
+    if table:
+        print("Signal table:", table.path)
+    if query_srv:
+        print("Query API: http://%s:%d/" % query_srv.sockets[0].getsockname()[:2])
+    if metrics_srv:
+        print("Metrics: http://%s:%d/metrics" % metrics_srv.sockets[0].getsockname()[:2])
+    ws_cfg = raw.get('ws', {})
+    wanted = set(symbols)
+    store_task = asyncio.create_task(store.run()) if store else None
+    ck_task = asyncio.create_task(_checkpoint_loop(ck_path, pipe, disp, ck_cfg.get('every_s', 300))) if ck_path else None
+    # non-final klines are rejected before JSON parsing; closed ones arrive as 1m Candles
+    try:
+        async for c1m in closed_1m_candles(symbols, market, streams_per_conn=ws_cfg.get('streams_per_conn', 200),
+                                           queue_size=ws_cfg.get('queue_size', 10_000), base_url=ws_cfg.get('base_url'),
+                                           health=ws_health):
+            if c1m.symbol not in wanted:
+                continue
+            if filler:
+                filler.feed(c1m)
+            else:
+                pipe.ingest_1m(c1m.symbol, c1m)
+            await disp.wait_capacity()
+    finally:
+        if filler:
+            await filler.aclose()
+            print(f"Backfill: {filler.gaps} gaps, {filler.filled} klines filled, {filler.unfilled} missing")
+        if store_task:
+            store_task.cancel()
+            store.close()
+        if ck_task:
+            ck_task.cancel()
+            await disp.drain()
+            checkpoint.save(ck_path, pipe)
+            print(f"[checkpoint] saved {ck_path}")
+        await disp.drain()
+        print("Dispatch:", disp.stats())
+        if isinstance(pipe.sink, DigestSink):
+            pipe.sink.flush()
+        if table:
+            table.close()
+        if notifier:
+            await notifier.aclose()
+            print("Delivery:", notifier.metrics())
+        if query_srv:
+            query_srv.close()
+            print("Query API:", query.stats())
+        if metrics_srv:
+            metrics_srv.close()
 
 if __name__ == '__main__':
     asyncio.run(run())
@@ -0,0 +1,188 @@
+# Persistent closed-candle store in the archive layout (app.archive): <dir>/<SYMBOL>-<interval>.bin, headerless
+# KLINE_DTYPE records in open-time order, so warmup / replay / load_klines read what the live process wrote.
+import argparse, asyncio, glob, os
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from .archive import KLINE_DTYPE, archive_path, INTERVALS
+from .candles import Candle, MINUTE_MS, _tf_minutes
+
+class CandleStore:
+    """Append-only, memory-mapped candle files per (symbol, tf).
+    - append()/extend() buffer records in memory; a key is written once it has `batch` rows, on flush(),
+      or before it is read. Records not newer than the key's last one are ignored (replays, backfills)
+    - run() flushes and fsyncs dirty files every `fsync_s` seconds (fsync in a thread); close() does both
+    - range()/at() bisect on open time (t_close = t + period) over a cached np.memmap: O(log n) lookup and
+      zero-copy slices, remapped only when the file has grown
+    All methods except the fsync are meant to be called from one thread (the event loop)."""
+    def __init__(self, root: str, fsync_s: float = 5.0, batch: int = 256):
+        self.root = root
+        self.fsync_s = fsync_s
+        self.batch = batch
+        os.makedirs(root, exist_ok=True)
+        self._pending: Dict[Tuple[str, str], List[tuple]] = {}
+        self._last: Dict[Tuple[str, str], int] = {}
+        self._maps: Dict[Tuple[str, str], Tuple[int, np.ndarray]] = {}
+        self._dirty: Set[str] = set()
+        self.written = 0
+        self.skipped = 0
+
+    def path(self, symbol: str, tf: str) -> str:
+        return archive_path(self.root, symbol, tf)
+
+    def _tail(self, key: Tuple[str, str]) -> int:
+        # last open time on disk; a torn trailing record from a crash is cut off first
+        last = self._last.get(key)
+        if last is not None:
+            return last
+        p = self.path(*key)
+        size = os.path.getsize(p) if os.path.exists(p) else 0
+        whole = size - size % KLINE_DTYPE.itemsize
+        if whole != size:
+            os.truncate(p, whole)
+        last = -1
+        if whole:
+            last = int(np.fromfile(p, dtype=KLINE_DTYPE, count=1, offset=whole - KLINE_DTYPE.itemsize)["t"][0])
+        self._last[key] = last
+        return last
+
+    def append(self, c: Candle) -> bool:
+        key = (c.symbol.upper(), c.tf.upper())
+        if c.t_open <= self._tail(key):
+            self.skipped += 1
+            return False
+        self._last[key] = c.t_open
+        rows = self._pending.setdefault(key, [])
+        rows.append((c.t_open, c.o, c.h, c.l, c.c, c.v))
+        if len(rows) >= self.batch:
+            self.flush(key)
+        return True
+
+    def extend(self, symbol: str, tf: str, t_open: np.ndarray, o, h, l, c, v) -> int:
+        """Batch append of sorted arrays; rows not newer than the stored tail are dropped."""
+        key = (symbol.upper(), tf.upper())
+        self.flush(key)
+        keep = t_open > self._tail(key)
+        n = int(keep.sum())
+        if n:
+            rec = np.empty(n, dtype=KLINE_DTYPE)
+            for name, x in zip(KLINE_DTYPE.names, (t_open, o, h, l, c, v)):
+                rec[name] = x[keep]
+            self._write(key, rec)
+        self.skipped += len(t_open) - n
+        return n
+
+    def _write(self, key: Tuple[str, str], rec: np.ndarray):
+        p = self.path(*key)
+        with open(p, "ab") as f:
+            f.write(rec.tobytes())
+        self._last[key] = int(rec["t"][-1])
+        self._dirty.add(p)
+        self.written += len(rec)
+
+    def flush(self, key: Optional[Tuple[str, str]] = None):
+        """Write buffered rows (of one key, or all) to the files; durability comes from sync()."""
+        for k in ([key] if key is not None else list(self._pending)):
+            rows = self._pending.pop(k, None)
+            if rows:
+                self._write(k, np.array(rows, dtype=KLINE_DTYPE))
+
+    def _take_dirty(self) -> List[str]:
+        dirty, self._dirty = sorted(self._dirty), set()
+        return dirty
+
+    @staticmethod
+    def _fsync(paths: List[str]):
+        for p in paths:
+            fd = os.open(p, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def sync(self):
+        self.flush()
+        self._fsync(self._take_dirty())
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.fsync_s)
+            self.flush()
+            await asyncio.to_thread(self._fsync, self._take_dirty())
+
+    def close(self):
+        self.sync()
+
+    def records(self, symbol: str, tf: str) -> np.ndarray:
+        """Every stored record of (symbol, tf) as a read-only memmap (empty array when none)."""
+        key = (symbol.upper(), tf.upper())
+        self.flush(key)
+        p = self.path(*key)
+        size = os.path.getsize(p) if os.path.exists(p) else 0
+        size -= size % KLINE_DTYPE.itemsize
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        arr = np.memmap(p, dtype=KLINE_DTYPE, mode="r", shape=(size // KLINE_DTYPE.itemsize,)) if size \
+            else np.empty(0, dtype=KLINE_DTYPE)
+        self._maps[key] = (size, arr)
+        return arr
+
+    def range(self, symbol: str, tf: str, start_close: Optional[int] = None, end_close: Optional[int] = None) -> np.ndarray:
+        """Records with start_close <= t_close < end_close, as a zero-copy slice of the memmap."""
+        arr = self.records(symbol, tf)
+        period = _tf_minutes(tf) * MINUTE_MS
+        a = 0 if start_close is None else int(np.searchsorted(arr["t"], start_close - period, side="left"))
+        b = len(arr) if end_close is None else int(np.searchsorted(arr["t"], end_close - period, side="left"))
+        return arr[a:b]
+
+    def at(self, symbol: str, tf: str, t_close: int) -> Optional[Candle]:
+        r = self.range(symbol, tf, t_close, t_close + 1)
+        if not len(r):
+            return None
+        t, o, h, l, c, v = r[0].tolist()
+        return Candle(symbol.upper(), tf.upper(), t, t_close, o, h, l, c, v, True)
+
+    def last(self, symbol: str, tf: str) -> Optional[Candle]:
+        arr = self.records(symbol, tf)
+        if not len(arr):
+            return None
+        t, o, h, l, c, v = arr[-1].tolist()
+        return Candle(symbol.upper(), tf.upper(), t, t + _tf_minutes(tf) * MINUTE_MS, o, h, l, c, v, True)
+
+def store_from_config(cfg: dict) -> Optional[CandleStore]:
+    if not cfg.get('dir'):
+        return None
+    return CandleStore(cfg['dir'], fsync_s=cfg.get('fsync_s', 5.0), batch=cfg.get('batch', 256))
+
+def main():
+    from datetime import datetime, timezone
+    from .replay import _ms
+    ap = argparse.ArgumentParser(prog="python -m app.store")
+    ap.add_argument("dir")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("info", help="records and time span per file")
+    q = sub.add_parser("query", help="print closed candles of SYMBOL TF with from <= t_close < to")
+    q.add_argument("symbol")
+    q.add_argument("tf")
+    q.add_argument("--from", dest="start", help="ISO date/time (UTC) or epoch ms")
+    q.add_argument("--to", dest="end")
+    q.add_argument("--tail", type=int, default=20, help="rows to print from the end (0 = all)")
+    a = ap.parse_args()
+    iso = lambda ms: datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+    store = CandleStore(a.dir)
+    names = {v: k for k, v in INTERVALS.items()}
+    if a.cmd == "info":
+        for p in sorted(glob.glob(os.path.join(a.dir, "*-*.bin"))):
+            sym, interval = os.path.basename(p)[:-4].rsplit("-", 1)
+            arr = store.records(sym, names.get(interval, interval))
+            span = f"{iso(arr['t'][0])} .. {iso(arr['t'][-1])}" if len(arr) else "-"
+            print(f"{os.path.basename(p):<24} {len(arr):>10} records  {span}")
+    else:
+        r = store.range(a.symbol, a.tf, _ms(a.start), _ms(a.end))
+        period = _tf_minutes(a.tf) * MINUTE_MS
+        for t, o, h, l, c, v in (r[-a.tail:] if a.tail else r).tolist():
+            print(f"{iso(t + period)}  o {o:.4f}  h {h:.4f}  l {l:.4f}  c {c:.4f}  v {v:.3f}")
+        print(f"{len(r)} candles")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Parameter sweep over indicator, S/R and threshold settings, scored on archived candles.
+
+    python -m app.sweep --tf M15 --space sweep.yaml --workers 8 --top 30
+    python -m app.sweep --tf H1 --random 2000 --symbols BTCUSDT ETHUSDT --from 2023-01-01
+
+The space is a YAML mapping of setting -> list of values (see DEFAULT_SPACE); missing settings keep their
+config value. --random N samples N points of the grid instead of walking all of it.
+Every LONG/SHORT close after the 250-bar warmup counts as a trade (as it would be alerted), entered at the close
+with the signal's SL/TP: TP first = +2R (TP sits at 2x the risk), SL first = -1R (both in one bar counts as SL),
+neither within --horizon bars = marked to market at the last bar. Ranked by expectancy (mean R per trade).
+Features depend only on the indicator settings and zones only on the S/R settings, so candidates are grouped
+by (indicator, S/R) pair: each group is one pool task, feature / zone arrays are cached under --cache, and the
+thresholds inside a group are scored with decide_signal_batch on the shared arrays.
+"""
+import argparse, hashlib, json, os, random, shutil, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import yaml
+from .settings import Settings
+from .archive import load_klines
+from .candles import rollup_1m
+from .indicators import IndicatorParams, compute_features
+from .pipeline import make_detector
+from .signal_engine import decide_signal_batch
+
+IND_KEYS = ("ema_fast", "ema_slow", "rsi_length", "macd_fast", "macd_slow", "macd_signal", "bb_length", "bb_std",
+            "atr_length", "adx_length")
+SR_KEYS = ("pivot_window", "merge_tolerance_pct", "merge_tolerance_atr_mult", "max_age_bars", "decay_per_bar")
+THR_KEYS = ("adx_trend_threshold", "score_threshold")
+WARMUP = 250  # Pipeline.compute only signals from the 250th close on
+# decide_signal reads the MACD histogram under its default name only, so other macd_* settings drop the
+# MACD points in live signals as well; sweeping them would change nothing and is refused in main()
+FEAT_COLS = ("close", "ema_fast", "ema_slow", "adx", "atr", "rsi", "MACDh_12_26_9")
+
+DEFAULT_SPACE = {
+    "ema_fast": [20, 50],
+    "ema_slow": [100, 200],
+    "pivot_window": [3, 5, 8],
+    "merge_tolerance_pct": [0.05, 0.1, 0.2],
+    "decay_per_bar": [0.005, 0.01, 0.02],
+    "adx_trend_threshold": [14, 16, 18, 20, 22, 25, 28],
+    "score_threshold": [55, 60, 65, 70, 75, 80, 85],
+}
+
+def candidates(space: Dict[str, list], n_random: Optional[int] = None, seed: int = 0) -> List[dict]:
+    keys = sorted(space)
+    sizes = [len(space[k]) for k in keys]
+    total = int(np.prod(sizes))
+    if n_random is None or n_random >= total:
+        idx = range(total)
+    else:
+        idx = random.Random(seed).sample(range(total), n_random)
+    out = []
+    for i in idx:  # mixed-radix index -> one value per key, without materialising the grid
+        cand = {}
+        for k, n in zip(reversed(keys), reversed(sizes)):
+            i, j = divmod(i, n)
+            cand[k] = space[k][j]
+        out.append(cand)
+    return out
+
+def _hash(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+# --- per-worker state: candle arrays loaded once per process -------------------------------------------
+_BARS: Dict[str, Dict[str, np.ndarray]] = {}
+_BASE: dict = {}
+
+def _init(bars: Dict[str, Dict[str, np.ndarray]], base: dict):
+    global _BARS, _BASE
+    _BARS, _BASE = bars, base
+
+def _cached(cache: str, key: str, build) -> Dict[str, np.ndarray]:
+    path = os.path.join(cache, key + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as z:
+            return {k: z[k] for k in z.files}
+    arrays = build()
+    tmp = f"{path}.{os.getpid()}.tmp"  # per process, then os.replace: readers never see half a file
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return arrays
+
+def _span(symbol: str) -> tuple:
+    t = _BARS[symbol]["t"]
+    return symbol, _BASE["tf"], int(t[0]), int(t[-1]), len(t)
+
+def _prepare(kind: str, symbol: str, params: dict):
+    # phase 1: every (symbol, indicator settings) feature set and (symbol, S/R settings) zone set, once
+    if kind == "f":
+        _cached(_BASE["cache"], "f" + _hash(_span(symbol), params), lambda: _features(symbol, params))
+    else:
+        _cached(_BASE["cache"], "z" + _hash(_span(symbol), params, WARMUP), lambda: _zones(symbol, params))
+
+def _features(symbol: str, ind: dict) -> Dict[str, np.ndarray]:
+    b = _BARS[symbol]
+    df = pd.DataFrame({"open": b["o"], "high": b["h"], "low": b["l"], "close": b["c"], "volume": b["v"]})
+    f = compute_features(df, IndicatorParams(ind))
+    return {k: f[k].to_numpy(np.float64) for k in FEAT_COLS if k in f}
+
+def _zones(symbol: str, sr: dict) -> Dict[str, np.ndarray]:
+    # nearest zones as Pipeline.compute sees them: the detector is fed from the WARMUP-th close on (the
+    # indicator warmup gates it in Pipeline.update), and read after updating with the bar, at its close
+    b = _BARS[symbol]
+    det = make_detector(sr)
+    n = len(b["c"])
+    out = {k: np.full(n, np.nan) for k in ("sup_low", "sup_high", "res_low", "res_high")}
+    sup_low, sup_high, res_low, res_high = (out[k] for k in ("sup_low", "sup_high", "res_low", "res_high"))
+    for i, (o, h, l, c) in enumerate(zip(b["o"].tolist(), b["h"].tolist(), b["l"].tolist(), b["c"].tolist())):
+        if i + 1 < WARMUP:
+            continue
+        det.update(symbol, _BASE["tf"], o, h, l, c)
+        near = det.nearest(symbol, _BASE["tf"], c)
+        s, r = near.get("support"), near.get("resistance")
+        if s:
+            sup_low[i], sup_high[i] = s[0], s[1]
+        if r:
+            res_low[i], res_high[i] = r[0], r[1]
+    return out
+
+def outcomes(high: np.ndarray, low: np.ndarray, close: np.ndarray, sl: np.ndarray, tp: np.ndarray,
+             side: int, horizon: int) -> np.ndarray:
+    """R multiple of a trade entered at close[i] with sl[i] / tp[i], for every bar i (NaN where risk <= 0)."""
+    n = len(close)
+    risk = (close - sl) * side
+    r = np.full(n, np.nan)
+    open_ = np.flatnonzero(risk > 0)
+    for k in range(1, horizon + 1):
+        if not len(open_):
+            break
+        j = open_ + k
+        alive = j < n
+        done_last = open_[~alive]  # ran out of data: mark to market at the last bar
+        r[done_last] = (close[-1] - close[done_last]) * side / risk[done_last]
+        open_, j = open_[alive], j[alive]
+        if side > 0:
+            stop, take = low[j] <= sl[open_], high[j] >= tp[open_]
+        else:
+            stop, take = high[j] >= sl[open_], low[j] <= tp[open_]
+        r[open_[stop]] = -1.0
+        won = open_[take & ~stop]
+        r[won] = (tp[won] - close[won]) * side / risk[won]
+        hit = stop | take
+        if k == horizon:
+            rest = open_[~hit]
+            r[rest] = (close[rest + k] - close[rest]) * side / risk[rest]
+        open_ = open_[~hit]
+    return r
+
+def _evaluate(ind: dict, sr: dict, thresholds: List[dict]) -> List[dict]:
+    cache, horizon = _BASE["cache"], _BASE["horizon"]
+    acc = [{"trades": 0, "wins": 0, "losses": 0, "r": 0.0, "long": 0, "short": 0} for _ in thresholds]
+    for symbol, b in _BARS.items():
+        feats = _cached(cache, "f" + _hash(_span(symbol), ind), lambda: _features(symbol, ind))
+        zones = _cached(cache, "z" + _hash(_span(symbol), sr, WARMUP), lambda: _zones(symbol, sr))
+        # SL/TP do not depend on the thresholds: score every bar as a long and as a short once
+        base = decide_signal_batch(feats, -np.inf, 0, zones["sup_low"], zones["sup_high"], zones["res_low"], zones["res_high"])
+        r_side = {}
+        for side, code in ((1, 1), (-1, 2)):
+            m = base["regime"] == code  # regime under adx_thr=-inf: the EMA side alone
+            sl = np.where(m, base["sl"], np.nan)
+            tp = np.where(m, base["tp"], np.nan)
+            r_side[side] = outcomes(b["h"], b["l"], b["c"], sl, tp, side, horizon)
+        live = np.arange(len(b["c"])) + 1 >= WARMUP
+        for a, th in zip(acc, thresholds):
+            d = decide_signal_batch(feats, th["adx_trend_threshold"], th["score_threshold"], zones["sup_low"],
+                                    zones["sup_high"], zones["res_low"], zones["res_high"])["direction"]
+            for side in (1, -1):
+                rr = r_side[side][(d == side) & live]
+                rr = rr[~np.isnan(rr)]
+                a["trades"] += len(rr)
+                a["long" if side > 0 else "short"] += len(rr)
+                a["wins"] += int((rr > 0).sum())
+                a["losses"] += int((rr < 0).sum())
+                a["r"] += float(rr.sum())
+    return [{**ind, **sr, **th, **a} for th, a in zip(thresholds, acc)]
+
+def load_bars(archive_dir: str, symbols: List[str], tf: str, start_ms: Optional[int], end_ms: Optional[int]):
+    out = {}
+    for sym in symbols:
+        arr = load_klines(archive_dir, sym, "1m", end_ms)
+        if start_ms is not None:
+            arr = arr[np.searchsorted(arr["t"], start_ms, side="left"):]
+        if not len(arr):
+            print(f"{sym}: no 1m klines in {archive_dir}, skipped")
+            continue
+        r = rollup_1m(arr["t"], arr["o"], arr["h"], arr["l"], arr["c"], arr["v"], tf)
+        k = r["closed"]
+        out[sym] = {"t": r["t_open"][k], "o": r["open"][k], "h": r["high"][k], "l": r["low"][k], "c": r["close"][k],
+                    "v": r["volume"][k]}
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m app.sweep", description="Rank indicator / S/R / threshold settings on history")
+    ap.add_argument("--config", default="config/config.yaml")
+    ap.add_argument("--archive", help="kline archive dir (default: warmup.archive_dir)")
+    ap.add_argument("--symbols", nargs="*", help="default: exchange.symbols")
+    ap.add_argument("--tf", default="M15")
+    ap.add_argument("--from", dest="start", help="ISO date/time (UTC) or epoch ms")
+    ap.add_argument("--to", dest="end", help="ISO date/time (UTC) or epoch ms, exclusive")
+    ap.add_argument("--space", help="YAML mapping setting -> list of values (default: DEFAULT_SPACE)")
+    ap.add_argument("--random", type=int, help="sample this many grid points instead of the full grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--horizon", type=int, default=96, help="bars a trade may stay open")
+    ap.add_argument("--min-trades", type=int, default=30)
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--cache", default="data/sweep_cache", help="feature / zone cache dir ('' to disable)")
+    ap.add_argument("--out", help="write every result as CSV")
+    a = ap.parse_args()
+    from .replay import _ms
+
+    s = Settings.load(a.config)
+    tf = a.tf.upper()
+    archive_dir = a.archive or s.raw.get('warmup', {}).get('archive_dir', 'data/klines')
+    symbols = [x.upper() for x in (a.symbols or s.raw.get('exchange', {}).get('symbols', ['BTCUSDT']))]
+    space = DEFAULT_SPACE
+    if a.space:
+        with open(a.space, encoding="utf-8") as f:
+            space = yaml.safe_load(f)
+    unknown = set(space) - set(IND_KEYS + SR_KEYS + THR_KEYS)
+    if unknown:
+        raise SystemExit(f"unknown settings in space: {sorted(unknown)}")
+    macd = sorted(k for k in space if k.startswith("macd_"))
+    if macd:
+        raise SystemExit(f"{macd}: signals only use the MACDh_12_26_9 histogram, these settings cannot change them")
+    # fixed values for everything not swept: the config's, as step6 would run
+    tf_cfg = next((x for x in s.raw.get('timeframes', []) if x.get('tf') == tf), {})
+    fixed = {**{k: v for k, v in s.raw.get('indicators', {}).items() if k in IND_KEYS},
+             **{k: v for k, v in s.raw.get('sr', {}).items() if k in SR_KEYS},
+             "adx_trend_threshold": tf_cfg.get("adx_trend_threshold", 20),
+             "score_threshold": tf_cfg.get("score_threshold", 72)}
+
+    t0 = time.perf_counter()
+    bars = load_bars(archive_dir, symbols, tf, _ms(a.start), _ms(a.end))
+    if not bars:
+        raise SystemExit("no candles to sweep over")
+    cands = [{**fixed, **c} for c in candidates(space, a.random, a.seed)]
+    groups: Dict[Tuple[str, str], tuple] = {}
+    for c in cands:
+        ind = {k: c[k] for k in IND_KEYS if k in c}
+        sr = {k: c[k] for k in SR_KEYS if k in c}
+        g = groups.setdefault((_hash(ind), _hash(sr)), (ind, sr, []))
+        g[2].append({k: c[k] for k in THR_KEYS})
+    n_bars = sum(len(b["c"]) for b in bars.values())
+    print(f"{len(cands)} candidates in {len(groups)} feature/zone groups, {len(bars)} symbols x {tf} "
+          f"({n_bars} bars), {a.workers} workers")
+
+    cache = a.cache or tempfile.mkdtemp(prefix="sweep-")
+    os.makedirs(cache, exist_ok=True)
+    base = {"tf": tf, "cache": cache, "horizon": a.horizon}
+    inds = {_hash(g[0]): g[0] for g in groups.values()}
+    srs = {_hash(g[1]): g[1] for g in groups.values()}
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, a.workers), initializer=_init, initargs=(bars, base)) as ex:
+            prep = [ex.submit(_prepare, "z", sym, sr) for sr in srs.values() for sym in bars] + \
+                   [ex.submit(_prepare, "f", sym, ind) for ind in inds.values() for sym in bars]
+            for f in prep:
+                f.result()
+            print(f"  {len(inds)} feature sets, {len(srs)} zone sets x {len(bars)} symbols ready, "
+                  f"{time.perf_counter() - t0:.0f}s")
+            futs = [ex.submit(_evaluate, ind, sr, th) for ind, sr, th in groups.values()]
+            for i, f in enumerate(futs, 1):
+                results += f.result()
+                if i % max(1, len(futs) // 10) == 0:
+                    print(f"  {i}/{len(futs)} groups, {time.perf_counter() - t0:.0f}s")
+    finally:
+        if not a.cache:
+            shutil.rmtree(cache, ignore_errors=True)
+
+    for r in results:
+        r["hit_rate"] = r["wins"] / r["trades"] if r["trades"] else 0.0
+        r["expectancy"] = r["r"] / r["trades"] if r["trades"] else 0.0
+    ranked = sorted((r for r in results if r["trades"] >= a.min_trades), key=lambda r: (-r["expectancy"], -r["trades"]))
+    swept = [k for k in IND_KEYS + SR_KEYS + THR_KEYS if k in space]
+    print(f"{'#':>3} " + " ".join(f"{k:>{max(6, len(k))}}" for k in swept) +
+          f" {'trades':>7} {'long':>6} {'short':>6} {'hit':>6} {'exp R':>7} {'total R':>8}")
+    for i, r in enumerate(ranked[:a.top], 1):
+        print(f"{i:>3} " + " ".join(f"{r[k]!s:>{max(6, len(k))}}" for k in swept) +
+              f" {r['trades']:>7} {r['long']:>6} {r['short']:>6} {r['hit_rate']:>6.1%} {r['expectancy']:>7.3f} {r['r']:>8.1f}")
+    print(f"{len(ranked)} of {len(results)} candidates with >= {a.min_trades} trades; {time.perf_counter() - t0:.1f}s")
+    if a.out:
+        pd.DataFrame(results).sort_values("expectancy", ascending=False).to_csv(a.out, index=False)
+        print("all results ->", a.out)
+
+if __name__ == "__main__":
+    main()
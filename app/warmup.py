@@ -0,0 +1,84 @@
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from .archive import load_klines
+from .candles import Candle, CandleAggregator, rollup_1m_multi, MINUTE_MS, _tf_minutes
+from .indicators import SeriesBuffer, IndicatorEngine
+from .sr import SRDetector
+
+def _native_bars(archive_dir: str, symbol: str, tf: str, until_ms: Optional[int]) -> Optional[Dict[str, np.ndarray]]:
+    arr = load_klines(archive_dir, symbol, tf, until_ms)
+    if not len(arr):
+        return None
+    t_open = np.asarray(arr["t"])
+    t_close = t_open + _tf_minutes(tf) * MINUTE_MS
+    closed = np.ones(len(arr), dtype=bool)
+    if until_ms is not None:
+        closed = t_close <= until_ms
+    return {"t_open": t_open, "t_close": t_close, "open": np.asarray(arr["o"]), "high": np.asarray(arr["h"]),
+            "low": np.asarray(arr["l"]), "close": np.asarray(arr["c"]), "volume": np.asarray(arr["v"]), "closed": closed}
+
+def bootstrap(archive_dir: str, symbols: List[str], agg: CandleAggregator, buf: SeriesBuffer,
+              engine: IndicatorEngine, det: SRDetector, bars: int = 1000, until_ms: Optional[int] = None,
+              keys: Optional[Set[Tuple[str,str]]] = None) -> Dict[str, int]:
+    """Seed the live pipeline from the local archive before the websocket starts.
+    - 1m klines are rolled up per TF in one vectorized pass; a native <SYMBOL>-<interval>.bin with at least
+      as many closed bars wins
+    - the last `bars` closed candles per TF go through buf / engine / det exactly as live closes would
+    - the trailing partial period becomes the aggregator's active candle so the next live 1m continues it
+      (rolled from the 1m minutes when a native file, which holds closed bars only, wins)
+    - `keys` limits seeding to those (symbol, tf) pairs (process workers only hold their own shard)
+    Returns the number of 1m klines read per symbol."""
+    stats: Dict[str, int] = {}
+    for sym in symbols:
+        sym = sym.upper()
+        one_min = load_klines(archive_dir, sym, "1m", until_ms)
+        stats[sym] = len(one_min)
+        rolled = {}
+        if len(one_min):
+            rolled = rollup_1m_multi(one_min["t"], one_min["o"], one_min["h"], one_min["l"], one_min["c"],
+                                     one_min["v"], agg.tfs)
+        for tf in agg.tfs:
+            if keys is not None and (sym, tf) not in keys:
+                continue
+            # a native file wins unless the 1m roll-up reaches further back (the live store writes TF files
+            # only from the day it was enabled, while its 1m file continues an imported archive)
+            ru, native = rolled.get(tf), _native_bars(archive_dir, sym, tf, until_ms)
+            r = ru
+            if native is not None and (r is None or native["closed"].sum() >= r["closed"].sum()):
+                r = native
+            if r is None:
+                continue
+            closed = np.flatnonzero(r["closed"])
+            if len(closed):
+                sel = closed[-bars:]
+                rows = zip(r["t_open"][sel].tolist(), r["t_close"][sel].tolist(), r["open"][sel].tolist(),
+                           r["high"][sel].tolist(), r["low"][sel].tolist(), r["close"][sel].tolist(),
+                           r["volume"][sel].tolist())
+                for t_o, t_c, o, h, l, c, v in rows:
+                    buf.append(sym, tf, t_c, o, h, l, c, v)
+                    engine.update(sym, tf, t_c, o, h, l, c, v)
+                    if engine.count(sym, tf) >= 250:  # as Pipeline.update: SR starts after the indicator warmup
+                        det.update(sym, tf, o, h, l, c)
+                agg.set_last_closed(sym, tf, Candle(sym, tf, t_o, t_c, o, h, l, c, v, True))
+            last = len(r["closed"]) - 1
+            if r is native and ru is not None and r["closed"][last]:
+                # a native file holds closed bars only: the forming candle comes from the 1m minutes after it
+                k = len(ru["closed"]) - 1
+                if not ru["closed"][k] and (not len(closed) or ru["t_open"][k] >= r["t_close"][closed[-1]]):
+                    r, last = ru, k
+            if last >= 0 and not r["closed"][last]:
+                agg.set_active(sym, tf, Candle(sym, tf, int(r["t_open"][last]), int(r["t_close"][last]),
+                                               float(r["open"][last]), float(r["high"][last]), float(r["low"][last]),
+                                               float(r["close"][last]), float(r["volume"][last]), False))
+    return stats
+
+def bootstrap_from_config(cfg: dict, symbols: List[str], agg: CandleAggregator, buf: SeriesBuffer,
+                          engine: IndicatorEngine, det: SRDetector):
+    archive_dir = cfg.get("archive_dir")
+    if not archive_dir:
+        return
+    t0 = time.perf_counter()
+    stats = bootstrap(archive_dir, symbols, agg, buf, engine, det, bars=cfg.get("bars", 1000))
+    print(f"[warmup] {sum(stats.values())} 1m klines from {archive_dir} for {len(stats)} symbols "
+          f"in {time.perf_counter() - t0:.2f}s")
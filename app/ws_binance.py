@@ -1,9 +1,23 @@
-import asyncio, json, websockets
-from typing import List, AsyncIterator
+import asyncio, json, time, websockets
+from dataclasses import dataclass
+from typing import Any, Callable, List, AsyncIterator, Optional
+from .candles import Candle
+from . import metrics
 
-def _stream_url(market_type: str, streams: List[str]) -> str:
+try:  # optional faster JSON backend
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Binance sends compact JSON, so a closed kline always carries this exact token
+_FINAL = '"x":true'
+
+def _stream_url(market_type: str, streams: List[str], base: Optional[str] = None) -> str:
     market_type = (market_type or 'spot').lower()
-    if market_type in ('usdt_perp','coin_perp'):
+    if base:
+        pass  # explicit endpoint, e.g. a local fake server
+    elif market_type in ('usdt_perp','coin_perp'):
         base = 'wss://fstream.binance.com/stream'
     else:
         base = 'wss://stream.binance.com:9443/stream'
@@ -12,22 +26,153 @@ def _stream_url(market_type: str, streams: List[str]) -> str:
 def _kline_streams(symbols: List[str], interval='1m') -> List[str]:
     return [f"{s.lower()}@kline_{interval}" for s in symbols]
 
-async def kline_1m_events(symbols: List[str], market_type: str) -> AsyncIterator[dict]:
-    url = _stream_url(market_type, _kline_streams(symbols, '1m'))
+def _to_f(x): return float(x) if x is not None else 0.0
+
+def kline_to_candle(k: dict) -> Candle:
+    return Candle(
+        symbol=k['s'].upper(), tf='1m',
+        t_open=int(k['t']), t_close=int(k['T']),
+        o=_to_f(k['o']), h=_to_f(k['h']), l=_to_f(k['l']), c=_to_f(k['c']),
+        v=_to_f(k['v']), closed=bool(k.get('x', False))
+    )
+
+def decode_event(raw, final_only: bool = False) -> Optional[dict]:
+    """Frame -> kline event dict. final_only drops non-final klines before parsing them."""
+    if final_only and _FINAL not in raw:
+        return None
+    try:
+        data = _loads(raw)
+    except Exception:
+        return None
+    payload = data.get('data') or data
+    return payload if payload.get('e') == 'kline' else None
+
+def make_candle_decoder(on_intrabar: Optional[Callable[[Candle], Any]] = None) -> Callable[[Any], Optional[Candle]]:
+    """Frame -> closed 1m Candle. Non-final frames are rejected by a substring test and never parsed,
+    unless on_intrabar is given, in which case they are decoded and handed to it instead."""
+    def decode(raw) -> Optional[Candle]:
+        t0 = time.perf_counter() if metrics.ENABLED else 0.0
+        final = _FINAL in raw
+        if not final and on_intrabar is None:
+            if t0:
+                metrics.WS_FRAMES.inc("intrabar_skipped")
+            return None
+        ev = decode_event(raw)
+        if ev is None:
+            if t0:
+                metrics.WS_FRAMES.inc("invalid")
+            return None
+        c = kline_to_candle(ev['k'])
+        if not c.closed:
+            on_intrabar(c)
+            if t0:
+                metrics.WS_FRAMES.inc("intrabar")
+            return None
+        if t0:
+            metrics.WS_FRAMES.inc("closed")
+            metrics.STAGE.observe(time.perf_counter() - t0, "ws_decode", c.symbol, c.tf)
+            metrics.WS_LAG.observe(time.time() - (c.t_close + 1) / 1000, c.symbol)
+        return c
+    return decode
+
+@dataclass
+class ConnHealth:
+    conn_id: int
+    streams: int
+    connected: bool = False
+    connects: int = 0
+    reconnects: int = 0
+    messages: int = 0
+    last_msg_at: float = 0.0  # time.time() of the last frame
+    last_error: str = ""
+    backoff: float = 1.0
+
+async def _connection(health: ConnHealth, url: str, out: asyncio.Queue, decode: Callable[[Any], Any]):
+    # one combined-stream socket with its own reconnect/backoff; frames go to the shared queue
     backoff = 1
     while True:
         try:
-            async with websockets.connect(url, ping_interval=15, ping_timeout=20) as ws:
+            async with websockets.connect(url, ping_interval=15, ping_timeout=20, max_queue=1024) as ws:
                 backoff = 1
+                health.connected = True
+                health.connects += 1
+                if health.connects > 1:
+                    health.reconnects += 1
                 async for raw in ws:
-                    try:
-                        data = json.loads(raw)
-                    except Exception:
-                        continue
-                    payload = data.get('data') or data
-                    if payload.get('e') == 'kline':
-                        yield payload
+                    health.messages += 1
+                    health.last_msg_at = time.time()
+                    item = decode(raw)
+                    if item is not None:
+                        await out.put(item)  # a full queue stalls only this socket
+            health.connected = False
+            health.last_error = "closed by server"
+        except asyncio.CancelledError:
+            health.connected = False
+            raise
         except Exception as e:
-            print("WS reconnect:", e)
-            await asyncio.sleep(backoff)
-            backoff = min(backoff*2, 30)
+            health.connected = False
+            health.last_error = repr(e)
+            print(f"WS[{health.conn_id}] reconnect:", e)
+        health.backoff = backoff
+        await asyncio.sleep(backoff)
+        backoff = min(backoff*2, 30)
+
+async def _merged(symbols: List[str], market_type: str, decode: Callable[[Any], Any], streams_per_conn: int,
+                  queue_size: int, base_url: Optional[str], health: Optional[List[ConnHealth]]) -> AsyncIterator[Any]:
+    streams = _kline_streams(symbols, '1m')
+    per = max(1, streams_per_conn)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    conns = health if health is not None else []
+    tasks = []
+    for i in range(0, len(streams), per):
+        h = ConnHealth(conn_id=len(conns), streams=len(streams[i:i+per]))
+        conns.append(h)
+        tasks.append(asyncio.create_task(_connection(h, _stream_url(market_type, streams[i:i+per], base_url), queue, decode)))
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def kline_1m_events(symbols: List[str], market_type: str, streams_per_conn: int = 200, queue_size: int = 10_000,
+                          base_url: Optional[str] = None, health: Optional[List[ConnHealth]] = None,
+                          final_only: bool = False) -> AsyncIterator[dict]:
+    """Merged kline events for `symbols`, split over ceil(n / streams_per_conn) sockets.
+    Each socket reconnects on its own; all of them feed one bounded queue. Pass a list as `health`
+    to receive one ConnHealth per socket. final_only skips non-final klines before JSON parsing."""
+    def decode(raw) -> Optional[dict]:
+        if not metrics.ENABLED:
+            return decode_event(raw, final_only)
+        t0 = time.perf_counter()
+        ev = decode_event(raw, final_only)
+        if ev is None:
+            metrics.WS_FRAMES.inc("skipped")
+            return None
+        k = ev['k']
+        if k.get('x'):
+            metrics.WS_FRAMES.inc("closed")
+            metrics.STAGE.observe(time.perf_counter() - t0, "ws_decode", k['s'], "1m")
+            metrics.WS_LAG.observe(time.time() - (int(k['T']) + 1) / 1000, k['s'])
+        else:
+            metrics.WS_FRAMES.inc("intrabar")
+        return ev
+    agen = _merged(symbols, market_type, decode, streams_per_conn, queue_size, base_url, health)
+    try:
+        async for ev in agen:
+            yield ev
+    finally:
+        await agen.aclose()
+
+async def closed_1m_candles(symbols: List[str], market_type: str, streams_per_conn: int = 200, queue_size: int = 10_000,
+                            base_url: Optional[str] = None, health: Optional[List[ConnHealth]] = None,
+                            on_intrabar: Optional[Callable[[Candle], Any]] = None) -> AsyncIterator[Candle]:
+    """Like kline_1m_events but yields the closed 1m Candle directly (see make_candle_decoder)."""
+    agen = _merged(symbols, market_type, make_candle_decoder(on_intrabar), streams_per_conn,
+                   queue_size, base_url, health)
+    try:
+        async for c in agen:
+            yield c
+    finally:
+        await agen.aclose()
@@ -0,0 +1,81 @@
+"""Top-of-hour alert burst against a local HTTP stand-in: one client per message (old) vs the Notifier queue.
+
+    python -m benchmarks.alerts_burst --symbols 200 --tfs 4 --telegram 10
+"""
+import argparse, asyncio, json, time
+import httpx
+from app.alerts import Notifier
+from tests.fakes import FakeHTTPReceiver
+
+def payloads(n_symbols, n_tfs):
+    return [{"symbol": f"S{i:04d}USDT", "timeframe": tf, "seq": j}
+            for j, tf in enumerate(["M15", "H1", "H4", "D1", "W1"][:n_tfs]) for i in range(n_symbols)]
+
+async def old_path(url, tg_url, items, texts):
+    async def send_json(p):
+        async with httpx.AsyncClient(timeout=10) as cli:
+            try:
+                await cli.post(url, json=p)
+            except Exception as e:
+                print("Webhook error:", e)
+    async def send_telegram(t):
+        async with httpx.AsyncClient(timeout=10) as cli:
+            try:
+                await cli.post(tg_url, data={"chat_id": "1", "text": t})
+            except Exception as e:
+                print("Telegram error:", e)
+    tasks = [asyncio.create_task(send_json(p)) for p in items] + [asyncio.create_task(send_telegram(t)) for t in texts]
+    await asyncio.gather(*tasks)
+
+def in_order(rx, tg_path):
+    # per symbol, webhook payloads must arrive in the order they were published
+    last = {}
+    for _, path, body, _ in rx.requests:
+        if path == tg_path:
+            continue
+        p = json.loads(body)
+        if p["seq"] < last.get(p["symbol"], -1):
+            return False
+        last[p["symbol"]] = p["seq"]
+    return True
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=200)
+    ap.add_argument("--tfs", type=int, default=4)
+    ap.add_argument("--telegram", type=int, default=10, help="telegram messages in the burst")
+    ap.add_argument("--chat-interval", type=float, default=0.2, help="receiver's per-chat rate limit (s)")
+    ap.add_argument("--delay", type=float, default=0.002, help="receiver latency per request (s)")
+    ap.add_argument("--fail-every", type=int, default=50)
+    a = ap.parse_args()
+    items = payloads(a.symbols, a.tfs)
+    texts = [f"alert {i}" for i in range(a.telegram)]
+    tg_path = "/botTOKEN/sendMessage"
+
+    async with FakeHTTPReceiver(fail_every=a.fail_every, chat_min_interval=a.chat_interval, delay=a.delay) as rx:
+        t0 = time.perf_counter()
+        await old_path(rx.url + "/hook", rx.url + tg_path, items, texts)
+        dt = time.perf_counter() - t0
+        tg = sum(1 for r in rx.requests if r[1] == tg_path)
+        print(f"client per message: {dt:6.2f}s  connections={rx.connections:<5} webhook delivered={len(rx.requests) - tg}/{len(items)}  "
+              f"telegram delivered={tg}/{len(texts)}  statuses={rx.statuses}")
+
+    async with FakeHTTPReceiver(fail_every=a.fail_every, chat_min_interval=a.chat_interval, delay=a.delay) as rx:
+        n = Notifier("TOKEN", "1", rx.url + "/hook", queue_size=len(items) + 1, concurrency=4,
+                     telegram_min_interval=a.chat_interval, backoff_base=0.05, telegram_api=rx.url)
+        t0 = time.perf_counter()
+        for p in items:
+            n.post_json(p)
+        for t in texts:
+            n.post_telegram(t)
+        await n.aclose(timeout=60)
+        dt = time.perf_counter() - t0
+        m = n.metrics()
+        print(f"Notifier queue:     {dt:6.2f}s  connections={rx.connections:<5} webhook delivered={m['webhook']['sent']}/{len(items)}  "
+              f"telegram delivered={m['telegram']['sent']}/{len(texts)}  statuses={rx.statuses}  "
+              f"per-symbol order {'kept' if in_order(rx, tg_path) else 'BROKEN'}")
+        for k, v in m.items():
+            print(f"  {k}: " + " ".join(f"{x}={y:.4f}" if isinstance(y, float) else f"{x}={y}" for x, y in v.items()))
+
+if __name__ == "__main__":
+    asyncio.run(main())
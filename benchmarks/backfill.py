@@ -0,0 +1,68 @@
+"""Flaky-socket check for GapFiller: the fake server drops a connection every few frames and lets minutes pass
+unsent on every reconnect; TF candles built from the live feed are compared with a roll-up of the full history.
+
+    python -m benchmarks.backfill --symbols 50 --minutes 240
+"""
+import argparse, asyncio, time
+import numpy as np
+from app.backfill import GapFiller, RestKlineSource
+from app.candles import CandleAggregator, rollup_1m_multi
+from app.ws_binance import closed_1m_candles
+from tests.fakes import FakeBinanceWS
+
+TFS = ["M15", "H1"]
+
+async def run(symbols, minutes, disconnect_after, gap, use_filler):
+    closes = []
+    agg = CandleAggregator(symbols, TFS)
+    agg.on_close = lambda c: closes.append((c.symbol, c.tf, c.t_open, c.o, c.h, c.l, c.c, round(c.v, 6)))
+    async with FakeBinanceWS(start_ms=1_700_006_400_000, updates_per_minute=2, disconnect_after=disconnect_after,
+                             gap_on_reconnect=gap) as fake:
+        filler = GapFiller(RestKlineSource("spot", base_url=fake.rest_url), agg.ingest_1m, concurrency=8)
+        health = []
+        t0 = time.perf_counter()
+        agen = closed_1m_candles(symbols, "spot", streams_per_conn=10, base_url=fake.base_url, health=health)
+        end = fake.start_ms + minutes * 60_000
+        done = set()
+        async for c in agen:
+            if c.t_open >= end:
+                done.add(c.symbol)
+                if len(done) == len(symbols):
+                    break
+                continue
+            if use_filler:
+                filler.feed(c)
+            else:
+                agg.ingest_1m(c.symbol, c)
+        await agen.aclose()
+        await filler.drain()
+        dt = time.perf_counter() - t0
+        await filler.aclose()
+        truth = []
+        for sym in symbols:
+            h = np.array([r for r in fake.history[sym] if r[0] < end])
+            out = rollup_1m_multi(h[:, 0].astype(np.int64), h[:, 1], h[:, 2], h[:, 3], h[:, 4], h[:, 5], TFS)
+            for tf in TFS:
+                r = out[tf]
+                for i in np.flatnonzero(r["closed"]):
+                    truth.append((sym, tf, int(r["t_open"][i]), r["open"][i], r["high"][i], r["low"][i], r["close"][i],
+                                  round(r["volume"][i], 6)))
+        return sorted(closes), sorted(truth), filler, fake, sum(x.reconnects for x in health), dt
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--minutes", type=int, default=240)
+    ap.add_argument("--disconnect-after", type=int, default=1500, help="frames per connection before it drops")
+    ap.add_argument("--gap", type=int, default=3, help="minutes lost per reconnect")
+    a = ap.parse_args()
+    symbols = [f"S{i:03d}USDT" for i in range(a.symbols)]
+    for use_filler in (False, True):
+        closes, truth, filler, fake, reconnects, dt = await run(symbols, a.minutes, a.disconnect_after, a.gap, use_filler)
+        ok = closes == truth
+        print(f"{'GapFiller' if use_filler else 'no backfill':<12} reconnects={reconnects} minutes lost={fake.skipped}  "
+              f"gaps={filler.gaps} filled={filler.filled} unfilled={filler.unfilled}  "
+              f"TF closes {len(closes)}/{len(truth)} {'identical to history' if ok else 'DIFFER from history'}  {dt:.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""Close bursts: at a 15-minute boundary every symbol closes M15 at once (and H1 on the hour). Compares
+CloseDispatcher computing each close on its own with batch=True, where the burst's indicators run as one
+vectorized pass per TF, and checks that both publish bit-identical payloads.
+
+    python -m benchmarks.batch --symbols 300 --bursts 40
+"""
+import argparse, asyncio, time
+import numpy as np
+from app.candles import Candle
+from app.executor import CloseDispatcher
+from app.pipeline import Pipeline
+from .run import _raw, _symbols
+from .shedding import CountSink, _same
+from .synth import regime_walk
+
+M15 = 900_000
+
+async def scenario(batch: bool, syms, data, warm: int, bursts: int):
+    raw = _raw()
+    raw = {**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] in ("M15", "H1")]}
+    sink = CountSink()
+    pipe = Pipeline(raw, symbols=syms, sink=sink, log=None)
+    disp = CloseDispatcher(pipe, "inline", shed=False, batch=batch)
+
+    def closes(j):
+        # M15 bar j of every symbol, plus H1 (the last four M15 bars) when j closes an hour
+        out = [Candle(sym, "M15", j * M15, (j + 1) * M15 - 1, *d[:, j].tolist(), True) for sym, d in zip(syms, data)]
+        if j % 4 == 3:
+            out += [Candle(sym, "H1", (j - 3) * M15, (j + 1) * M15 - 1, d[0, j - 3], d[1, j - 3:j + 1].max(),
+                           d[2, j - 3:j + 1].min(), d[3, j], d[4, j - 3:j + 1].sum(), True) for sym, d in zip(syms, data)]
+        return out
+
+    for j in range(warm):  # state only, closes of one bar batched either way
+        if batch:
+            pipe.update_batch(closes(j))
+        else:
+            for c in closes(j):
+                pipe.update(c)
+    times = []
+    for j in range(warm, warm + bursts):
+        burst = closes(j)
+        t0 = time.perf_counter()
+        for c in burst:
+            pipe.agg.on_close(c)
+        await asyncio.sleep(0)
+        await disp.drain()
+        times.append((time.perf_counter() - t0, len(burst)))
+    return sink, times
+
+def engine_only(syms, data, warm: int, bursts: int):
+    # the indicator step alone: one IndicatorEngine.update per symbol vs one update_batch per boundary
+    from app.indicators import IndicatorEngine, IndicatorParams
+    a, b = IndicatorEngine(IndicatorParams({})), IndicatorEngine(IndicatorParams({}))
+    cols = np.stack(data, axis=1)  # field x symbol x bar
+    for eng in (a, b):
+        for j in range(warm):
+            eng.update_batch("M15", syms, j, *cols[:, :, j])
+    ta = tb = 0.0
+    for j in range(warm, warm + bursts):
+        rows = [d[:, j].tolist() for d in data]
+        t0 = time.perf_counter()
+        for sym, r in zip(syms, rows):
+            a.update(sym, "M15", j, *r)
+        t1 = time.perf_counter()
+        b.update_batch("M15", syms, j, *cols[:, :, j])
+        ta, tb = ta + t1 - t0, tb + time.perf_counter() - t1
+    return ta / bursts, tb / bursts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=300)
+    ap.add_argument("--warm", type=int, default=1_040, help="M15 bars before timing (H1 needs 250 closes)")
+    ap.add_argument("--bursts", type=int, default=40, help="timed boundaries")
+    a = ap.parse_args()
+
+    syms = _symbols(a.symbols)
+    n = (a.warm + a.bursts) * 15
+    data = []
+    for k in range(a.symbols):  # M15 bars from a 1m regime walk; o, h, l, c, v rows
+        o, h, l, c, v, _ = regime_walk(n, seed=k, price=100.0 + k)
+        data.append(np.stack((o[::15], h.reshape(-1, 15).max(1), l.reshape(-1, 15).min(1), c[14::15],
+                              v.reshape(-1, 15).sum(1))))
+    res = {}
+    for batch in (False, True):
+        sink, times = asyncio.run(scenario(batch, syms, data, a.warm, a.bursts))
+        res[batch] = sink
+        m15 = [dt for dt, k in times if k == a.symbols]
+        h1 = [dt for dt, k in times if k > a.symbols]
+        print(f"batch={'on ' if batch else 'off'}  M15 burst p50 {np.median(m15)*1e3:7.2f} ms  "
+              f"M15+H1 burst p50 {np.median(h1)*1e3:7.2f} ms  ({np.median(m15)/a.symbols*1e6:.1f} us/close)  "
+              f"signals {sink.signals}")
+    ta, tb = engine_only(syms, data, a.warm, a.bursts)
+    print(f"indicators only, per M15 burst: update x{a.symbols} {ta*1e3:.2f} ms, update_batch {tb*1e3:.2f} ms ({ta/tb:.1f}x)")
+    s0, s1 = res[False], res[True]
+    same = s0.signals == s1.signals and s0.last.keys() == s1.last.keys() and all(_same(s0.last[k], s1.last[k]) for k in s0.last)
+    print(f"payloads {'identical' if same else 'DIFFERENT'} ({len(s0.last)} keys)")
+
+if __name__ == "__main__":
+    main()
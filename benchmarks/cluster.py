@@ -0,0 +1,113 @@
+"""app.cluster end to end without the exchange: each worker process feeds its shard from a synthetic 1m walk
+instead of the websocket, and the coordinator counts what reaches its sink. Reports 1m candles / s and
+records / s for 1..N workers (it only scales with free cores), and with --crash kills worker 0 90% of the way
+through its first run: it is restarted, replays its shard, and every record it sends again must be dropped.
+
+    python -m benchmarks.cluster --symbols 64 --minutes 6000 --workers 1 2 4
+    python -m benchmarks.cluster --workers 2 --crash
+"""
+import argparse, asyncio, os, signal, tempfile, time
+from app.candles import Candle
+from app.cluster import Coordinator, QueueSink, _heartbeat
+from app.pipeline import Pipeline, Sink
+from .run import _raw, _symbols
+from .synth import minutes, regime_walk
+
+class _Count(Sink):
+    def __init__(self):
+        self.signals = self.snapshots = 0
+        self.keys = set()
+
+    def signal(self, payload: dict):
+        self.signals += 1
+        self.keys.add((payload["symbol"], payload["timeframe"], payload["closed_at"]))
+
+    def snapshot(self, snap: dict):
+        self.snapshots += 1
+
+async def _feed(shard: int, symbols, raw: dict, out, heartbeat_s: float):
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    hb = asyncio.create_task(_heartbeat(out, shard, heartbeat_s))
+    b = raw["bench"]
+    n = b["minutes"]
+    t = minutes(n).tolist()
+    pipe = Pipeline(raw, symbols=symbols, sink=QueueSink(out, shard), log=None)
+    data = []
+    for sym in symbols:
+        k = int(sym[1:5])
+        data.append([x.tolist() for x in regime_walk(n, seed=k, price=100.0 + k)[:5]])
+    crash = shard == 0 and b["crash_file"] and not os.path.exists(b["crash_file"])
+    t0 = time.perf_counter()
+    for j in range(n):
+        for sym, (o, h, l, c, v) in zip(symbols, data):
+            pipe.ingest_1m(sym, Candle(sym, "1m", t[j], t[j] + 59_999, o[j], h[j], l[j], c[j], v[j], True))
+        if crash and j == n * 9 // 10:
+            open(b["crash_file"], "w").close()
+            os._exit(1)
+        if j % 60 == 0:
+            await asyncio.sleep(0)  # let heartbeats out
+    out.put(("done", shard, (n * len(symbols), time.perf_counter() - t0)))
+    try:
+        await asyncio.Event().wait()  # stay up until the coordinator stops us
+    finally:
+        hb.cancel()
+
+def feed_main(shard: int, symbols, raw: dict, out, heartbeat_s: float):
+    try:
+        asyncio.run(_feed(shard, symbols, raw, out, heartbeat_s))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+class _Bench(Coordinator):
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self.done = {}
+        self.all_done = asyncio.Event()
+
+    def handle(self, rec: tuple):
+        if rec[0] == "done":
+            self.done[rec[1]] = rec[2]
+            if len(self.done) == len(self.shards):
+                self.all_done.set()
+            return
+        super().handle(rec)
+
+async def scenario(workers: int, n_symbols: int, n_minutes: int, crash_file: str):
+    raw = _raw()
+    raw = {**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] in ("M15", "H1")],
+           "bench": {"minutes": n_minutes, "crash_file": crash_file}}
+    sink = _Count()
+    coord = _Bench(raw, sink, workers=workers, heartbeat_s=1.0, restart_max_s=1.0, target=feed_main,
+                   symbols=_symbols(n_symbols))
+    t0 = time.perf_counter()
+    await coord.run(coord.all_done)
+    return coord, sink, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=64)
+    ap.add_argument("--minutes", type=int, default=6_000, help="1m candles per symbol (M15 signals start at 3750)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--crash", action="store_true", help="kill worker 0 at 90% of its first run")
+    a = ap.parse_args()
+    print(f"{os.cpu_count()} CPUs, {a.symbols} symbols x {a.minutes} minutes")
+    base = None
+    for w in a.workers:
+        with tempfile.TemporaryDirectory() as d:
+            crash_file = os.path.join(d, "crashed") if a.crash else ""
+            coord, sink, wall = asyncio.run(scenario(w, a.symbols, a.minutes, crash_file))
+        n = a.symbols * a.minutes
+        slowest = max(dt for _, dt in coord.done.values())
+        st = coord.stats()
+        print(f"workers={w}  wall {wall:6.2f} s  slowest worker {slowest:6.2f} s  {n / slowest:9.0f} 1m/s  "
+              f"{(sink.signals + sink.snapshots) / wall:7.0f} records/s  signals {sink.signals}  "
+              f"duplicates dropped {st['duplicates']}  restarts {st['restarts']}")
+        if base is None:
+            base = sink.keys
+        elif sink.keys != base:
+            print(f"  signal set differs from workers={a.workers[0]}")
+        if len(sink.keys) != sink.signals:
+            print(f"  {sink.signals - len(sink.keys)} signals delivered twice")
+
+if __name__ == "__main__":
+    main()
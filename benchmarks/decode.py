@@ -0,0 +1,67 @@
+"""Parse cost of kline frames: full json.loads of every frame (old path) vs make_candle_decoder.
+
+    python -m benchmarks.decode --symbols 200 --updates-per-minute 30 --minutes 5
+"""
+import argparse, json, time
+from app import ws_binance
+from app.candles import Candle
+from tests.fakes import FakeBinanceWS
+
+def old_path(frames):
+    out = []
+    for raw in frames:
+        ev = json.loads(raw)
+        ev = ev.get("data") or ev
+        k = ev.get("k", {})
+        if not k.get("x", False):
+            continue
+        out.append(Candle(ev["s"].upper(), "1m", int(k["t"]), int(k["T"]), float(k["o"]), float(k["h"]),
+                          float(k["l"]), float(k["c"]), float(k["v"]), True))
+    return out
+
+def new_path(frames):
+    decode = ws_binance.make_candle_decoder()
+    return [c for c in map(decode, frames) if c is not None]
+
+def bench(fn, frames, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(frames)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=200)
+    ap.add_argument("--updates-per-minute", type=int, default=30, help="Binance pushes roughly every 2s")
+    ap.add_argument("--minutes", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args()
+
+    fake = FakeBinanceWS(updates_per_minute=a.updates_per_minute)
+    symbols = [f"S{i:04d}USDT" for i in range(a.symbols)]
+    frames = [fake.frame(s) for _ in range(a.updates_per_minute * a.minutes) for s in symbols]
+    per = a.symbols * a.minutes  # symbol-minutes
+
+    base, ref = bench(old_path, frames, a.repeat)
+    print(f"json.loads every frame:     {base/per*1e6:8.2f} us per symbol-minute  ({len(frames)} frames)")
+    backends = [("json", json.loads)]
+    try:
+        import orjson
+        backends.append(("orjson", orjson.loads))
+    except ImportError:
+        print("orjson not installed; fast path uses the json fallback")
+    saved = ws_binance._loads
+    try:
+        for name, loads in backends:
+            ws_binance._loads = loads
+            dt, got = bench(new_path, frames, a.repeat)
+            same = got == ref
+            print(f"fast path ({name:<6}):        {dt/per*1e6:8.2f} us per symbol-minute  "
+                  f"({base/dt:.1f}x, {len(got)} closed candles, {'identical' if same else 'MISMATCH'})")
+    finally:
+        ws_binance._loads = saved
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Outbound request count of step6's per-close alerts vs DigestSink, on a warmed-up Pipeline over live-style 1m input.
+
+    python -m benchmarks.digest --symbols 50 --hours 4
+"""
+import argparse, asyncio, gzip, json, time
+import numpy as np
+from app.alerts import Notifier
+from app.candles import Candle
+from app.digest import DigestSink
+from app.pipeline import Pipeline
+from app.replay import _closes_in_order
+from app.settings import Settings
+from app.step6_run import NotifierSink
+from tests.fakes import FakeHTTPReceiver
+from .synth import random_walk
+
+T0 = 1_700_006_400_000  # a UTC midnight
+
+def build(raw, symbols, tfs, warm_min, live_min):
+    pipe = Pipeline({**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] in tfs]}, symbols=symbols, log=None)
+    t = T0 + np.arange(warm_min + live_min, dtype=np.int64) * 60_000
+    live = {}
+    for i, sym in enumerate(symbols):
+        o, h, l, c, v = random_walk(len(t), seed=i, price=100.0 * (i + 1))
+        rolled = pipe.agg.ingest_1m_batch(sym, t[:warm_min], o[:warm_min], h[:warm_min], l[:warm_min], c[:warm_min], v[:warm_min])
+        for candle in _closes_in_order(pipe, sym, rolled):
+            pipe.on_close(candle)
+        live[sym] = [Candle(sym, "1m", int(t[j]), int(t[j]) + 59_999, o[j], h[j], l[j], c[j], v[j], True)
+                     for j in range(warm_min, len(t))]
+    return pipe, live
+
+async def run(pipe, live, make_sink):
+    async with FakeHTTPReceiver() as rx:
+        n = Notifier("TOKEN", "1", rx.url + "/hook", queue_size=100_000, telegram_min_interval=0.0, telegram_api=rx.url)
+        pipe.sink = make_sink(n)
+        t0 = time.perf_counter()
+        for j in range(len(next(iter(live.values())))):
+            for sym, bars in live.items():
+                pipe.ingest_1m(sym, bars[j])
+            await asyncio.sleep(0)
+        if isinstance(pipe.sink, DigestSink):
+            pipe.sink.flush()
+        await n.aclose(timeout=120)
+        dt = time.perf_counter() - t0
+        signals = 0
+        for _, path, body, _ in rx.requests:
+            if path == "/hook":
+                if body[:2] == b"\x1f\x8b":
+                    body = gzip.decompress(body)
+                items = json.loads(body)
+                signals += sum(1 for x in (items if isinstance(items, list) else [items]) if x.get("type") != "snapshot")
+        tg = sum(1 for r in rx.requests if r[1] != "/hook")
+        return len(rx.requests), len(rx.requests) - tg, tg, signals, sum(len(r[2]) for r in rx.requests), dt
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--hours", type=int, default=4, help="live hours streamed after warmup")
+    ap.add_argument("--tfs", default="M15,H1")
+    a = ap.parse_args()
+    raw = Settings.load("config/config.yaml").raw
+    tfs = a.tfs.split(",")
+    symbols = [f"S{i:03d}USDT" for i in range(a.symbols)]
+    warm = 260 * 60 * max({"M15": 15, "H1": 60, "H4": 240}[tf] for tf in tfs) // 60
+
+    counts = {}
+    for name, make in [
+        ("per close", lambda n: NotifierSink(n, True, True)),
+        ("digest", lambda n: DigestSink(n, symbols, tfs, window=5.0, enable_webhook=True, enable_telegram=True)),
+        ("digest+gzip", lambda n: DigestSink(n, symbols, tfs, window=5.0, enable_webhook=True, enable_telegram=True, gzip=True)),
+    ]:
+        pipe, live = build(raw, symbols, tfs, warm, a.hours * 60)
+        total, hooks, tg, signals, nbytes, dt = await run(pipe, live, make)
+        counts[name] = (total, signals)
+        print(f"{name:<12} requests={total:>6} (webhook {hooks}, telegram {tg})  signals delivered={signals}  "
+              f"bytes={nbytes:>9}  {dt:.2f}s")
+    base = counts["per close"][0]
+    for k in ("digest", "digest+gzip"):
+        same = counts[k][1] == counts["per close"][1]
+        print(f"{k}: {base / max(counts[k][0], 1):.0f}x fewer requests, {'no signal lost' if same else 'SIGNALS LOST'}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
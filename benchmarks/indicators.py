@@ -0,0 +1,64 @@
+"""Before/after benchmark and parity check: compute_features on the whole buffer vs IndicatorEngine.update.
+
+    python -m benchmarks.indicators --bars 3000 --closes 500
+"""
+import argparse, time
+import numpy as np
+import pandas as pd
+from app.indicators import IndicatorParams, IndicatorEngine, SeriesBuffer, compute_features
+from .synth import random_walk
+
+WARMUP = 250
+COLS = ["ema_fast", "ema_slow", "rsi", "MACD_12_26_9", "MACDh_12_26_9", "MACDs_12_26_9", "bb_width", "atr", "adx"]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=3000, help="history already in the buffer")
+    ap.add_argument("--closes", type=int, default=500, help="timed closes on top of the history")
+    ap.add_argument("--tol", type=float, default=1e-6, help="max relative difference after warmup")
+    a = ap.parse_args()
+
+    n = a.bars + a.closes
+    o, h, l, c, v = random_walk(n, seed=7)
+    p = IndicatorParams({})
+
+    # before: append + rebuild DataFrame + full pandas_ta recompute per close
+    buf = SeriesBuffer()
+    for i in range(a.bars):
+        buf.append("BTCUSDT", "M15", i, o[i], h[i], l[i], c[i], v[i])
+    t0 = time.perf_counter()
+    for i in range(a.bars, n):
+        buf.append("BTCUSDT", "M15", i, o[i], h[i], l[i], c[i], v[i])
+        compute_features(buf.df("BTCUSDT", "M15"), p).iloc[-1].to_dict()
+    before = (time.perf_counter() - t0) / a.closes
+
+    # after: streaming update from the new candle only
+    eng = IndicatorEngine(p)
+    for i in range(a.bars):
+        eng.update("BTCUSDT", "M15", i, o[i], h[i], l[i], c[i], v[i])
+    t0 = time.perf_counter()
+    for i in range(a.bars, n):
+        eng.update("BTCUSDT", "M15", i, o[i], h[i], l[i], c[i], v[i])
+    after = (time.perf_counter() - t0) / a.closes
+
+    # parity on a single full-length series
+    df = pd.DataFrame({"t": np.arange(n), "open": o, "high": h, "low": l, "close": c, "volume": v}).set_index("t")
+    ref = compute_features(df, p)
+    eng = IndicatorEngine(p)
+    got = pd.DataFrame([eng.update("X", "M15", i, o[i], h[i], l[i], c[i], v[i]) for i in range(n)], index=df.index)
+    worst = 0.0
+    for col in COLS:
+        x = ref[col].to_numpy(float)[WARMUP:]
+        y = got[col].to_numpy(float)[WARMUP:]
+        rel = np.abs(x - y) / np.maximum(1.0, np.abs(x))
+        print(f"  {col:<16} max rel diff {np.nanmax(rel):.3e}")
+        worst = max(worst, float(np.nanmax(rel)))
+
+    print(f"compute_features per close: {before*1e6:10.1f} us")
+    print(f"IndicatorEngine per close:  {after*1e6:10.1f} us  ({before/after:.0f}x)")
+    print(f"parity after {WARMUP} bars: {'OK' if worst <= a.tol else 'FAIL'} (worst {worst:.3e})")
+    if worst > a.tol:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
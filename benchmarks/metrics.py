@@ -0,0 +1,103 @@
+"""Per-stage latency from app.metrics on a live-shaped run: FakeBinanceWS -> closed_1m_candles -> Pipeline, then
+one scrape of the /metrics endpoint, summarised as p50 / p99 per stage. Also times Pipeline.on_close with
+instrumentation off and on to show its cost.
+
+    python -m benchmarks.metrics --symbols 50 --minutes 120
+"""
+import argparse, asyncio, time
+from typing import Dict, List
+import httpx
+from app import metrics
+from app.candles import Candle
+from app.pipeline import Pipeline
+from app.ws_binance import closed_1m_candles
+from tests.fakes import FakeBinanceWS
+from .run import _raw, _series, _symbols
+from .synth import minutes
+
+def _quantile(buckets: List[tuple], q: float) -> float:
+    # buckets: cumulative (le, count) in order; upper bound of the bucket holding the q-th observation
+    total = buckets[-1][1]
+    for le, n in buckets:
+        if n >= q * total:
+            return le
+    return float("inf")
+
+def summarize(text: str, name: str, by: str) -> Dict[str, tuple]:
+    series: Dict[str, List[tuple]] = {}
+    for line in text.splitlines():
+        if not line.startswith(name + "_bucket{"):
+            continue
+        labels, value = line[len(name) + 8:].rsplit("} ", 1)
+        lb = dict(x.split("=", 1) for x in labels.split(","))
+        key = lb[by].strip('"')
+        series.setdefault(key, {}).setdefault(float(lb["le"].strip('"')), 0)
+        series[key][float(lb["le"].strip('"'))] += int(value)  # summed over the other labels
+    return {k: (_quantile(sorted(v.items()), 0.5), _quantile(sorted(v.items()), 0.99), max(v.values()))
+            for k, v in series.items()}
+
+def overhead(n_symbols: int, closes: int) -> tuple:
+    raw = _raw()
+    syms, warm = _symbols(n_symbols), 260
+    length = warm + closes // n_symbols + 1
+    data = [tuple(x.tolist() for x in s) for s in _series(n_symbols, length)]
+    t = (minutes(length) * 15).tolist()
+    cfg = {**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] == "M15"]}
+    pipes = {False: Pipeline(cfg, symbols=syms, log=None), True: Pipeline(cfg, symbols=syms, log=None)}
+    spent = {False: 0.0, True: 0.0}
+    # off and on alternate bar by bar so clock drift and cache state hit both alike
+    for j in range(length):
+        for enabled in ((False, True) if j % 2 else (True, False)):
+            metrics.ENABLED = enabled
+            pipe = pipes[enabled]
+            t0 = time.perf_counter()
+            for sym, (o, h, l, c, v) in zip(syms, data):
+                pipe.on_close(Candle(sym, "M15", t[j], t[j] + 900_000, o[j], h[j], l[j], c[j], v[j], True))
+            if j >= warm:
+                spent[enabled] += time.perf_counter() - t0
+    per = (length - warm) * n_symbols
+    return spent[False] / per, spent[True] / per
+
+async def live(n_symbols: int, n_minutes: int) -> str:
+    raw = _raw()
+    metrics.ENABLED = True
+    srv = await metrics.serve_metrics(port=0)
+    port = srv.sockets[0].getsockname()[1]
+    syms = _symbols(n_symbols)
+    pipe = Pipeline(raw, symbols=syms, log=None)
+    got = 0
+    async with FakeBinanceWS(updates_per_minute=3) as fake:
+        agen = closed_1m_candles(syms, "spot", streams_per_conn=25, base_url=fake.base_url)
+        async for c in agen:
+            pipe.ingest_1m(c.symbol, c)
+            got += 1
+            if got >= n_symbols * n_minutes:
+                break
+        await agen.aclose()
+    async with httpx.AsyncClient() as cli:
+        text = (await cli.get(f"http://127.0.0.1:{port}/metrics")).text
+    srv.close()
+    return text
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--minutes", type=int, default=120, help="fake minutes streamed per symbol")
+    ap.add_argument("--closes", type=int, default=20_000, help="timed closes for the on/off comparison")
+    a = ap.parse_args()
+
+    off, on = overhead(a.symbols, a.closes)
+    print(f"on_close: {off*1e6:.1f} us off, {on*1e6:.1f} us on -> instrumentation costs {(on-off)*1e6:.2f} us "
+          f"per close ({(on/off-1)*100:.1f}%)")
+
+    text = asyncio.run(live(a.symbols, a.minutes))
+    print(f"/metrics: {len(text)/1024:.0f} KiB, {text.count(chr(10))} lines")
+    print(f"{'stage':<16}{'p50 <=':>12}{'p99 <=':>12}{'count':>10}")
+    for stage, (p50, p99, n) in summarize(text, "signalbot_stage_seconds", "stage").items():
+        print(f"{stage:<16}{p50*1e6:>10.0f}us{p99*1e6:>10.0f}us{n:>10}")
+    # fake minutes are in the past, so only the bucket shape of these is meaningful here
+    for name in ("signalbot_ws_kline_lag_seconds", "signalbot_close_to_publish_seconds"):
+        print(name, "series:", len(summarize(text, name, "symbol")))
+
+if __name__ == "__main__":
+    main()
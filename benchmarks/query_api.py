@@ -0,0 +1,149 @@
+"""Load test for app.query_api: a warmed pipeline keeps ingesting one synthetic minute for every symbol each
+--tick-ms while client processes hammer the API over keep-alive connections (signals, snapshots, candle
+ranges, half of them conditional) and hold long-polls open. Compares ingestion with and without readers:
+per-minute ingest time and how late each minute starts (event loop delay), plus requests / s by status.
+Checks first that the responses match the pipeline's state.
+
+    python -m benchmarks.query_api --symbols 50 --seconds 5 --clients 2 --conns 16 --pollers 50
+"""
+import argparse, asyncio, json, multiprocessing as mp, os, random, time
+from collections import Counter
+import numpy as np
+from app.candles import Candle
+from app.pipeline import Pipeline
+from app.query_api import QueryAPI
+from .run import _raw, _symbols
+from .synth import minutes, regime_walk
+
+async def _get(r, w, path: str, etag: str = None):
+    w.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n{'If-None-Match: %s' % etag + chr(13) + chr(10) if etag else ''}\r\n".encode())
+    head = (await r.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    hdrs = {k.lower(): v.strip() for k, _, v in (x.partition(":") for x in head[1:] if x)}
+    body = await r.readexactly(int(hdrs.get("content-length", 0)))
+    return int(head[0].split()[1]), hdrs.get("etag"), body
+
+async def _reader(port: int, paths, end: float, counts: Counter):
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    etags = {}
+    rnd = random.Random()
+    while time.monotonic() < end:
+        path = rnd.choice(paths)
+        status, etag, _ = await _get(r, w, path, etags.get(path) if rnd.random() < 0.5 else None)
+        counts[status] += 1
+        if etag:
+            etags[path] = etag
+    w.close()
+
+async def _poller(port: int, path: str, end: float, counts: Counter):
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    etag = None
+    while time.monotonic() < end:
+        status, tag, _ = await _get(r, w, f"{path}?wait={max(0.1, end - time.monotonic()):.1f}", etag)
+        counts["wakeups" if status == 200 and etag else "polls"] += 1
+        etag = tag or etag
+    w.close()
+
+def _load(port: int, syms, tfs, seconds: float, conns: int, pollers: int, out):
+    paths = [f"/signals/{s}" for s in syms] + [f"/snapshot/{s}" for s in syms] + \
+        [f"/candles/{s}/{tf}" for s in syms for tf in tfs] + [f"/candles/{s}/{tfs[0]}?from=0&to=1" for s in syms]
+    async def main():
+        end = time.monotonic() + seconds
+        counts = Counter()
+        await asyncio.gather(*[_reader(port, paths, end, counts) for _ in range(conns)],
+                             *[_poller(port, f"/signals/{syms[i % len(syms)]}", end, counts) for i in range(pollers)])
+        return counts
+    os.nice(19)  # on a small box the clients would otherwise take the CPU from the server, not its loop
+    out.put(asyncio.run(main()))
+
+def _setup(n_symbols: int, warm: int, live: int):
+    raw = _raw()
+    raw = {**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] in ("M15", "H1")]}
+    syms = _symbols(n_symbols)
+    pipe = Pipeline(raw, symbols=syms, log=None)
+    t = minutes(warm + live).tolist()
+    data = [[x.tolist() for x in regime_walk(warm + live, seed=k, price=100.0 + k)[:5]] for k in range(n_symbols)]
+
+    def feed(j):
+        for sym, (o, h, l, c, v) in zip(syms, data):
+            pipe.ingest_1m(sym, Candle(sym, "1m", t[j], t[j] + 59_999, o[j], h[j], l[j], c[j], v[j], True))
+    for j in range(warm):
+        feed(j)
+    return pipe, feed
+
+async def _check(port: int, pipe: Pipeline):
+    r, w = await asyncio.open_connection("127.0.0.1", port)
+    sym, tf = pipe.symbols[0], pipe.tfs[0]
+    bad = []
+    status, etag, body = await _get(r, w, f"/signals/{sym}")
+    if json.loads(body) != json.loads(json.dumps(pipe.last_tf_signal[sym])):
+        bad.append("signals")
+    if (await _get(r, w, f"/signals/{sym}", etag))[0] != 304:
+        bad.append("etag")
+    status, _, body = await _get(r, w, f"/snapshot/{sym}")
+    if status != 200 or json.loads(body)["per_tf"].keys() != set(pipe.tfs):
+        bad.append("snapshot")
+    a = pipe.buf.arrays(sym, tf)
+    rows = json.loads((await _get(r, w, f"/candles/{sym}/{tf}"))[2])["rows"]
+    if rows != [list(x) for x in zip(a["t"].tolist(), *(a[k].tolist() for k in ("open", "high", "low", "close", "volume")))]:
+        bad.append("candles")
+    lo, hi = a["t"][10], a["t"][20]
+    if [x[0] for x in json.loads((await _get(r, w, f"/candles/{sym}/{tf}?from={lo}&to={hi}"))[2])["rows"]] != a["t"][10:20].tolist():
+        bad.append("candle range")
+    w.close()
+    print(f"responses {'match the pipeline' if not bad else 'WRONG: ' + ', '.join(bad)}")
+
+async def scenario(pipe: Pipeline, feed, start: int, ticks: int, tick_s: float, load, check: bool):
+    api = QueryAPI(pipe)
+    pipe.query = api
+    srv = await api.start("127.0.0.1", 0, max_connections=10_000)
+    port = srv.sockets[0].getsockname()[1]
+    if check:
+        await _check(port, pipe)
+    procs, out = [], mp.get_context("spawn").Queue()
+    if load:
+        procs = [mp.get_context("spawn").Process(target=_load, args=(port, *args, out)) for args in load]
+        for p in procs:
+            p.start()
+        await asyncio.sleep(1.0)  # clients up and connected
+    cost, late = [], []
+    loop = asyncio.get_running_loop()
+    due = loop.time()
+    for j in range(start, start + ticks):
+        due += tick_s
+        await asyncio.sleep(max(0.0, due - loop.time()))
+        late.append(loop.time() - due)
+        t0 = time.perf_counter()
+        feed(j)
+        cost.append(time.perf_counter() - t0)
+    counts = Counter()
+    for _ in procs:
+        counts.update(await asyncio.to_thread(out.get))
+    for p in procs:
+        p.join()
+    srv.close()
+    pipe.query = None
+    return np.array(cost), np.array(late), counts, api.stats()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--warm", type=int, default=15_300, help="1m candles before the live part (H1 needs 15000)")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--tick-ms", type=float, default=10.0, help="one 1m candle for every symbol this often")
+    ap.add_argument("--clients", type=int, default=2, help="client processes")
+    ap.add_argument("--conns", type=int, default=16, help="back-to-back request connections per client")
+    ap.add_argument("--pollers", type=int, default=50, help="long-poll connections per client")
+    a = ap.parse_args()
+    ticks = int(a.seconds * 1000 / a.tick_ms)
+    pipe, feed = _setup(a.symbols, a.warm, 2 * ticks + 200)
+    print(f"{a.symbols} symbols, one minute every {a.tick_ms:g} ms for {a.seconds:g} s")
+    for name, load in (("idle", None), ("loaded", [(pipe.symbols, pipe.tfs, a.seconds + 1, a.conns, a.pollers)] * a.clients)):
+        start = a.warm if load is None else a.warm + ticks
+        cost, late, counts, st = asyncio.run(scenario(pipe, feed, start, ticks, a.tick_ms / 1000, load, load is None))
+        reqs = sum(v for k, v in counts.items() if isinstance(k, int))
+        print(f"{name:6s} ingest/minute p50 {np.median(cost)*1e3:6.2f} ms p99 {np.percentile(cost, 99)*1e3:6.2f} ms  "
+              f"late p50 {np.median(late)*1e3:6.2f} ms p99 {np.percentile(late, 99)*1e3:6.2f} ms max {late.max()*1e3:6.2f} ms  "
+              f"{reqs / (a.seconds + 1):8.0f} req/s {dict(counts)}  serialized {st['serialized']}")
+
+if __name__ == "__main__":
+    main()
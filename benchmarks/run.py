@@ -0,0 +1,287 @@
+"""Hot-path benchmark suite: every case at several symbol counts, each (case, size) in a fresh process so
+peak RSS belongs to that case alone. Reports ops/s, p50/p99 latency per op and peak memory, writes JSON and
+compares it with a stored baseline (exit code 1 on a regression beyond --tolerance).
+
+    python -m benchmarks.run                                   # all cases at 1, 10, 100, 1000 symbols
+    python -m benchmarks.run --cases on_close --symbols 1 100
+    python -m benchmarks.run --out bench.json --save-baseline  # refresh benchmarks/baseline.json
+    python -m benchmarks.run --metrics                         # same, with app.metrics timing on (overhead check)
+"""
+import argparse, json, os, platform, resource, subprocess, sys, time
+from typing import Callable, Dict, List
+import numpy as np
+from .synth import regime_walk, minutes
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "config.yaml")
+TFS = ["M15", "H1", "H4", "D1", "W1"]
+CASES: Dict[str, Callable] = {}
+
+def case(fn):
+    CASES[fn.__name__] = fn
+    return fn
+
+def _series(n_symbols: int, length: int):
+    # one regime walk shared by all symbols, rotated and rescaled per symbol (generating 1000 walks is slow)
+    o, h, l, c, v, _ = regime_walk(length + 997 * min(n_symbols, 50), seed=11, price=100.0)
+    out = []
+    for k in range(n_symbols):
+        a = 997 * (k % 50)
+        s = 1.0 + k * 0.37
+        out.append((o[a:a + length] * s, h[a:a + length] * s, l[a:a + length] * s, c[a:a + length] * s, v[a:a + length]))
+    return out
+
+def _round_robin(n_symbols: int, length: int):
+    # op i touches symbol i % n at bar i // n: every symbol advances together, like a live minute
+    i = 0
+    def nxt():
+        nonlocal i
+        k, j = i % n_symbols, (i // n_symbols) % length
+        i += 1
+        return k, j
+    return nxt
+
+def _symbols(n: int) -> List[str]:
+    return [f"S{k:04d}USDT" for k in range(n)]
+
+def _raw():
+    from app.settings import Settings
+    return Settings.load(CONFIG).raw
+
+@case
+def ingest_1m(n, ops):
+    from app.candles import Candle, CandleAggregator
+    syms, length = _symbols(n), ops // n + 2  # time only moves forward; no more minutes than ops need
+    data = [tuple(x.tolist() for x in s) for s in _series(n, length)]
+    t = minutes(length).tolist()
+    agg = CandleAggregator(syms, TFS)
+    nxt = _round_robin(n, length)
+    def op():
+        k, j = nxt()
+        o, h, l, c, v = data[k]
+        agg.ingest_1m(syms[k], Candle(syms[k], "1m", t[j], t[j] + 59_999, o[j], h[j], l[j], c[j], v[j], True))
+    return op
+
+def _filled_buffer(n, rows=1000):
+    from app.indicators import SeriesBuffer
+    syms, data = _symbols(n), _series(n, rows)
+    buf = SeriesBuffer()
+    for sym, (o, h, l, c, v) in zip(syms, data):
+        for j, row in enumerate(zip(o.tolist(), h.tolist(), l.tolist(), c.tolist(), v.tolist())):
+            buf.append(sym, "M15", j, *row)
+    return syms, data, buf
+
+@case
+def buffer_append(n, ops):
+    syms, data, buf = _filled_buffer(n, 300)
+    rows = [list(zip(*(x.tolist() for x in d))) for d in data]
+    nxt = _round_robin(n, 300)
+    def op():
+        k, j = nxt()
+        buf.append(syms[k], "M15", 10_000 + j, *rows[k][j])
+    return op
+
+@case
+def buffer_df(n, ops):
+    syms, _, buf = _filled_buffer(n)
+    nxt = _round_robin(n, 1)
+    def op():
+        k, _ = nxt()
+        buf.df(syms[k], "M15")
+    return op
+
+@case
+def compute_features(n, ops):
+    from app.indicators import IndicatorParams, compute_features as cf
+    syms, _, buf = _filled_buffer(n, 500)
+    p = IndicatorParams({})
+    nxt = _round_robin(n, 1)
+    def op():
+        k, _ = nxt()
+        cf(buf.df(syms[k], "M15"), p)
+    return op
+
+def _warm_detector(n, bars=300, extra=300):
+    from app.pipeline import make_detector
+    syms, data = _symbols(n), _series(n, bars + extra)
+    det = make_detector(_raw().get("sr", {}))
+    rows = [list(zip(*(x.tolist() for x in d[:4]))) for d in data]
+    for sym, r in zip(syms, rows):
+        for row in r[:bars]:
+            det.update(sym, "M15", *row)
+    return syms, rows, det
+
+@case
+def sr_update(n, ops):
+    syms, rows, det = _warm_detector(n)
+    nxt = _round_robin(n, 300)
+    def op():
+        k, j = nxt()
+        det.update(syms[k], "M15", *rows[k][300 + j])
+    return op
+
+@case
+def sr_nearest(n, ops):
+    syms, rows, det = _warm_detector(n)
+    nxt = _round_robin(n, 300)
+    def op():
+        k, j = nxt()
+        det.nearest(syms[k], "M15", rows[k][300 + j][3])
+    return op
+
+def _engine_rows(n, bars=300):
+    from app.indicators import IndicatorEngine, IndicatorParams
+    syms, data = _symbols(n), _series(n, bars)
+    eng = IndicatorEngine(IndicatorParams({}))
+    out = []
+    for sym, (o, h, l, c, v) in zip(syms, data):
+        for j, row in enumerate(zip(o.tolist(), h.tolist(), l.tolist(), c.tolist(), v.tolist())):
+            r = eng.update(sym, "M15", j, *row)
+        out.append(r)
+    return syms, out
+
+@case
+def decide_signal(n, ops):
+    from app.signal_engine import decide_signal as ds
+    syms, rows = _engine_rows(n)
+    sr = [{"support": (r["close"] * 0.98, r["close"] * 0.99), "resistance": (r["close"] * 1.01, r["close"] * 1.02)} for r in rows]
+    nxt = _round_robin(n, 1)
+    def op():
+        k, _ = nxt()
+        ds(rows[k], 20, 72, sr[k])
+    return op
+
+@case
+def fmt_signal_msg(n, ops):
+    from app.alerts import fmt_signal_msg as fmt
+    from app.signal_engine import decide_signal as ds
+    syms, rows = _engine_rows(n)
+    payloads = []
+    for sym, r in zip(syms, rows):
+        sr = {"support": (r["close"] * 0.98, r["close"] * 0.99), "resistance": None}
+        d, score, regime, entry, sl, tp, reasons = ds(r, 20, 72, sr)
+        payloads.append({"symbol": sym, "timeframe": "M15", "signal": d, "score": score, "regime": regime,
+                         "price": r["close"], "sr": {"nearest_support": sr["support"], "nearest_resistance": None},
+                         "indicators": {"rsi": r["rsi"], "adx": r["adx"], "atr": r["atr"]},
+                         "entry_hint": entry, "sl_hint": sl, "tp_hint": tp, "rationale": reasons})
+    nxt = _round_robin(n, 1)
+    def op():
+        k, _ = nxt()
+        fmt(payloads[k])
+    return op
+
+@case
+def on_close(n, ops):
+    # step6's per-close chain: buffer -> indicators -> SR -> signal -> publish (no-op sink), warmed past 250 bars
+    from app.candles import Candle
+    from app.pipeline import Pipeline
+    raw = _raw()
+    syms, warm, length = _symbols(n), 260, 560
+    pipe = Pipeline({**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] == "M15"]}, symbols=syms, log=None)
+    data = [tuple(x.tolist() for x in s) for s in _series(n, length)]
+    t = (minutes(length) * 15).tolist()
+    for sym, (o, h, l, c, v) in zip(syms, data):
+        for j in range(warm):
+            pipe.on_close(Candle(sym, "M15", t[j], t[j] + 900_000, o[j], h[j], l[j], c[j], v[j], True))
+    nxt = _round_robin(n, length - warm)
+    def op():
+        k, j = nxt()
+        o, h, l, c, v = data[k]
+        j += warm
+        pipe.on_close(Candle(syms[k], "M15", t[j], t[j] + 900_000, o[j], h[j], l[j], c[j], v[j], True))
+    return op
+
+def run_one(name: str, n: int, budget: float, max_ops: int) -> dict:
+    t0 = time.perf_counter()
+    op = CASES[name](n, max_ops + min(n, 100))
+    setup = time.perf_counter() - t0
+    for _ in range(min(n, 100)):
+        op()
+    lat = []
+    clock = time.perf_counter_ns
+    end = clock() + int(budget * 1e9)
+    while len(lat) < max_ops:
+        a = clock()
+        op()
+        b = clock()
+        lat.append(b - a)
+        if b > end and len(lat) >= min(n, 1000):
+            break
+    x = np.array(lat, dtype=np.float64)
+    return {"ops": len(lat), "ops_per_s": len(lat) / (x.sum() / 1e9), "p50_us": float(np.percentile(x, 50)) / 1e3,
+            "p99_us": float(np.percentile(x, 99)) / 1e3, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+            "setup_s": setup}
+
+def compare(cur: dict, base: dict, tol: float) -> List[str]:
+    bad = []
+    for name, sizes in cur["results"].items():
+        for n, r in sizes.items():
+            b = base.get("results", {}).get(name, {}).get(n)
+            if not b:
+                continue
+            if r["ops_per_s"] < b["ops_per_s"] * (1 - tol):
+                bad.append(f"{name}@{n}: {r['ops_per_s']:.0f} ops/s vs baseline {b['ops_per_s']:.0f}")
+            if r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tol) + 20:
+                bad.append(f"{name}@{n}: peak {r['peak_rss_mb']:.0f} MB vs baseline {b['peak_rss_mb']:.0f} MB")
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    ap.add_argument("--cases", nargs="*", default=list(CASES), choices=list(CASES))
+    ap.add_argument("--symbols", nargs="*", type=int, default=[1, 10, 100, 1000])
+    ap.add_argument("--budget", type=float, default=1.0, help="timed seconds per (case, size)")
+    ap.add_argument("--max-ops", type=int, default=200_000)
+    ap.add_argument("--out", default="bench.json")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative drop in ops/s / growth in memory")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--metrics", action="store_true", help="run with app.metrics instrumentation enabled")
+    ap.add_argument("--one", nargs=2, metavar=("CASE", "SYMBOLS"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+
+    if a.one:
+        if a.metrics:
+            from app import metrics
+            metrics.ENABLED = True
+        print(json.dumps(run_one(a.one[0], int(a.one[1]), a.budget, a.max_ops)))
+        return
+
+    res: Dict[str, Dict[str, dict]] = {}
+    print(f"{'case':<18}{'symbols':>8}{'ops/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak MB':>9}{'setup s':>9}")
+    for name in a.cases:
+        for n in a.symbols:
+            out = subprocess.run([sys.executable, "-m", "benchmarks.run", "--one", name, str(n), "--budget", str(a.budget),
+                                  "--max-ops", str(a.max_ops)] + (["--metrics"] if a.metrics else []), capture_output=True, text=True)
+            if out.returncode:
+                print(f"{name:<18}{n:>8}  failed: {out.stderr.strip().splitlines()[-1] if out.stderr.strip() else out.returncode}")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            res.setdefault(name, {})[str(n)] = r
+            print(f"{name:<18}{n:>8}{r['ops_per_s']:>12.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+                  f"{r['peak_rss_mb']:>9.0f}{r['setup_s']:>9.1f}")
+
+    doc = {"meta": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+                    "numpy": np.__version__, "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+           "results": res}
+    with open(a.out, "w") as f:
+        json.dump(doc, f, indent=1)
+    if "on_close" in res:
+        n = max(res["on_close"], key=int)
+        per_s = res["on_close"][n]["ops_per_s"]
+        print(f"capacity: ~{per_s / len(TFS):.0f} symbols finish a boundary where all {len(TFS)} TFs close within 1 s "
+              f"(on_close at {n} symbols, one core)")
+    if a.save_baseline:
+        with open(a.baseline, "w") as f:
+            json.dump(doc, f, indent=1)
+        print("baseline written:", a.baseline)
+        return
+    if os.path.exists(a.baseline):
+        with open(a.baseline) as f:
+            bad = compare(doc, json.load(f), a.tolerance)
+        for b in bad:
+            print("REGRESSION", b)
+        print(f"{len(bad)} regressions against {a.baseline}")
+        sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
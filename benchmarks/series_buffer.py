@@ -0,0 +1,57 @@
+"""Per-close cost of SeriesBuffer as the symbol count grows: time, net allocation and GC passes.
+
+    python -m benchmarks.series_buffer --symbols 1 10 100 1000
+"""
+import argparse, gc, time, tracemalloc
+import pandas as pd
+from app.indicators import SeriesBuffer
+from .synth import random_walk
+
+class DictListBuffer:
+    """The previous list-of-dicts SeriesBuffer, kept here as the baseline."""
+    def __init__(self):
+        self.store = {}
+    def append(self, symbol, tf, t_close, o, h, l, c, v):
+        key = (symbol.upper(), tf.upper())
+        self.store.setdefault(key, []).append({"t": t_close, "open": o, "high": h, "low": l, "close": c, "volume": v})
+        if len(self.store[key]) > 5000:
+            self.store[key] = self.store[key][-4000:]
+    def df(self, symbol, tf):
+        return pd.DataFrame(self.store[(symbol.upper(), tf.upper())]).set_index("t")
+
+def run(buf, n_symbols: int, history: int, closes: int, read: str):
+    o, h, l, c, v = (x.tolist() for x in random_walk(history + closes, seed=3))
+    syms = [f"S{i:04d}USDT" for i in range(n_symbols)]
+    for i in range(history):
+        for s in syms:
+            buf.append(s, "M15", i, o[i], h[i], l[i], c[i], v[i])
+    gc.collect()
+    gcs = sum(x["collections"] for x in gc.get_stats())
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for i in range(history, history + closes):
+        for s in syms:
+            buf.append(s, "M15", i, o[i], h[i], l[i], c[i], v[i])
+            getattr(buf, read)(s, "M15")
+    dt = time.perf_counter() - t0
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = closes * n_symbols
+    return dt / n * 1e6, cur / n, peak, sum(x["collections"] for x in gc.get_stats()) - gcs
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, nargs="+", default=[1, 10, 100, 1000])
+    ap.add_argument("--history", type=int, default=4500)
+    ap.add_argument("--closes", type=int, default=20)
+    a = ap.parse_args()
+    print(f"{'impl':<10} {'read':<7} {'symbols':>7} {'us/close':>10} {'B kept/close':>13} {'peak MB':>9} {'gc runs':>8} {'held MB':>8}")
+    for n in a.symbols:
+        for name, make, read in (("dictlist", DictListBuffer, "df"), ("ring", SeriesBuffer, "df"), ("ring", SeriesBuffer, "arrays")):
+            buf = make()
+            us, kept, peak, gcs = run(buf, n, a.history, a.closes, read)
+            held = buf.nbytes() / 2**20 if hasattr(buf, "nbytes") else float("nan")
+            print(f"{name:<10} {read:<7} {n:>7} {us:>10.1f} {kept:>13.1f} {peak/2**20:>9.2f} {gcs:>8} {held:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""app.shm_table: parity, read latency and torn-row check.
+- parity: a pipeline fed a synthetic walk mirrors every published payload; each table row must match the
+  pipeline's last_tf_signal
+- read: TableReader.get / row / snapshot per call
+- torn: a writer process rewrites a few rows as fast as it can, every float field of a row set to one value;
+  a reader in this process checks that no row it returns mixes two writes
+
+    python -m benchmarks.shm_table --symbols 50 --seconds 3
+"""
+import argparse, math, multiprocessing as mp, os, tempfile, time
+from app.candles import Candle
+from app.pipeline import Pipeline
+from app.shm_table import NAMES, SignalTable, TableReader
+from .run import _raw, _symbols
+from .synth import minutes, regime_walk
+
+_FLOATS = [k for k in NAMES if k not in ("seq", "closed_at", "direction", "regime", "stale", "score")]
+
+def _payload(sym: str, tf: str, k: int) -> dict:
+    x = float(k)
+    return {"symbol": sym, "timeframe": tf, "closed_at": k, "signal": "LONG", "regime": "trend_bull", "score": k % 100,
+            "price": x, "indicators": dict.fromkeys(("ema_fast", "ema_slow", "rsi", "adx", "atr", "bb_width"), x),
+            "sr": {"nearest_support": (x, x), "nearest_resistance": (x, x)}, "entry_hint": x, "sl_hint": x,
+            "tp_hint": x, "lag_s": x}
+
+def _writer(path: str, syms, seconds: float):
+    t = SignalTable(path, syms, ["M15"])
+    k, end = 0, time.monotonic() + seconds
+    while time.monotonic() < end:
+        for s in syms:
+            k += 1
+            t.put(_payload(s, "M15", k))
+    t.close()
+
+def parity(n_symbols: int, n_minutes: int, path: str):
+    raw = _raw()
+    raw = {**raw, "timeframes": [x for x in raw["timeframes"] if x["tf"] in ("M15", "H1")]}
+    syms = _symbols(n_symbols)
+    pipe = Pipeline(raw, symbols=syms, log=None)
+    pipe.table = SignalTable(path, syms, pipe.tfs)
+    t = minutes(n_minutes).tolist()
+    data = [[x.tolist() for x in regime_walk(n_minutes, seed=k, price=100.0 + k)[:5]] for k in range(n_symbols)]
+    t0 = time.perf_counter()
+    for j in range(n_minutes):
+        for sym, (o, h, l, c, v) in zip(syms, data):
+            pipe.ingest_1m(sym, Candle(sym, "1m", t[j], t[j] + 59_999, o[j], h[j], l[j], c[j], v[j], True))
+    feed = time.perf_counter() - t0
+    r = TableReader(path)
+    bad = 0
+    for sym in syms:
+        for tf, p in pipe.last_tf_signal[sym].items():
+            row = r.row(sym, tf)
+            s, res = p["sr"]["nearest_support"], p["sr"]["nearest_resistance"]
+            want = [p["closed_at"], p["score"], p["price"], p["entry_hint"], p["sl_hint"], p["tp_hint"],
+                    *p["indicators"].values(), *(s or (math.nan, math.nan)), *(res or (math.nan, math.nan))]
+            got = [row["closed_at"], row["score"], row["price"], row["entry"], row["sl"], row["tp"], row["ema_fast"],
+                   row["ema_slow"], row["rsi"], row["adx"], row["atr"], row["bb_width"], row["support_low"],
+                   row["support_high"], row["resistance_low"], row["resistance_high"]]
+            bad += any(a != b and not (a != a and b != b) for a, b in zip(want, got))
+    print(f"parity: {pipe.table.writes} rows written in {feed:.2f} s of feeding, "
+          f"{sum(len(x) for x in pipe.last_tf_signal.values())} keys checked, {bad} mismatched")
+    return r, syms, pipe.tfs
+
+def read_latency(r: TableReader, syms, tfs, n: int = 200_000):
+    keys = [(s, tf) for s in syms for tf in tfs]
+    for name, fn in (("get", r.get), ("row", r.row)):
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(*keys[i % len(keys)])
+        print(f"{name:8s} {(time.perf_counter() - t0) / n * 1e9:7.0f} ns/call")
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        r.snapshot()
+    print(f"snapshot {(time.perf_counter() - t0) / 1000 * 1e6:7.1f} us for {len(keys)} rows")
+
+def torn(path: str, seconds: float):
+    syms = _symbols(4)
+    w = mp.get_context("spawn").Process(target=_writer, args=(path, syms, seconds))
+    w.start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    r = TableReader(path)
+    reads = bad = 0
+    while w.is_alive():
+        for s in syms:
+            row = r.row(s, "M15")
+            if row is None:
+                continue
+            reads += 1
+            x = row["price"]
+            bad += row["closed_at"] != x or any(row[k] != x for k in _FLOATS)
+        snap = r.snapshot()
+        bad += int(sum((snap[k] != snap["price"]).sum() for k in _FLOATS))
+    w.join()
+    print(f"torn: {reads} row reads against a live writer ({r.writes()} writes), {bad} torn")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--minutes", type=int, default=16_000, help="1m candles per symbol (H1 signals start at 15000)")
+    ap.add_argument("--seconds", type=float, default=3.0, help="torn-row check duration")
+    a = ap.parse_args()
+    with tempfile.TemporaryDirectory() as d:
+        r, syms, tfs = parity(a.symbols, a.minutes, os.path.join(d, "parity.tbl"))
+        read_latency(r, syms, tfs)
+        torn(os.path.join(d, "torn.tbl"), a.seconds)
+
+if __name__ == "__main__":
+    main()
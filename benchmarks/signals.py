@@ -0,0 +1,122 @@
+"""decide_signal_batch vs the scalar decide_signal.
+
+1. property check: random rows built from edge values (NaN, exact thresholds, equal EMAs, close exactly on the
+   breakout line, missing zones, missing optional columns) must give identical regime, direction, score,
+   entry / SL / TP (bitwise, NaN == NaN) and reasons
+2. the same on real features: IndicatorEngine + SRDetector over a synthetic M15 history
+3. timing: a year of M15 bars for --symbols symbols
+
+    python -m benchmarks.signals --rows 200000 --symbols 100
+"""
+import argparse, math, time
+import numpy as np
+from app.indicators import IndicatorEngine, IndicatorParams
+from app.pipeline import make_detector
+from app.signal_engine import DIRECTIONS, REGIMES, decide_signal, decide_signal_batch, reasons_from_mask
+from .synth import minutes, regime_walk
+
+ADX_THR, SCORE_THR = 20.0, 70
+OPTIONAL = ("adx", "atr", "rsi", "MACDh_12_26_9")
+
+def _same_float(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or np.float64(a).tobytes() == np.float64(b).tobytes()
+
+def check(cols: dict, sup_low, sup_high, res_low, res_high) -> int:
+    """Number of rows where the batch result differs from decide_signal on that row."""
+    out = decide_signal_batch(cols, ADX_THR, SCORE_THR, sup_low, sup_high, res_low, res_high)
+    names = list(cols)
+    data = [np.asarray(cols[k], dtype=np.float64).tolist() for k in names]
+    bad = 0
+    for i, vals in enumerate(zip(*data)):
+        row = dict(zip(names, vals))
+        sr = {"support": None if math.isnan(sup_low[i]) else (float(sup_low[i]), float(sup_high[i])),
+              "resistance": None if math.isnan(res_low[i]) else (float(res_low[i]), float(res_high[i]))}
+        direction, score, regime, entry, sl, tp, reasons = decide_signal(row, ADX_THR, SCORE_THR, sr)
+        ok = (direction == DIRECTIONS[int(out["direction"][i])] and score == int(out["score"][i])
+              and regime == REGIMES[out["regime"][i]] and reasons == reasons_from_mask(int(out["reasons"][i]))
+              and all(_same_float(x, float(out[k][i])) for x, k in ((entry, "entry"), (sl, "sl"), (tp, "tp"))))
+        if not ok:
+            if not bad:
+                print("  first mismatch:", row, sr, (direction, score, regime, entry, sl, tp, reasons),
+                      {k: v[i] for k, v in out.items()})
+            bad += 1
+    return bad
+
+def edge_rows(n: int, seed: int, drop: tuple = ()):
+    rng = np.random.default_rng(seed)
+    pick = lambda xs: rng.choice(np.array(xs, dtype=np.float64), n)
+    close = pick([100.0, 101.0, 99.0, 100.3, np.nan])
+    atr = pick([1.0, 0.0, 2.5, np.nan])
+    cols = {
+        "close": close,
+        "ema_fast": pick([100.0, 101.0, 99.0, np.nan]),
+        "ema_slow": pick([100.0, 101.0, 99.0, np.nan]),
+        "adx": pick([ADX_THR, ADX_THR - 1e-9, 35.0, 0.0, np.nan]),
+        "atr": atr,
+        "rsi": pick([50.0, 49.9, 50.1, 70.0, np.nan]),
+        "MACDh_12_26_9": pick([0.0, 0.5, -0.5, -0.0, np.nan]),
+    }
+    for k in drop:
+        del cols[k]
+    a = 0.1 * np.nan_to_num(atr) if "atr" in drop else 0.1 * atr
+    # zones placed so the breakout tests land exactly on, just above and just below their lines
+    res_high = np.where(rng.random(n) < 0.3, close - a, pick([98.0, 100.0, 102.0]))
+    res_low = res_high - pick([0.5, 1.0])
+    sup_low = np.where(rng.random(n) < 0.3, close + a, pick([98.0, 100.0, 102.0]))
+    sup_high = sup_low + pick([0.5, 1.0])
+    none_r, none_s = rng.random(n) < 0.25, rng.random(n) < 0.25
+    res_low[none_r] = res_high[none_r] = np.nan
+    sup_low[none_s] = sup_high[none_s] = np.nan
+    return cols, sup_low, sup_high, res_low, res_high
+
+def real_rows(n: int, seed: int):
+    o, h, l, c, v, _ = regime_walk(n * 15, seed=seed, price=100.0)
+    # 1m -> M15 by slicing is enough for a feature history
+    o, h, l, c = o[::15], h.reshape(-1, 15).max(1), l.reshape(-1, 15).min(1), c[14::15]
+    eng, det = IndicatorEngine(IndicatorParams({})), make_detector({})
+    rows, zones = [], []
+    t = minutes(n) * 15
+    for i in range(n):
+        rows.append(eng.update("X", "M15", int(t[i]), o[i], h[i], l[i], c[i], 1.0))
+        det.update("X", "M15", o[i], h[i], l[i], c[i])
+        near = det.nearest("X", "M15", c[i])
+        s, r = near.get("support"), near.get("resistance")
+        zones.append((s[0] if s else np.nan, s[1] if s else np.nan, r[0] if r else np.nan, r[1] if r else np.nan))
+    cols = {k: np.array([r.get(k, np.nan) for r in rows]) for k in ("close", "ema_fast", "ema_slow") + OPTIONAL}
+    z = np.array(zones).T
+    return cols, z[0], z[1], z[2], z[3]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--real-bars", type=int, default=20_000)
+    ap.add_argument("--symbols", type=int, default=100)
+    ap.add_argument("--bars", type=int, default=365 * 96, help="bars per symbol for the timing (a year of M15)")
+    a = ap.parse_args()
+
+    total = 0
+    for k, drop in enumerate([()] + [(c,) for c in OPTIONAL] + [OPTIONAL]):
+        bad = check(*edge_rows(a.rows // 6, seed=k, drop=drop))
+        total += bad
+        print(f"edge rows, missing {list(drop) or 'nothing'}: {bad} mismatches")
+    bad = check(*real_rows(a.real_bars, seed=1))
+    total += bad
+    print(f"real features ({a.real_bars} M15 bars): {bad} mismatches")
+
+    cols, sl_, sh, rl, rh = edge_rows(a.bars, seed=99)
+    t0 = time.perf_counter()
+    for _ in range(a.symbols):
+        decide_signal_batch(cols, ADX_THR, SCORE_THR, sl_, sh, rl, rh)
+    dt = time.perf_counter() - t0
+    n = min(a.bars, 20_000)
+    sub = {k: v[:n].tolist() for k, v in cols.items()}
+    t0 = time.perf_counter()
+    for i in range(n):
+        decide_signal({k: v[i] for k, v in sub.items()}, ADX_THR, SCORE_THR, {"support": None, "resistance": None})
+    scalar = (time.perf_counter() - t0) / n
+    print(f"batch: {a.symbols} symbols x {a.bars} bars in {dt:.3f}s ({a.symbols*a.bars/dt/1e6:.1f}M bars/s); "
+          f"scalar would take ~{scalar*a.symbols*a.bars:.0f}s")
+    print("consistent" if not total else f"{total} MISMATCHES")
+
+if __name__ == "__main__":
+    main()
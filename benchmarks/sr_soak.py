@@ -0,0 +1,45 @@
+"""Soak SRDetector with millions of updates and watch resident memory.
+
+    python -m benchmarks.sr_soak --updates 2000000 --history 500
+    python -m benchmarks.sr_soak --updates 2000000 --history 0    # unbounded lists, for comparison
+"""
+import argparse, os, resource, time
+from app.sr import SRDetector
+from .synth import random_walk
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # not Linux: peak RSS is the best we have
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=2_000_000)
+    ap.add_argument("--history", type=int, default=500, help="history_bars; 0 keeps every bar")
+    ap.add_argument("--pairs", type=int, default=4, help="(symbol, tf) series updated round-robin")
+    ap.add_argument("--max-growth-mb", type=float, default=5.0)
+    a = ap.parse_args()
+
+    period = 100_000
+    o, h, l, c, _ = (x.tolist() for x in random_walk(period, seed=11, vol=0.004))
+    det = SRDetector(history_bars=a.history or None)
+    keys = [(f"S{i}USDT", "M15") for i in range(a.pairs)]
+    samples = []
+    t0 = time.perf_counter()
+    step = max(1, a.updates // 10)
+    for i in range(a.updates):
+        j = i % period
+        sym, tf = keys[i % a.pairs]
+        det.update(sym, tf, o[j], h[j], l[j], c[j])
+        if (i + 1) % step == 0:
+            samples.append(rss_mb())
+            print(f"{i+1:>10} updates  rss {samples[-1]:8.1f} MB  {(i+1)/(time.perf_counter()-t0):10.0f} upd/s")
+    growth = samples[-1] - samples[0]
+    print(f"RSS growth after first sample: {growth:.1f} MB")
+    if a.history and growth > a.max_growth_mb:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""CandleStore: write throughput (batch roll-up and per-candle appends), range-query latency and RSS while
+querying years of 1m data, plus parity with load_klines / the in-memory roll-up.
+
+    python -m benchmarks.store --symbols 5 --years 2
+"""
+import argparse, os, tempfile, time
+import numpy as np
+from app.archive import load_klines
+from app.candles import Candle, CandleAggregator
+from app.store import CandleStore
+from .synth import random_walk
+
+T0 = 1_600_000_000_000 // 86_400_000 * 86_400_000
+TFS = ["M15", "H1", "H4", "D1", "W1"]
+
+def anon_mb() -> float:
+    # heap only: memmap pages are file-backed page cache and do not count here
+    with open("/proc/self/status") as f:
+        return next(int(x.split()[1]) for x in f if x.startswith("RssAnon")) / 1e3
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=5)
+    ap.add_argument("--years", type=float, default=2)
+    ap.add_argument("--appends", type=int, default=200_000, help="1m candles written one by one through ingest_1m")
+    ap.add_argument("--queries", type=int, default=20_000)
+    a = ap.parse_args()
+    n = int(a.years * 525_600)
+    t = T0 + np.arange(n, dtype=np.int64) * 60_000
+    with tempfile.TemporaryDirectory() as d:
+        store = CandleStore(d)
+        agg = CandleAggregator([f"S{i}USDT" for i in range(a.symbols)], TFS)
+        agg.store = store
+        data = {}
+        t0 = time.perf_counter()
+        for i, sym in enumerate(agg.symbols):
+            data[sym] = random_walk(n, seed=i)
+            agg.ingest_1m_batch(sym, t[:-a.appends], *(x[:-a.appends] for x in data[sym]))
+        store.sync()
+        dt = time.perf_counter() - t0
+        print(f"batch:   {a.symbols * (n - a.appends) / dt / 1e6:6.2f} M 1m bars/s rolled up and written (+ TF closes), "
+              f"{sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d)) / 1e6:.0f} MB on disk")
+
+        sym = agg.symbols[0]
+        o, h, l, c, v = (x.tolist() for x in data[sym])
+        t0 = time.perf_counter()
+        for j in range(n - a.appends, n):
+            agg.ingest_1m(sym, Candle(sym, "1m", int(t[j]), int(t[j]) + 59_999, o[j], h[j], l[j], c[j], v[j], True))
+        store.sync()
+        dt = time.perf_counter() - t0
+        print(f"stream:  {a.appends / dt:8.0f} 1m candles/s through ingest_1m with the store attached (incl. fsync)")
+
+        ok = np.array_equal(load_klines(d, sym)["c"], data[sym][3]) and store.written and \
+            len(store.range(sym, "M15")) == n // 15
+        rng = np.random.default_rng(0)
+        base = anon_mb()
+        t0 = time.perf_counter()
+        total = 0
+        for _ in range(a.queries):
+            s = agg.symbols[rng.integers(a.symbols)]
+            start = int(T0 + rng.integers(n - a.appends - 1440) * 60_000)
+            r = store.range(s, "1m", start + 60_000, start + 86_400_000 + 60_000)
+            total += len(r)
+        dt = time.perf_counter() - t0
+        print(f"query:   {dt / a.queries * 1e6:6.1f} us per 1-day 1m range ({total // a.queries} rows, zero-copy); "
+              f"heap +{anon_mb() - base:.1f} MB over {a.symbols} x {a.years:g} years")
+        t0 = time.perf_counter()
+        full = store.range(sym, "1m")
+        closes = full["c"].mean()
+        print(f"scan:    {len(full) / (time.perf_counter() - t0) / 1e6:6.1f} M rows/s mean over a full {a.years:g}-year memmap; "
+              f"store matches input: {'yes' if ok else 'NO'}")
+
+if __name__ == "__main__":
+    main()
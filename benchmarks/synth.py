@@ -0,0 +1,49 @@
+import numpy as np
+
+def random_walk(n: int, seed: int = 0, price: float = 60000.0, vol: float = 0.003):
+    """Deterministic OHLCV random walk: returns (o, h, l, c, v) float64 arrays of length n."""
+    rng = np.random.default_rng(seed)
+    c = price * np.exp(np.cumsum(rng.normal(0.0, vol, n)))
+    o = np.empty(n); o[0] = price; o[1:] = c[:-1]
+    wick = np.abs(rng.normal(0.0, vol / 3, (2, n)))
+    h = np.maximum(o, c) * (1 + wick[0])
+    l = np.minimum(o, c) * (1 - wick[1])
+    v = rng.gamma(2.0, 50.0, n)
+    return o, h, l, c, v
+
+# (name, drift per bar, volatility multiplier, mean reversion per bar)
+REGIMES = (("bull", 1e-5, 1.0, 0.0), ("bear", -1e-5, 1.2, 0.0), ("range", 0.0, 0.7, 0.02), ("shock", 0.0, 3.0, 0.0))
+
+def regime_walk(n: int, seed: int = 0, price: float = 60000.0, vol: float = 0.0008,
+                min_len: int = 300, max_len: int = 6000):
+    """Deterministic 1m OHLCV with regimes: trending up / down, mean-reverting range and volatility shocks,
+    in segments of min_len..max_len bars. Returns (o, h, l, c, v, regime) with regime an index into REGIMES."""
+    rng = np.random.default_rng(seed)
+    regime = np.empty(n, dtype=np.int8)
+    i = 0
+    while i < n:
+        k = int(rng.integers(min_len, max_len))
+        regime[i:i + k] = rng.choice(len(REGIMES), p=(0.3, 0.3, 0.3, 0.1))
+        i += k
+    drift = np.array([r[1] for r in REGIMES])[regime]
+    sigma = np.array([r[2] for r in REGIMES])[regime] * vol
+    pull = np.array([r[3] for r in REGIMES])[regime]
+    shocks = rng.normal(0.0, 1.0, n) * sigma + drift
+    logp = np.empty(n)
+    anchor = x = 0.0
+    for j in range(n):  # mean reversion needs the running level; n is at most a few million
+        if j and regime[j] != regime[j - 1]:
+            anchor = x
+        x += shocks[j] - pull[j] * (x - anchor)
+        logp[j] = x
+    c = price * np.exp(logp)
+    o = np.empty(n); o[0] = price; o[1:] = c[:-1]
+    wick = np.abs(rng.normal(0.0, 1.0, (2, n))) * sigma / 3
+    h = np.maximum(o, c) * (1 + wick[0])
+    l = np.minimum(o, c) * (1 - wick[1])
+    v = rng.gamma(2.0, 50.0, n) * (1 + 4 * (regime == 3))
+    return o, h, l, c, v, regime
+
+def minutes(n: int, start_ms: int = 1_600_041_600_000) -> np.ndarray:
+    """n consecutive 1m open times from start_ms (default: a Monday 00:00 UTC)."""
+    return start_ms // 60_000 * 60_000 + np.arange(n, dtype=np.int64) * 60_000
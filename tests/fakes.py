@@ -0,0 +1,182 @@
+import asyncio, json, random
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+import websockets
+
+# Local stand-ins for the exchange so the pipeline can run without a network.
+
+class FakeBinanceWS:
+    """Serves Binance-style combined kline streams on ws://127.0.0.1:<port>/stream?streams=a@kline_1m/...
+    - every tick sends one kline frame per subscribed symbol; every `updates_per_minute`-th is final (x=true)
+      and moves that symbol to its next minute, so time is per symbol and survives reconnects
+    - `disconnect_after` closes a connection after that many frames to exercise reconnect paths
+    - `gap_on_reconnect` lets that many minutes pass unsent for a symbol whenever it is subscribed again
+    - every final kline is kept in `history` and served as Binance REST klines (/api/v3, /fapi/v1, /dapi/v1)
+      on the same port, so a backfill can recover what the socket missed"""
+    def __init__(self, start_ms: int = 1_700_000_040_000, updates_per_minute: int = 3, interval: float = 0.0,
+                 disconnect_after: int = 0, seed: int = 0, port: int = 0, gap_on_reconnect: int = 0):
+        self.start_ms = start_ms // 60_000 * 60_000
+        self.updates_per_minute = max(1, updates_per_minute)
+        self.interval = interval
+        self.disconnect_after = disconnect_after
+        self.port = port
+        self.gap_on_reconnect = gap_on_reconnect
+        self.rng = random.Random(seed)
+        self.minute: Dict[str, int] = {}
+        self.tick: Dict[str, int] = {}
+        self.price: Dict[str, float] = {}
+        self.connections = 0
+        self.disconnects = 0
+        self.frames = 0
+        self.skipped = 0
+        self.history: Dict[str, List[list]] = {}  # symbol -> [t_open, o, h, l, c, v] of every final kline
+        self._served: set = set()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/stream"
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handler, "127.0.0.1", self.port, max_size=None,
+                                              process_request=self._rest)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def frame(self, symbol: str) -> str:
+        m = self.minute.setdefault(symbol, 0)
+        t = self.tick.get(symbol, 0) + 1
+        p = self.price.setdefault(symbol, 100.0 + self.rng.random() * 1000)
+        final = t >= self.updates_per_minute
+        c = p * (1 + self.rng.gauss(0, 0.001))
+        t_open = self.start_ms + m * 60_000
+        k = {"t": t_open, "T": t_open + 59_999, "s": symbol, "i": "1m", "o": f"{p:.4f}", "c": f"{c:.4f}",
+             "h": f"{max(p, c) * 1.0005:.4f}", "l": f"{min(p, c) * 0.9995:.4f}", "v": f"{self.rng.random() * 10:.3f}",
+             "n": 10, "x": final, "q": "0", "V": "0", "Q": "0", "B": "0"}
+        if final:
+            self.history.setdefault(symbol, []).append([t_open, float(k["o"]), float(k["h"]), float(k["l"]),
+                                                        float(k["c"]), float(k["v"])])
+            self.minute[symbol] = m + 1
+            self.price[symbol] = c
+            t = 0
+        self.tick[symbol] = t
+        data = {"e": "kline", "E": t_open + 1_000, "s": symbol, "k": k}
+        return json.dumps({"stream": f"{symbol.lower()}@kline_1m", "data": data}, separators=(",", ":"))
+
+    def _skip_minutes(self, symbol: str, n: int):
+        for _ in range(n):
+            while json.loads(self.frame(symbol))["data"]["k"]["x"] is False:
+                pass
+            self.skipped += 1
+
+    async def _rest(self, path: str, headers):
+        u = urlparse(path)
+        if not u.path.endswith("/klines"):
+            return None  # websocket handshake
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        start, end = int(q.get("startTime", 0)), int(q.get("endTime", 2**62))
+        rows = [r for r in self.history.get(q["symbol"].upper(), []) if start <= r[0] <= end][:int(q.get("limit", 500))]
+        body = [[t, f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", f"{v:.3f}", t + 59_999, "0", 10, "0", "0", "0"]
+                for t, o, h, l, c, v in rows]
+        return 200, [("Content-Type", "application/json")], json.dumps(body).encode()
+
+    async def _handler(self, ws):
+        query = parse_qs(urlparse(ws.path).query)
+        symbols: List[str] = [s.split("@")[0].upper() for s in query.get("streams", [""])[0].split("/") if s]
+        for sym in symbols:
+            if sym in self._served and self.gap_on_reconnect:
+                self._skip_minutes(sym, self.gap_on_reconnect)
+            self._served.add(sym)
+        self.connections += 1
+        sent = 0
+        try:
+            while True:
+                for sym in symbols:
+                    await ws.send(self.frame(sym))
+                    sent += 1
+                    self.frames += 1
+                    if self.disconnect_after and sent >= self.disconnect_after:
+                        self.disconnects += 1
+                        await ws.close()
+                        return
+                await asyncio.sleep(self.interval)
+        except websockets.ConnectionClosed:
+            pass
+
+class FakeHTTPReceiver:
+    """Minimal HTTP/1.1 endpoint (keep-alive) standing in for a webhook or the Telegram Bot API.
+    Records every request as (conn_id, path, body, monotonic time); `connections` counts accepted sockets.
+    - fail_every: every n-th request gets a 500
+    - chat_min_interval: a chat posting faster than this gets a Telegram-style 429 with retry_after
+    - delay: seconds before answering, to emulate a slow receiver"""
+    def __init__(self, fail_every: int = 0, chat_min_interval: float = 0.0, retry_after: int = 1,
+                 delay: float = 0.0, port: int = 0):
+        self.fail_every = fail_every
+        self.chat_min_interval = chat_min_interval
+        self.retry_after = retry_after
+        self.delay = delay
+        self.port = port
+        self.requests: List[tuple] = []
+        self.connections = 0
+        self.statuses: Dict[int, int] = {}
+        self._last_by_chat: Dict[str, float] = {}
+        self._n = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handler, "127.0.0.1", self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _respond(self, body: bytes) -> tuple:
+        self._n += 1
+        if self.fail_every and self._n % self.fail_every == 0:
+            return 500, {"ok": False}
+        chat = parse_qs(body.decode(errors="replace")).get("chat_id", [None])[0]
+        if chat is not None and self.chat_min_interval:
+            now = asyncio.get_running_loop().time()
+            if now - self._last_by_chat.get(chat, -1e9) < self.chat_min_interval:
+                return 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": self.retry_after}}
+            self._last_by_chat[chat] = now
+        return 200, {"ok": True}
+
+    async def _handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        conn_id = self.connections
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                path = lines[0].split(" ")[1]
+                headers = {k.strip().lower(): v.strip() for k, _, v in (x.partition(":") for x in lines[1:] if x)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                status, resp = self._respond(body)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status == 200:
+                    self.requests.append((conn_id, path, body, asyncio.get_running_loop().time()))
+                out = json.dumps(resp).encode()
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(out)}\r\n\r\n".encode() + out)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,60 @@
+"""Notifier delivery against FakeHTTPReceiver: ordering per symbol, retries, rate limits, bounded queue."""
+import asyncio, json
+from app.alerts import Notifier
+from tests.fakes import FakeHTTPReceiver
+
+TG_PATH = "/botTOKEN/sendMessage"
+
+def _notifier(rx: FakeHTTPReceiver, **kw) -> Notifier:
+    kw = {"concurrency": 4, "telegram_min_interval": 0.06, "backoff_base": 0.01, "backoff_max": 0.05, **kw}
+    return Notifier("TOKEN", "1", rx.url + "/hook", telegram_api=rx.url, **kw)
+
+async def _burst():
+    items = [{"symbol": f"S{i:03d}USDT", "timeframe": tf, "seq": j} for j, tf in enumerate(("M15", "H1", "H4"))
+             for i in range(50)]
+    async with FakeHTTPReceiver(fail_every=7, chat_min_interval=0.05) as rx:
+        n = _notifier(rx)
+        assert all(n.post_json(p) for p in items)
+        assert all(n.post_telegram(f"alert {i}") for i in range(4))
+        await n.aclose(timeout=30)
+    return items, rx, n.metrics()
+
+def test_burst_delivered_in_order():
+    items, rx, m = asyncio.run(_burst())
+    hooks = [json.loads(body) for _, path, body, _ in rx.requests if path == "/hook"]
+    texts = [body for _, path, body, _ in rx.requests if path == TG_PATH]
+    assert sorted((p["symbol"], p["seq"]) for p in hooks) == sorted((p["symbol"], p["seq"]) for p in items)
+    last = {}
+    for p in hooks:  # a failed POST is retried before the next message of its lane goes out
+        assert p["seq"] > last.get(p["symbol"], -1)
+        last[p["symbol"]] = p["seq"]
+    assert texts == [f"chat_id=1&text=alert+{i}".encode() for i in range(4)]
+    assert m["webhook"]["sent"] == len(items) and m["telegram"]["sent"] == 4
+    assert m["webhook"]["failed"] == m["telegram"]["failed"] == 0
+    assert m["webhook"]["retries"] + m["telegram"]["retries"] == rx.statuses[500] > 0
+    assert rx.connections <= 4 + 1  # pooled: one socket per lane, not one per message
+
+async def _give_up():
+    async with FakeHTTPReceiver(fail_every=1) as rx:
+        n = _notifier(rx, max_retries=2)
+        n.post_json({"symbol": "BTCUSDT", "seq": 0})
+        await n.aclose(timeout=5)
+    return rx, n.metrics()["webhook"]
+
+def test_retries_exhausted():
+    rx, m = asyncio.run(_give_up())
+    assert (m["sent"], m["failed"], m["retries"]) == (0, 1, 2)
+    assert rx.statuses == {500: 3}
+
+async def _full():
+    async with FakeHTTPReceiver() as rx:
+        n = _notifier(rx, queue_size=3)
+        ok = [n.post_json({"symbol": "BTCUSDT", "seq": i}) for i in range(5)]
+        await n.aclose(timeout=5)
+    return ok, rx, n.metrics()["webhook"]
+
+def test_full_queue_drops():
+    ok, rx, m = asyncio.run(_full())
+    assert ok == [True, True, True, False, False]
+    assert (m["enqueued"], m["sent"], m["dropped"]) == (3, 3, 2)
+    assert [json.loads(r[2])["seq"] for r in rx.requests] == [0, 1, 2]
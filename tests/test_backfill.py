@@ -0,0 +1,79 @@
+"""GapFiller over an ArchiveKlineSource: holes are fetched and ingested in order, live klines held meanwhile."""
+import asyncio
+import numpy as np
+import pytest
+from app.archive import KLINE_DTYPE, archive_path, write_klines
+from app.backfill import ArchiveKlineSource, GapFiller, KlineSource
+from app.candles import Candle
+
+T0 = 1_700_000_040_000
+
+def test_kline_source_is_abstract():
+    class NoFetch(KlineSource):
+        pass
+    with pytest.raises(TypeError):
+        KlineSource()
+    with pytest.raises(TypeError):
+        NoFetch()
+
+def _archive(path, n: int) -> list:
+    arr = np.zeros(n, dtype=KLINE_DTYPE)
+    arr["t"] = T0 + 60_000 * np.arange(n)
+    arr["o"] = arr["h"] = arr["l"] = arr["c"] = 100.0 + np.arange(n)
+    write_klines(archive_path(str(path), "BTCUSDT"), arr)
+    return [Candle("BTCUSDT", "1m", t, t + 59_999, o, h, l, c, v, True) for t, o, h, l, c, v in arr.tolist()]
+
+async def _run(path, live):
+    got = []
+    f = GapFiller(ArchiveKlineSource(str(path)), lambda sym, c: got.append(c.t_open))
+    for c in live:
+        f.feed(c)
+        await asyncio.sleep(0)
+    await f.drain()
+    await f.aclose()
+    return f, got
+
+def test_gaps_filled_in_order(tmp_path):
+    bars = _archive(tmp_path, 60)
+    live = bars[:10] + bars[30:40] + bars[35:36] + bars[45:]  # two holes and a duplicate
+    f, got = asyncio.run(_run(tmp_path, live))
+    assert got == [c.t_open for c in bars]
+    assert (f.gaps, f.filled, f.unfilled, f.duplicates, f.pending) == (2, 25, 0, 1, 0)
+
+async def _bounded(path, live, bound: int):
+    got, peak = [], [0]
+    room = asyncio.Event()
+    def ingest(sym, c):
+        got.append(c.t_open)
+        peak[0] = max(peak[0], len(got))
+        if len(got) >= bound:
+            room.clear()
+    async def wait():
+        if len(got) >= bound:
+            await room.wait()
+    async def consume():  # the dispatcher's workers finishing closes
+        while True:
+            await asyncio.sleep(0.001)
+            done.extend(got)
+            got.clear()
+            room.set()
+    done = []
+    f = GapFiller(ArchiveKlineSource(str(path)), ingest)
+    f.wait = wait
+    worker = asyncio.create_task(consume())
+    for c in live:
+        f.feed(c)
+        await wait()
+    await f.drain()
+    worker.cancel()
+    return done + got, peak[0]
+
+@pytest.mark.parametrize("holes", [((1, 150),), ((1, 150), (160, 170))])
+def test_fill_waits_for_capacity(tmp_path, holes):
+    bars = _archive(tmp_path, 200)
+    live, a = [], 0
+    for b, e in holes:
+        live, a = live + bars[a:b], e
+    ingested, peak = asyncio.run(_bounded(tmp_path, live + bars[a:], bound=8))
+    assert ingested == [c.t_open for c in bars]
+    assert peak <= 8  # without the wait the 149 backfilled minutes would go in at once
@@ -0,0 +1,47 @@
+"""CandleAggregator.ingest_1m_batch (vectorized roll-up) against the streaming ingest_1m path."""
+import numpy as np
+from app.candles import Candle, CandleAggregator, _align_open, align_open_array
+
+TFS = ["M15", "H1", "H4", "D1", "W1"]
+T0 = 1_704_326_400_000  # Thursday 2024-01-04 00:00 UTC: the first W1 is a partial week
+
+def _minutes(n: int, gaps: float = 0.002, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.001, n)))
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) * (1 + rng.uniform(0.0, 0.001, n))
+    l = np.minimum(o, c) * (1 - rng.uniform(0.0, 0.001, n))
+    v = rng.uniform(1.0, 100.0, n)
+    t = T0 + 60_000 * np.arange(n, dtype=np.int64)
+    keep = rng.random(n) >= gaps
+    return tuple(x[keep] for x in (t, o, h, l, c, v))
+
+def test_batch_matches_stream():
+    t, o, h, l, c, v = _minutes(24 * 60 * 23 + 17)  # three W1 closes, a forming candle on every TF
+    ref = CandleAggregator(["BTCUSDT"], TFS)
+    closes = {tf: [] for tf in TFS}
+    ref.on_close = lambda x: closes[x.tf].append((x.t_open, x.t_close, x.o, x.h, x.l, x.c, x.v))
+    for row in zip(t.tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist(), v.tolist()):
+        ref.ingest_1m("BTCUSDT", Candle("BTCUSDT", "1m", row[0], row[0] + 59_999, *row[1:], True))
+
+    got = CandleAggregator(["BTCUSDT"], TFS)
+    half = len(t) // 2 + 7  # the second batch continues the candles the first one left open
+    parts = [got.ingest_1m_batch("BTCUSDT", *(x[:half] for x in (t, o, h, l, c, v))),
+             got.ingest_1m_batch("BTCUSDT", *(x[half:] for x in (t, o, h, l, c, v)))]
+    for tf in TFS:
+        rows = [(int(r["t_open"][i]), int(r["t_close"][i]), r["open"][i], r["high"][i], r["low"][i], r["close"][i],
+                 r["volume"][i]) for r in (p[tf] for p in parts) for i in np.flatnonzero(r["closed"])]
+        assert len(rows) == len(closes[tf]) > 0, tf
+        for x, y in zip(rows, closes[tf]):
+            assert x[:6] == y[:6]
+            assert abs(x[6] - y[6]) <= 1e-9 * y[6]  # volume: summed in another order
+        a, b = got.active("BTCUSDT", tf), ref.active("BTCUSDT", tf)
+        assert (a.t_open, a.o, a.h, a.l, a.c) == (b.t_open, b.o, b.h, b.l, b.c)
+        assert got.last_closed("BTCUSDT", tf).t_close == ref.last_closed("BTCUSDT", tf).t_close == rows[-1][1]
+
+def test_w1_opens_monday():
+    monday = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+    ts = np.array([monday, monday + 3 * 86_400_000 + 12_345, monday + 7 * 86_400_000 - 1], dtype=np.int64)
+    assert align_open_array(ts, "W1").tolist() == [monday] * 3
+    assert [_align_open(x, "W1") for x in ts.tolist()] == [monday] * 3
+    assert _align_open(monday - 1, "W1") == monday - 7 * 86_400_000
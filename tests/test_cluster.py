@@ -0,0 +1,23 @@
+"""shard_raw: each worker gets its own ports and checkpoint file, whether or not the config has the section."""
+from app.cluster import shard_raw, shard_symbols
+
+def test_shard_raw_without_sections():
+    raw = {}
+    w0, w1 = shard_raw(raw, 0), shard_raw(raw, 1)
+    assert raw == {}
+    assert (w0["metrics"]["port"], w1["metrics"]["port"]) == (9109, 9110)
+    assert w0["shm"]["path"] is None and not w0["query"].get("port") and not w0["checkpoint"].get("path")
+
+def test_shard_raw_with_sections():
+    raw = {"metrics": {"port": 9200}, "query": {"port": 8080}, "checkpoint": {"path": "data/state.npz"},
+           "shm": {"path": "/dev/shm/signals"}}
+    w = shard_raw(raw, 2)
+    assert (w["metrics"]["port"], w["query"]["port"]) == (9203, 8083)
+    assert w["checkpoint"]["path"] == "data/state-w2.npz" and w["shm"]["path"] is None
+    assert raw["metrics"]["port"] == 9200 and raw["shm"]["path"] == "/dev/shm/signals"
+
+def test_shard_raw_metrics_off():
+    assert shard_raw({"metrics": {"port": 0}}, 1)["metrics"]["port"] == 0
+
+def test_shard_symbols():
+    assert shard_symbols(["A", "B", "C", "D", "E"], 2) == [["A", "C", "E"], ["B", "D"]]
@@ -0,0 +1,92 @@
+"""CloseDispatcher: the batched inline path, dead process workers, and the indicator engine's shared state under
+worker threads."""
+import asyncio
+import os
+import signal
+import threading
+from app.candles import Candle
+from app.executor import CloseDispatcher
+from app.indicators import _WIDTH, IndicatorEngine, IndicatorParams
+from app.pipeline import Pipeline
+
+SYMBOLS = ["AUSDT", "BUSDT", "CUSDT"]
+
+def _close(sym: str, k: int) -> Candle:
+    t = 900_000 * k
+    return Candle(sym, "M15", t, t + 900_000, 1.0, 1.0, 1.0, 1.0, 1.0, True)
+
+async def _burst(disp: CloseDispatcher, closes):
+    for c in closes:
+        disp._inline(c)
+    await asyncio.sleep(0)
+
+def test_flush_reports_errors_and_keeps_the_burst(capsys):
+    pipe = Pipeline({"timeframes": [{"tf": "M15"}]}, symbols=SYMBOLS, log=None)
+    disp = CloseDispatcher(pipe, batch=True, clock=lambda: 0.0)
+    calls, sent = [], []
+    def update_batch(closes):
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("batch failed")
+        return [{} for _ in closes]
+    def evaluate(c, row, tick):
+        if c.symbol == "BUSDT":
+            raise RuntimeError("evaluate failed")
+        return {"closed_at": c.t_close, "symbol": c.symbol}
+    pipe.update_batch, pipe.evaluate, pipe.publish = update_batch, evaluate, sent.append
+    # AUSDT closes twice, so the burst runs in two rounds: the first fails as a whole, the second for BUSDT only
+    asyncio.run(_burst(disp, [_close(s, 1) for s in SYMBOLS] + [_close(s, 2) for s in SYMBOLS]))
+    assert len(calls) == 2
+    assert [(p["symbol"], p["closed_at"]) for p in sent] == [("AUSDT", 2_700_000), ("CUSDT", 2_700_000)]
+    assert capsys.readouterr().out.splitlines() == ["on_close error: batch failed", "on_close error: evaluate failed"]
+
+def test_rows_created_from_threads():
+    eng = IndicatorEngine(IndicatorParams({}))
+    syms = [f"S{i}USDT" for i in range(200)]
+    start = threading.Barrier(8)
+    blocks = []
+    def work(k: int):
+        start.wait()
+        b = eng._block("M15")
+        blocks.append(b)
+        for s in syms[k % 2::2] + syms:
+            b.row(s)
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    b = eng.blocks["M15"]
+    assert all(x is b for x in blocks) and list(eng.blocks) == ["M15"]
+    assert sorted(b.rows.values()) == list(range(len(syms)))
+    assert all(b.syms[i] == s for s, i in b.rows.items())
+    assert len(b.S) == len(syms) * _WIDTH and len(b.W) == len(syms) * b.bb_len
+    assert len(b.last) == len(b.hot) == len(syms)
+
+async def _kill_and_continue(disp: CloseDispatcher):
+    disp.submit(_close("AUSDT", 1))
+    await disp.drain()
+    pool = disp.shards[0]
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    while not pool._broken:  # the pool notices the dead worker from its management thread
+        await asyncio.sleep(0.01)
+    disp.submit(_close("AUSDT", 2))  # the broken pool refuses the job: replaced, submitted again
+    await disp.drain()
+    assert disp.shards[0] is not pool
+    pool = disp.shards[0]
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    disp.submit(_close("AUSDT", 3))  # in flight when the worker dies, or refused outright
+    await disp.drain()
+    disp.submit(_close("AUSDT", 4))
+    await disp.drain()
+    disp.close()
+
+def test_dead_process_worker_is_replaced(capsys):
+    pipe = Pipeline({"timeframes": [{"tf": "M15"}]}, symbols=["AUSDT"], log=None)
+    disp = CloseDispatcher(pipe, mode="process", workers=1, raw={"timeframes": [{"tf": "M15"}]}, clock=lambda: 0.0)
+    asyncio.run(_kill_and_continue(disp))
+    assert disp.restarts == 2 and disp.completed == 4 and disp.inflight == 0
+    assert disp.stats()["restarts"] == 2
+    assert capsys.readouterr().out.count("died, restarting it") == 2
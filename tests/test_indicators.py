@@ -0,0 +1,90 @@
+"""IndicatorEngine against compute_features. The reference below restates the pandas_ta formulas in plain
+pandas, so the parity check runs without pandas_ta; the pandas_ta test itself runs where it is installed."""
+import numpy as np
+import pandas as pd
+import pytest
+from app.indicators import IndicatorEngine, IndicatorParams, compute_features
+
+N = 400
+WARM = 250  # rows before this are warmup and not compared, as in the pipeline
+
+def _bars(n: int = N, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.004, n)))
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) * (1 + rng.uniform(0.0, 0.003, n))
+    l = np.minimum(o, c) * (1 - rng.uniform(0.0, 0.003, n))
+    v = rng.uniform(1.0, 100.0, n)
+    t = 60_000 * np.arange(1, n + 1) - 1
+    return pd.DataFrame({"open": o, "high": h, "low": l, "close": c, "volume": v}, index=t)
+
+def _ema(x: pd.Series, n: int) -> pd.Series:
+    x = x.copy()
+    sma = x.iloc[:n].mean()
+    x.iloc[:n - 1] = np.nan
+    x.iloc[n - 1] = sma
+    return x.ewm(span=n, adjust=False).mean()
+
+def _rma(x: pd.Series, n: int) -> pd.Series:
+    return x.ewm(alpha=1.0 / n, min_periods=n).mean()
+
+def reference(df: pd.DataFrame, p: IndicatorParams) -> pd.DataFrame:
+    c, h, l = df["close"], df["high"], df["low"]
+    out = df.copy()
+    out["ema_fast"] = _ema(c, p.ema_fast)
+    out["ema_slow"] = _ema(c, p.ema_slow)
+    d = c.diff()
+    up, dn = _rma(d.clip(lower=0), p.rsi_len), _rma(d.clip(upper=0), p.rsi_len)
+    out["rsi"] = 100 * up / (up + dn.abs())
+    macd = _ema(c, p.macd_fast) - _ema(c, p.macd_slow)
+    first = macd.first_valid_index()
+    signal = _ema(macd.loc[first:], p.macd_signal).reindex(macd.index)
+    sfx = f"_{p.macd_fast}_{p.macd_slow}_{p.macd_signal}"
+    out["MACD" + sfx], out["MACDh" + sfx], out["MACDs" + sfx] = macd, macd - signal, signal
+    mid = c.rolling(p.bb_len).mean()
+    dev = p.bb_std * c.rolling(p.bb_len).std(ddof=0)
+    lower, upper = mid - dev, mid + dev
+    sfx = f"_{p.bb_len}_{float(p.bb_std)}"
+    out["BBL" + sfx], out["BBM" + sfx], out["BBU" + sfx] = lower, mid, upper
+    out["BBB" + sfx] = 100 * (upper - lower) / mid
+    out["BBP" + sfx] = (c - lower) / (upper - lower)
+    out["bb_width"] = (upper - lower) / c
+    pc = c.shift(1)
+    tr = pd.concat([h - l, (h - pc).abs(), (pc - l).abs()], axis=1).max(axis=1, skipna=False)
+    out["atr"] = _rma(tr, p.atr_len)
+    up_move, dn_move = h - h.shift(1), l.shift(1) - l
+    pos = ((up_move > dn_move) & (up_move > 0)) * up_move
+    neg = ((dn_move > up_move) & (dn_move > 0)) * dn_move
+    k = 100 / _rma(tr, p.adx_len)
+    dmp, dmn = k * _rma(pos, p.adx_len), k * _rma(neg, p.adx_len)
+    out["adx"] = _rma(100 * (dmp - dmn).abs() / (dmp + dmn), p.adx_len)
+    return out
+
+def _stream(df: pd.DataFrame, p: IndicatorParams) -> pd.DataFrame:
+    eng = IndicatorEngine(p)
+    rows = [eng.update("BTCUSDT", "M15", t, *x) for t, x in zip(df.index, df.itertuples(index=False))]
+    return pd.DataFrame(rows, index=df.index)
+
+def _compare(got: pd.DataFrame, want: pd.DataFrame):
+    for col in got.columns:
+        if col in ("trend_bull", "trend_bear"):
+            continue
+        a, b = got[col].to_numpy()[WARM:], want[col].to_numpy()[WARM:]
+        assert np.allclose(a, b, rtol=1e-9, atol=1e-9), col
+
+@pytest.mark.parametrize("cfg", [{}, {"ema_fast": 9, "ema_slow": 21, "rsi_length": 7, "macd_fast": 5,
+                                      "macd_slow": 13, "macd_signal": 4, "bb_length": 10, "bb_std": 1.5,
+                                      "atr_length": 10, "adx_length": 10}])
+def test_engine_matches_reference(cfg):
+    p = IndicatorParams(cfg)
+    df = _bars()
+    got = _stream(df, p)
+    _compare(got, reference(df, p))
+    warm = got.iloc[WARM:]
+    assert (warm["trend_bull"] == (warm["ema_fast"] > warm["ema_slow"])).all()
+
+def test_engine_matches_pandas_ta():
+    pytest.importorskip("pandas_ta")
+    p = IndicatorParams({})
+    df = _bars()
+    _compare(_stream(df, p), compute_features(df, p))
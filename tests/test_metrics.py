@@ -0,0 +1,51 @@
+"""/metrics text: histograms and counters, and step6's point-in-time gauges read from live objects."""
+import asyncio
+from app import metrics
+from app.alerts import Notifier
+from app.backfill import ArchiveKlineSource, GapFiller
+from app.candles import Candle
+from app.executor import CloseDispatcher
+from app.pipeline import Pipeline
+from app.step6_run import _gauges
+from app.store import CandleStore
+from app.ws_binance import ConnHealth
+
+def _samples(text: str) -> dict:
+    return {k: float(v) for k, _, v in (x.rpartition(" ") for x in text.splitlines() if x and not x.startswith("#"))}
+
+def test_histogram_and_counter():
+    reg = metrics.Registry()
+    h = reg.histogram("t_seconds", "h", ("stage",), buckets=(0.1, 1.0))
+    c = reg.counter("t_total", "c", ("result",))
+    for x in (0.05, 0.5, 5.0):
+        h.observe(x, "a")
+    c.inc("ok")
+    c.inc("ok", n=2)
+    s = _samples(reg.render())
+    assert s['t_seconds_bucket{stage="a",le="0.1"}'] == 1
+    assert s['t_seconds_bucket{stage="a",le="1"}'] == 2
+    assert s['t_seconds_bucket{stage="a",le="+Inf"}'] == s['t_seconds_count{stage="a"}'] == 3
+    assert s['t_seconds_sum{stage="a"}'] == 5.55
+    assert s['t_total{result="ok"}'] == 3
+
+async def _render(tmp_path):
+    pipe = Pipeline({"timeframes": [{"tf": "M15"}]}, symbols=["BTCUSDT"], log=None)
+    filler = GapFiller(ArchiveKlineSource(str(tmp_path)), pipe.ingest_1m)
+    reg = metrics.Registry()
+    reg.collectors.append(_gauges(Notifier("T", "1", "http://127.0.0.1:9/hook"), CloseDispatcher(pipe),
+                                  [ConnHealth(conn_id=0, streams=1, connected=True, reconnects=2)], filler,
+                                  CandleStore(str(tmp_path / "store"))))
+    filler.seed("BTCUSDT", 0)
+    filler.feed(Candle("BTCUSDT", "1m", 600_000, 659_999, 1.0, 1.0, 1.0, 1.0, 1.0, True))  # 9 minutes missing
+    during = _samples(reg.render())  # the fill has not run yet: the symbol is held
+    await filler.drain()
+    return during, _samples(reg.render())
+
+def test_step6_gauges(tmp_path, capsys):
+    during, after = asyncio.run(_render(tmp_path))
+    assert "collector error" not in capsys.readouterr().out
+    assert during["signalbot_backfill_pending"] == 1 and after["signalbot_backfill_pending"] == 0
+    assert after["signalbot_backfill_gaps_total"] == 1
+    assert after['signalbot_ws_connected{conn="0"}'] == 1 and after['signalbot_ws_reconnects_total{conn="0"}'] == 2
+    assert after['signalbot_delivery_depth{destination="webhook"}'] == 0
+    assert after["signalbot_dispatch_inflight"] == 0 and after["signalbot_store_written_total"] == 0
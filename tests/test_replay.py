@@ -0,0 +1,25 @@
+"""replay_symbol: the batched roll-up and --stream (1m by 1m) write the same output and count the same closes."""
+import numpy as np
+from app.archive import KLINE_DTYPE, archive_path, write_klines
+from app.replay import replay_symbol
+
+RAW = {"timeframes": [{"tf": "M15"}, {"tf": "H1"}]}
+T0 = 1_699_999_200_000  # a UTC hour boundary
+
+def test_stream_matches_batch(tmp_path):
+    n = 300 * 15 + 7
+    rng = np.random.default_rng(4)
+    arr = np.empty(n, dtype=KLINE_DTYPE)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, n)))
+    arr["t"] = T0 + 60_000 * np.arange(n)
+    arr["o"] = np.r_[c[0], c[:-1]]
+    arr["h"] = np.maximum(arr["o"], c) * (1 + rng.uniform(0.0, 0.001, n))
+    arr["l"] = np.minimum(arr["o"], c) * (1 - rng.uniform(0.0, 0.001, n))
+    arr["c"] = c
+    arr["v"] = rng.integers(1, 100, n)
+    write_klines(archive_path(str(tmp_path), "BTCUSDT"), arr)
+    batch = replay_symbol(RAW, str(tmp_path), "BTCUSDT", str(tmp_path / "batch"))
+    stream = replay_symbol(RAW, str(tmp_path), "BTCUSDT", str(tmp_path / "stream"), stream=True)
+    assert batch["closes"] == stream["closes"] == 300 + 75
+    assert {k: v for k, v in batch.items() if k != "seconds"} == {k: v for k, v in stream.items() if k != "seconds"}
+    assert (tmp_path / "batch" / "BTCUSDT.jsonl").read_text() == (tmp_path / "stream" / "BTCUSDT.jsonl").read_text()
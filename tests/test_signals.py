@@ -0,0 +1,76 @@
+"""decide_signal_batch against the scalar decide_signal, row by row: regime, direction, score, reasons and
+entry / SL / TP bit for bit (NaN == NaN)."""
+import math
+import numpy as np
+import pytest
+from app.indicators import IndicatorEngine, IndicatorParams
+from app.pipeline import make_detector
+from app.signal_engine import DIRECTIONS, REGIMES, decide_signal, decide_signal_batch, reasons_from_mask
+
+ADX_THR, SCORE_THR = 20.0, 70
+OPTIONAL = ("adx", "atr", "rsi", "MACDh_12_26_9")
+
+def _same_float(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or np.float64(a).tobytes() == np.float64(b).tobytes()
+
+def _mismatches(cols: dict, sup_low, sup_high, res_low, res_high) -> list:
+    out = decide_signal_batch(cols, ADX_THR, SCORE_THR, sup_low, sup_high, res_low, res_high)
+    names = list(cols)
+    bad = []
+    for i, vals in enumerate(zip(*(np.asarray(cols[k], dtype=np.float64).tolist() for k in names))):
+        row = dict(zip(names, vals))
+        sr = {"support": None if math.isnan(sup_low[i]) else (float(sup_low[i]), float(sup_high[i])),
+              "resistance": None if math.isnan(res_low[i]) else (float(res_low[i]), float(res_high[i]))}
+        direction, score, regime, entry, sl, tp, reasons = decide_signal(row, ADX_THR, SCORE_THR, sr)
+        if not (direction == DIRECTIONS[int(out["direction"][i])] and score == int(out["score"][i])
+                and regime == REGIMES[out["regime"][i]] and reasons == reasons_from_mask(int(out["reasons"][i]))
+                and all(_same_float(x, float(out[k][i])) for x, k in ((entry, "entry"), (sl, "sl"), (tp, "tp")))):
+            bad.append((row, sr))
+    return bad
+
+def _edge_rows(n: int, seed: int, drop: tuple = ()):
+    # values on and around every threshold, NaNs, missing zones; zones placed so the breakout tests land
+    # exactly on, just above and just below their lines
+    rng = np.random.default_rng(seed)
+    pick = lambda xs: rng.choice(np.array(xs, dtype=np.float64), n)
+    close = pick([100.0, 101.0, 99.0, 100.3, np.nan])
+    atr = pick([1.0, 0.0, 2.5, np.nan])
+    cols = {"close": close, "ema_fast": pick([100.0, 101.0, 99.0, np.nan]), "ema_slow": pick([100.0, 101.0, 99.0, np.nan]),
+            "adx": pick([ADX_THR, ADX_THR - 1e-9, 35.0, 0.0, np.nan]), "atr": atr,
+            "rsi": pick([50.0, 49.9, 50.1, 70.0, np.nan]), "MACDh_12_26_9": pick([0.0, 0.5, -0.5, -0.0, np.nan])}
+    for k in drop:
+        del cols[k]
+    a = 0.1 * np.nan_to_num(atr) if "atr" in drop else 0.1 * atr
+    res_high = np.where(rng.random(n) < 0.3, close - a, pick([98.0, 100.0, 102.0]))
+    res_low = res_high - pick([0.5, 1.0])
+    sup_low = np.where(rng.random(n) < 0.3, close + a, pick([98.0, 100.0, 102.0]))
+    sup_high = sup_low + pick([0.5, 1.0])
+    none_r, none_s = rng.random(n) < 0.25, rng.random(n) < 0.25
+    res_low[none_r] = res_high[none_r] = np.nan
+    sup_low[none_s] = sup_high[none_s] = np.nan
+    return cols, sup_low, sup_high, res_low, res_high
+
+@pytest.mark.parametrize("drop", [()] + [(c,) for c in OPTIONAL] + [OPTIONAL])
+def test_edge_rows(drop):
+    assert _mismatches(*_edge_rows(3000, seed=len(drop), drop=drop)) == []
+
+def test_real_features():
+    rng = np.random.default_rng(1)
+    n = 1500
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.006, n)))
+    o = np.r_[100.0, c[:-1]]
+    h = np.maximum(o, c) * (1 + rng.uniform(0.0, 0.003, n))
+    l = np.minimum(o, c) * (1 - rng.uniform(0.0, 0.003, n))
+    eng, det = IndicatorEngine(IndicatorParams({})), make_detector({})
+    rows, zones = [], []
+    for i in range(n):
+        rows.append(eng.update("X", "M15", 900_000 * (i + 1), o[i], h[i], l[i], c[i], 1.0))
+        det.update("X", "M15", o[i], h[i], l[i], c[i])
+        near = det.nearest("X", "M15", c[i])
+        s, r = near["support"], near["resistance"]
+        zones.append((s[0] if s else np.nan, s[1] if s else np.nan, r[0] if r else np.nan, r[1] if r else np.nan))
+    cols = {k: np.array([x[k] for x in rows]) for k in ("close", "ema_fast", "ema_slow") + OPTIONAL}
+    z = np.array(zones).T
+    out = decide_signal_batch(cols, ADX_THR, SCORE_THR, *z)
+    assert len(set(out["direction"].tolist())) == 3  # LONG, SHORT and NEUTRAL all occur
+    assert _mismatches(cols, *z) == []
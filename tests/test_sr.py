@@ -0,0 +1,100 @@
+"""SRDetector (bounded rings, incremental ATR / pivots, indexed zones, lazy decay) against the original
+list-scanning detector, restated below as the reference."""
+import numpy as np
+import pytest
+from app.sr import SRDetector
+
+class _Zone:
+    def __init__(self, low, high, idx):
+        self.price_low, self.price_high, self.score, self.touches = low, high, 1.0, 1
+        self.last_touch_idx = self.created_idx = idx
+
+class ReferenceSR:
+    """Every bar kept, ATR and pivots recomputed from the lists, every zone decayed every bar."""
+    def __init__(self, pivot_window=5, pct=0.1, atr_mult=0.5, max_age_bars=300, decay_per_bar=0.01):
+        self.w, self.pct, self.atr_mult = pivot_window, pct / 100.0, atr_mult
+        self.max_age, self.decay = max_age_bars, decay_per_bar
+        self.H, self.L, self.C, self.zones = [], [], [], []
+
+    def _atr(self):
+        n = len(self.C)
+        trs = [max(self.H[i] - self.L[i], abs(self.H[i] - self.C[i-1]), abs(self.L[i] - self.C[i-1]))
+               for i in range(max(1, n - 14), n)]
+        return sum(trs) / len(trs) if trs else 0.0
+
+    def _pivot(self, X, center, better):
+        if center - self.w < 0 or center + self.w >= len(X):
+            return False
+        return all(better(X[center], X[i]) for i in range(center - self.w, center + self.w + 1) if i != center)
+
+    def _merge(self, level, atr, idx):
+        tol = max(level * self.pct, self.atr_mult * atr)
+        lo, hi = level - tol, level + tol
+        for z in self.zones:
+            if not (hi < z.price_low or lo > z.price_high):
+                z.price_low, z.price_high = min(z.price_low, lo), max(z.price_high, hi)
+                z.touches += 1
+                z.score += 1.0
+                z.last_touch_idx = idx
+                return
+        self.zones.append(_Zone(lo, hi, idx))
+
+    def update(self, h, l, c):
+        self.H.append(h); self.L.append(l); self.C.append(c)
+        atr = self._atr()
+        idx = len(self.C) - 1
+        for z in self.zones:
+            z.score = max(0.0, z.score * (1.0 - self.decay))
+        self.zones = [z for z in self.zones if idx - z.created_idx <= self.max_age]
+        center = idx - self.w
+        if center >= 0:
+            if self._pivot(self.H, center, lambda a, b: a > b):
+                self._merge(self.H[center], atr, center)
+            if self._pivot(self.L, center, lambda a, b: a < b):
+                self._merge(self.L[center], atr, center)
+        for z in self.zones:
+            if z.price_low <= c <= z.price_high:
+                z.touches += 1
+                z.score += 0.5
+                z.last_touch_idx = idx
+
+    def nearest(self, price):
+        below = [z for z in self.zones if z.price_high <= price]
+        above = [z for z in self.zones if z.price_low >= price]
+        return (max(below, key=lambda z: z.price_high) if below else None,
+                min(above, key=lambda z: z.price_low) if above else None)
+
+def _walk(n=3000, seed=11):
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.004, n)))
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) * (1 + rng.uniform(0.0, 0.002, n))
+    l = np.minimum(o, c) * (1 - rng.uniform(0.0, 0.002, n))
+    return o.tolist(), h.tolist(), l.tolist(), c.tolist()
+
+def _same(z, r):
+    return (z.price_low, z.price_high, z.touches, z.last_touch_idx, z.created_idx) == \
+        (r.price_low, r.price_high, r.touches, r.last_touch_idx, r.created_idx)
+
+@pytest.mark.parametrize("history", [None, 50])
+@pytest.mark.parametrize("window,max_age", [(5, 300), (3, 80)])
+def test_matches_reference(history, window, max_age):
+    det = SRDetector(pivot_window=window, max_age_bars=max_age, history_bars=history)
+    ref = ReferenceSR(pivot_window=window, max_age_bars=max_age)
+    for i, (o, h, l, c) in enumerate(zip(*_walk())):
+        det.update("BTCUSDT", "M15", o, h, l, c)
+        ref.update(h, l, c)
+        if i % 25:
+            continue
+        got = det.zones("BTCUSDT", "M15")
+        assert len(got) == len(ref.zones)
+        for z, r in zip(got, ref.zones):
+            assert _same(z, r)
+            assert z.score == pytest.approx(r.score, rel=1e-9, abs=1e-12)
+        near = det.nearest("BTCUSDT", "M15", c)
+        for side, r in zip(("support", "resistance"), ref.nearest(c)):
+            assert (near[side] is None) == (r is None)
+            if r is not None:
+                assert _same(near[side][2], r)
+    if history:
+        assert len(det.store[("BTCUSDT", "M15")]["c"]) == history
@@ -0,0 +1,35 @@
+"""CandleStore: appended candles survive a reopen, a torn trailing record is cut off, lookups bisect on t_close."""
+import os
+import numpy as np
+from app.archive import KLINE_DTYPE, load_klines
+from app.candles import Candle
+from app.store import CandleStore
+
+T0 = 1_700_000_100_000  # a quarter-hour boundary
+P = 900_000
+
+def _m15(k: int) -> Candle:
+    t = T0 + P * k
+    return Candle("BTCUSDT", "M15", t, t + P, 100.0 + k, 101.0 + k, 99.0 + k, 100.5 + k, float(k), True)
+
+def test_round_trip_after_torn_tail(tmp_path):
+    store = CandleStore(str(tmp_path), batch=4)
+    assert all(store.append(_m15(k)) for k in range(10))
+    assert not store.append(_m15(9))  # a replayed close
+    store.close()
+    path = store.path("BTCUSDT", "M15")
+    assert os.path.getsize(path) == 10 * KLINE_DTYPE.itemsize
+    with open(path, "ab") as f:  # a crash in the middle of a write
+        f.write(b"\0" * (KLINE_DTYPE.itemsize // 2))
+    again = CandleStore(str(tmp_path), batch=4)
+    assert not again.append(_m15(5)) and again.append(_m15(10))
+    n = again.extend("BTCUSDT", "M15", T0 + P * np.arange(8, 14), *(np.arange(8, 14, dtype=np.float64),) * 5)
+    assert n == 3  # 8..10 are already stored
+    again.close()
+    assert os.path.getsize(path) == 14 * KLINE_DTYPE.itemsize
+    assert again.last("BTCUSDT", "M15") == Candle("BTCUSDT", "M15", T0 + 13 * P, T0 + 14 * P, 13.0, 13.0, 13.0, 13.0, 13.0, True)
+    assert again.at("BTCUSDT", "M15", T0 + 4 * P) == _m15(3)
+    r = again.range("BTCUSDT", "M15", T0 + 3 * P, T0 + 11 * P)  # closes of bars 2..9
+    assert r["t"].tolist() == (T0 + P * np.arange(2, 10)).tolist()
+    assert CandleStore(str(tmp_path)).records("BTCUSDT", "M15")["c"].tolist() == load_klines(str(tmp_path), "BTCUSDT", "M15")["c"].tolist()
+    assert again.range("BTCUSDT", "H1").size == 0 and again.last("BTCUSDT", "H1") is None
@@ -0,0 +1,30 @@
+"""app.sweep scores candidates on the zones the live pipeline would have seen at each close."""
+import numpy as np
+from app import sweep
+from app.candles import Candle
+from app.pipeline import Pipeline
+
+def _bars(n: int, seed: int = 2) -> dict:
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.005, n)))
+    o = np.r_[100.0, c[:-1]]
+    return {"t": 900_000 * np.arange(n, dtype=np.int64), "o": o, "h": np.maximum(o, c) * (1 + rng.uniform(0.0, 0.003, n)),
+            "l": np.minimum(o, c) * (1 - rng.uniform(0.0, 0.003, n)), "c": c, "v": np.ones(n)}
+
+def test_zones_match_pipeline():
+    b = _bars(600)
+    sr = {"pivot_window": 3, "decay_per_bar": 0.02}
+    sweep._init({"XUSDT": b}, {"tf": "M15"})
+    got = sweep._zones("XUSDT", sr)
+    pipe = Pipeline({"timeframes": [{"tf": "M15"}], "sr": sr}, symbols=["XUSDT"], log=None)
+    want = np.full((len(b["c"]), 4), np.nan)
+    for i in range(len(b["c"])):
+        c = Candle("XUSDT", "M15", int(b["t"][i]), int(b["t"][i]) + 900_000, *(float(b[k][i]) for k in "ohlcv"), True)
+        if pipe.update(c) is None:
+            continue
+        near = pipe.det.nearest("XUSDT", "M15", c.c)
+        s, r = near["support"], near["resistance"]
+        want[i] = (*(s[:2] if s else (np.nan, np.nan)), *(r[:2] if r else (np.nan, np.nan)))
+    have = np.stack([got[k] for k in ("sup_low", "sup_high", "res_low", "res_high")], axis=1)
+    assert np.isnan(have[:sweep.WARMUP - 1]).all() and not np.isnan(have[sweep.WARMUP:]).all()
+    np.testing.assert_array_equal(have, want)
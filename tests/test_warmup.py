@@ -0,0 +1,62 @@
+"""warmup.bootstrap from a 1m archive leaves the same state as a pipeline that saw those minutes live."""
+import numpy as np
+import pytest
+from app.archive import KLINE_DTYPE, archive_path, write_klines
+from app.candles import Candle
+from app.pipeline import Pipeline
+from app.store import CandleStore
+from app.warmup import bootstrap
+
+RAW = {"timeframes": [{"tf": "M15"}, {"tf": "H1"}]}
+T0 = 1_699_999_200_000  # a UTC hour boundary
+
+def _klines(n: int, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    arr = np.empty(n, dtype=KLINE_DTYPE)
+    c = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, n)))
+    arr["t"] = T0 + 60_000 * np.arange(n)
+    arr["o"] = np.r_[c[0], c[:-1]]
+    arr["h"] = np.maximum(arr["o"], c) * (1 + rng.uniform(0.0, 0.001, n))
+    arr["l"] = np.minimum(arr["o"], c) * (1 - rng.uniform(0.0, 0.001, n))
+    arr["c"] = c
+    arr["v"] = rng.integers(1, 100, n)  # whole numbers: the vectorized roll-up sums volume in another order
+    return arr
+
+def _zone(z):
+    return z.price_low, z.price_high, z.touches, z.last_touch_idx, z.created_idx
+
+def test_bootstrap_matches_live(tmp_path):
+    arr = _klines(400 * 15 + 7)  # 400 M15 closes (100 H1: still warming up) and a partial period
+    write_klines(archive_path(str(tmp_path), "BTCUSDT"), arr)
+    live = Pipeline(RAW, symbols=["BTCUSDT"], log=None)
+    for t, o, h, l, c, v in arr.tolist():
+        live.ingest_1m("BTCUSDT", Candle("BTCUSDT", "1m", t, t + 59_999, o, h, l, c, v, True))
+    boot = Pipeline(RAW, symbols=["BTCUSDT"], log=None)
+    bootstrap(str(tmp_path), ["BTCUSDT"], boot.agg, boot.buf, boot.engine, boot.det)
+    for tf in ("M15", "H1"):
+        assert boot.agg.last_closed("BTCUSDT", tf) == live.agg.last_closed("BTCUSDT", tf)
+        assert boot.agg.active("BTCUSDT", tf) == live.agg.active("BTCUSDT", tf)
+        np.testing.assert_equal(boot.engine.last("BTCUSDT", tf), live.engine.last("BTCUSDT", tf))
+        got, want = boot.det.zones("BTCUSDT", tf), live.det.zones("BTCUSDT", tf)
+        assert [_zone(z) for z in got] == [_zone(z) for z in want]
+        # the live side settles the lazy decay at other bars (nearest() per close): last-ulp differences
+        assert [z.score for z in got] == pytest.approx([z.score for z in want], rel=1e-12)
+    assert live.det.zones("BTCUSDT", "M15") and not live.det.zones("BTCUSDT", "H1")
+
+def test_native_files_keep_the_forming_candle(tmp_path):
+    # the live store writes M15 / H1 files next to the 1m one; they win, but hold closed bars only
+    arr = _klines(400 * 15 + 7)
+    write_klines(archive_path(str(tmp_path), "BTCUSDT"), arr)
+    live = Pipeline(RAW, symbols=["BTCUSDT"], log=None)
+    store = CandleStore(str(tmp_path))
+    live.agg.on_close = store.append
+    for t, o, h, l, c, v in arr.tolist():
+        live.ingest_1m("BTCUSDT", Candle("BTCUSDT", "1m", t, t + 59_999, o, h, l, c, v, True))
+    store.close()
+    assert len(store.records("BTCUSDT", "M15")) == 400 and len(store.records("BTCUSDT", "H1")) == 100
+    boot = Pipeline(RAW, symbols=["BTCUSDT"], log=None)
+    bootstrap(str(tmp_path), ["BTCUSDT"], boot.agg, boot.buf, boot.engine, boot.det)
+    for tf in ("M15", "H1"):
+        assert boot.agg.last_closed("BTCUSDT", tf) == live.agg.last_closed("BTCUSDT", tf)
+        assert boot.agg.active("BTCUSDT", tf) == live.agg.active("BTCUSDT", tf)
+        assert boot.agg.active("BTCUSDT", tf).closed is False